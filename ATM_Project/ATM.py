@@ -1,88 +1,198 @@
-class ATM:
-  # constructor (Special Function)
-  def __init__(self) :
-    self.pin = ''
-    self.balance = 0
-    self.menu()
-
+import asyncio
 
-  def menu(self):
-    user_input = input("""
+MENU = """
     Hi how can I help you?
     1. Press 1 to create pin
     2. Press 2 to change pin
     3. Press 3 to check balance
     4. Press 4 to withdraw
     5. Anything else to exit
-    
-     """)
-    
-    if user_input == '1':
-      # create pin  
-      self.create_pin() 
-
-    elif user_input == '2':
+
+     """
+
+# what the ATM asks for in each state
+PROMPTS = {
+  'menu': MENU,
+  'create_pin': "Enter your pin: ",
+  'create_balance': "Enter balance:",
+  'change_old': "Enter your old pin:",
+  'change_new': "Enter your pin:",
+  'check_pin': "Enter your pin",
+  'withdraw_pin': "Enter your pin",
+  'withdraw_amount': "Enter withdraw amount: ",
+}
+
+
+class ATM:
+  # One session as a state machine: prompt() says what to ask, feed(line)
+  # handles the answer and moves to the next state. Nothing here reads or
+  # prints, so the same session runs on a console, a script or a socket,
+  # and a session can go on forever without growing the call stack.
+  __slots__ = ('pin', 'balance', 'state', 'done')
+
+  def __init__(self) :
+    self.pin = ''
+    self.balance = 0
+    self.state = 'menu'
+    self.done = False
+
+  def prompt(self):
+    return PROMPTS[self.state]
+
+  def feed(self, line):
+    # returns the text to show for this answer ('' for none)
+    line = line.strip()
+    return getattr(self, '_on_' + self.state)(line)
+
+  def _goto(self, state, text=''):
+    self.state = state
+    return text
+
+  def _on_menu(self, choice):
+    if choice == '1':
+      # create pin
+      return self._goto('create_pin')
+    elif choice == '2':
       # change pin
-      self.change_pin()
-     
-    elif user_input == '3':
+      return self._goto('change_old')
+    elif choice == '3':
       # check balance
-      self.check_balance()
-    elif user_input == '4':
+      return self._goto('check_pin')
+    elif choice == '4':
       # withdraw
-      self.withdraw()
-    else:
-      # exit
-      exit()
+      return self._goto('withdraw_pin')
+    # exit
+    self.done = True
+    return ''
 
-  def create_pin(self):
-    user_pin = input("Enter your pin: ")
+  def _on_create_pin(self, user_pin):
     self.pin = user_pin
+    return self._goto('create_balance')
 
-    user_balance = int(input("Enter balance:"))
-    self.balance = user_balance
-    print("Pin created successfully:") 
-    self.menu()
-
-  def  change_pin(self):
-    old_pin = input("Enter your old pin:")
+  def _on_create_balance(self, text):
+    if not text.isdigit():
+      return self._goto('menu', "Balance must be a number")
+    self.balance = int(text)
+    return self._goto('menu', "Pin created successfully:")
 
+  def _on_change_old(self, old_pin):
     if old_pin == self.pin:
       # let him change pin
-      new_pin = input("Enter your pin:")
-      self.pin = new_pin
-      print("Change pin successfully")
-
-    else:
-      print("Not possible")
-    self.menu()
-  
-  def check_balance(self):
-   user_pin = input("Enter your pin")
-
-   if user_pin == self.pin :
-    print(f"your balance is  {self.balance} only")
-     
-   else :
-    print("Try again!! Enter correct password please...")
-   self.menu()
-
-  def  withdraw(self):
-    user_pin = input("Enter your pin")
+      return self._goto('change_new')
+    return self._goto('menu', "Not possible")
+
+  def _on_change_new(self, new_pin):
+    self.pin = new_pin
+    return self._goto('menu', "Change pin successfully")
+
+  def _on_check_pin(self, user_pin):
+    if user_pin == self.pin :
+      return self._goto('menu', f"your balance is  {self.balance} only")
+    return self._goto('menu', "Try again!! Enter correct password please...")
 
+  def _on_withdraw_pin(self, user_pin):
     if user_pin == self.pin :
-      print(f"your balance is  {self.balance} only")
-      amount = int(input("Enter withdraw amount: "))
-      if amount <= self.balance:
-        self.balance = self.balance - amount
-        print(f"Successfully Withdraw {amount}")
-        print(f"your balance is  {self.balance} only")
-      else:
-        print("Garib hai tu!! Limit cross kyun kiya??")
-     
-    else :
-      print("Try again!! Enter correct password please...")
-   
-    self.menu()
-
-obj = ATM()
\ No newline at end of file
+      return self._goto('withdraw_amount', f"your balance is  {self.balance} only")
+    return self._goto('menu', "Try again!! Enter correct password please...")
+
+  def _on_withdraw_amount(self, text):
+    if not text.isdigit():
+      return self._goto('menu', "Amount must be a number")
+    amount = int(text)
+    if amount <= self.balance:
+      self.balance = self.balance - amount
+      return self._goto('menu', f"Successfully Withdraw {amount}\nyour balance is  {self.balance} only")
+    return self._goto('menu', "Garib hai tu!! Limit cross kyun kiya??")
+
+
+# ---------- input/output ----------
+class ConsoleIO:
+  def read(self, prompt):
+    return input(prompt)
+
+  def write(self, text):
+    print(text)
+
+
+class ScriptIO:
+  # replays answers from a list and keeps everything shown
+  def __init__(self, lines):
+    self.lines = iter(lines)
+    self.output = []
+
+  def read(self, prompt):
+    self.output.append(prompt)
+    try:
+      return next(self.lines)
+    except StopIteration:
+      raise EOFError from None
+
+  def write(self, text):
+    self.output.append(text)
+
+
+class StreamIO:
+  # asyncio: a telnet/netcat client on the other end of a connection
+  def __init__(self, reader, writer):
+    self.reader = reader
+    self.writer = writer
+
+  async def read(self, prompt):
+    self.writer.write(prompt.encode())
+    await self.writer.drain()
+    line = await self.reader.readline()
+    if not line:
+      raise EOFError
+    return line.decode(errors='replace')
+
+  async def write(self, text):
+    self.writer.write(text.encode() + b"\n")
+
+
+def run(atm, io):
+  # drive a session until exit or end of input
+  while not atm.done:
+    try:
+      line = io.read(atm.prompt())
+    except EOFError:
+      break
+    text = atm.feed(line)
+    if text:
+      io.write(text)
+  return atm
+
+
+async def arun(atm, io):
+  # same loop for an io whose read/write are coroutines
+  while not atm.done:
+    try:
+      line = await io.read(atm.prompt())
+    except EOFError:
+      break
+    text = atm.feed(line)
+    if text:
+      await io.write(text)
+  return atm
+
+
+async def serve(host='127.0.0.1', port=8023):
+  # one ATM session per connection: nc 127.0.0.1 8023
+  async def session(reader, writer):
+    try:
+      await arun(ATM(), StreamIO(reader, writer))
+    except ConnectionError:
+      pass
+    finally:
+      writer.close()
+
+  server = await asyncio.start_server(session, host, port)
+  async with server:
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+  import sys
+  if sys.argv[1:2] == ['serve']:
+    asyncio.run(serve(port=int(sys.argv[2]) if len(sys.argv) > 2 else 8023))
+  else:
+    run(ATM(), ConsoleIO())
@@ -0,0 +1,720 @@
+"""ATMs on the shared bank ledger: withdrawals go through a durable per-terminal outbox.
+
+    python atm_ledger.py atm --terminal lobby            # a console session against the ledger
+    python atm_ledger.py sync --terminal lobby           # push whatever the outbox still holds
+    python atm_ledger.py simulate --terminals 8 --accounts 40 --withdrawals 4000 --latency 0.02 --crash 0.05
+
+The ledger is the Bank Management Project's bank_core.Bank, opened the same way
+as the apps (BANK_STORAGE, BANK_DATA_FILE / BANK_DB_FILE). A terminal never
+waits for it on the withdrawal path:
+
+  * a card is authorized against a cached copy of the account (balance and
+    PIN hash), fetched from the ledger when missing or older than --ttl;
+  * a withdrawal must fit the cached balance minus what this terminal has not
+    synced yet, and the unsynced amount per account may not exceed
+    --offline-limit (a bigger one syncs first and is checked against fresh
+    numbers);
+  * it is appended and fsynced to <outbox-dir>/<terminal>.outbox before the
+    cash goes out;
+  * a sync thread sends pending withdrawals to Bank.apply_batch in batches.
+    Each carries the note atm:<terminal>:<seq>, and the batch is marked as
+    sent before it goes, so after a crash the terminal looks those notes up
+    in the ledger and only re-sends what is not there.
+
+An entry the ledger rejects (another terminal emptied the account first, or it
+was closed) has already been paid out, so it is never retried: it moves to
+<terminal>.conflicts.jsonl for the bank to settle, and the account is fetched
+again so the terminal stops dispensing against the old balance.
+
+simulate runs that against a throwaway ledger with slow ledger calls and random
+crashes during sync, restarts crashed terminals from their outbox files (and
+every terminal every --restart-every withdrawals, from outboxes compacted every
+--compact-after settled entries), and checks that no ref was handed out twice,
+that every withdrawal paid out ended up in the ledger exactly once or in a
+conflicts file, and that every ledger balance adds up. It also replays one
+exact sequence: a batch only partly committed, recovery settling the newest
+entry and compacting, another crash, a restart; the next withdrawal must get a
+new ref. It exits 1 if anything is off.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Bank Management Project"))
+
+from bank_core import Bank
+from bank_pin import HASHERS, verify_pin
+from bank_storage import open_storage
+
+from ATM import ATM, ConsoleIO, run
+
+BATCH_SIZE = 200
+# how far before an entry's own timestamp its ledger copy is looked for (clock skew)
+RECOVERY_WINDOW = timedelta(hours=1)
+# rewrite the outbox once this many settled records have piled up
+COMPACT_AFTER = 5000
+
+
+class Crash(Exception):
+  # raised by the simulation's ledger to kill a terminal in the middle of a sync
+  pass
+
+
+class CachedAccount:
+  __slots__ = ('user', 'balance', 'fetched')
+
+  def __init__(self, user):
+    self.user = user
+    self.balance = int(user.get('balance', 0))
+    self.fetched = time.monotonic()
+
+
+class Terminal:
+  def __init__(self, name, ledger, outbox_dir='atm_outbox', offline_limit=2000, ttl=60.0, batch_size=BATCH_SIZE):
+    self.name = name
+    self.ledger = ledger
+    self.offline_limit = offline_limit
+    self.ttl = ttl
+    self.batch_size = batch_size
+    self.compact_after = COMPACT_AFTER
+    outbox_dir = Path(outbox_dir)
+    outbox_dir.mkdir(parents=True, exist_ok=True)
+    self.path = outbox_dir / f"{name}.outbox"
+    self.conflicts_path = outbox_dir / f"{name}.conflicts.jsonl"
+    # self.lock guards the outbox and the numbers below; sync_lock allows one sync at a time
+    self.lock = threading.Lock()
+    self.sync_lock = threading.Lock()
+    self.cache = {}        # accountNo -> CachedAccount
+    self.pending = {}      # seq -> outbox entry not yet settled, in seq order
+    self.unsynced = {}     # accountNo -> sum of its pending amounts
+    self.in_flight = set()
+    self.next_seq = 1
+    self.settled = 0
+    self.stats = {'withdrawals': 0, 'synced': 0, 'conflicts': 0, 'batches': 0, 'recovered': 0}
+    self._load()
+    self.fh = self.path.open('a', encoding='utf-8')
+    self._syncer = None
+    self._stop = threading.Event()
+    self.crashed = None
+
+  # ---------- outbox file ----------
+  def _load(self):
+    if self.path.exists():
+      with self.path.open('r', encoding='utf-8') as fh:
+        for line in fh:
+          try:
+            record = json.loads(line)
+          except ValueError:
+            break  # torn last line from a crash mid-write: that withdrawal was never paid
+          if 'w' in record:
+            self.pending[record['w']] = record
+            # after a compaction the oldest pending entry can sit below the {'seq'} header
+            self.next_seq = max(self.next_seq, record['w'] + 1)
+          elif 'sent' in record:
+            self.in_flight.update(record['sent'])
+          elif 'done' in record:
+            for seq in record['done']:
+              self.pending.pop(seq, None)
+              self.in_flight.discard(seq)
+              self.settled += 1
+          elif 'seq' in record:
+            self.next_seq = max(self.next_seq, record['seq'])
+    self.in_flight &= set(self.pending)
+    for entry in self.pending.values():
+      self.unsynced[entry['acc']] = self.unsynced.get(entry['acc'], 0) + entry['amount']
+
+  def _append(self, record):
+    self.fh.write(json.dumps(record, separators=(',', ':')) + "\n")
+    self.fh.flush()
+    os.fsync(self.fh.fileno())
+
+  def _compact(self):
+    # caller holds self.lock: keep the counter and what is still pending
+    tmp = self.path.with_suffix('.tmp')
+    with tmp.open('w', encoding='utf-8') as fh:
+      fh.write(json.dumps({'seq': self.next_seq}) + "\n")
+      for entry in self.pending.values():
+        fh.write(json.dumps(entry, separators=(',', ':')) + "\n")
+      if self.in_flight:
+        fh.write(json.dumps({'sent': sorted(self.in_flight)}) + "\n")
+      fh.flush()
+      os.fsync(fh.fileno())
+    self.fh.close()
+    os.replace(tmp, self.path)
+    self.fh = self.path.open('a', encoding='utf-8')
+    self.settled = 0
+
+  def ref(self, seq):
+    return f"atm:{self.name}:{seq}"
+
+  # ---------- the withdrawal path ----------
+  def account(self, account_no, fresh=False):
+    cached = self.cache.get(account_no)
+    if cached is not None and not fresh and time.monotonic() - cached.fetched <= self.ttl:
+      return cached
+    try:
+      user = self.ledger.find_user(account_no)
+    except Crash:
+      raise
+    except Exception:
+      if cached is None:
+        raise
+      return cached  # ledger unreachable: carry on with the cached copy
+    if user is None:
+      self.cache.pop(account_no, None)
+      return None
+    cached = self.cache[account_no] = CachedAccount(user)
+    return cached
+
+  def authorize(self, account_no, pin):
+    cached = self.account(account_no)
+    return cached is not None and verify_pin(cached.user, pin)
+
+  def available(self, account_no):
+    # may briefly undercount while a batch is in flight, never overcount
+    cached = self.account(account_no)
+    if cached is None:
+      return 0
+    return cached.balance - self.unsynced.get(account_no, 0)
+
+  def withdraw(self, account_no, amount):
+    # records the withdrawal and returns its ledger note; ValueError means no cash
+    if amount <= 0:
+      raise ValueError("Invalid amount")
+    cached = self.account(account_no)
+    if cached is None:
+      raise ValueError("Account not found")
+    if self.unsynced.get(account_no, 0) + amount > self.offline_limit:
+      # too much unconfirmed money on this card: go online for this one
+      self.sync()
+      cached = self.account(account_no, fresh=True)
+      if cached is None:
+        raise ValueError("Account not found")
+      if self.unsynced.get(account_no, 0) + amount > self.offline_limit:
+        raise ValueError("Over the withdrawal limit of this ATM")
+    with self.lock:
+      unsynced = self.unsynced.get(account_no, 0)
+      if amount > cached.balance - unsynced:
+        raise ValueError("Insufficient balance")
+      seq = self.next_seq
+      entry = {'w': seq, 'acc': account_no, 'amount': amount, 'ts': datetime.utcnow().isoformat()}
+      self._append(entry)
+      self.next_seq += 1
+      self.pending[seq] = entry
+      self.unsynced[account_no] = unsynced + amount
+      self.stats['withdrawals'] += 1
+    return self.ref(seq)
+
+  # ---------- sync ----------
+  def _recover(self, seqs):
+    # entries sent before a crash: the ledger has them iff their note is there
+    applied = []
+    end = (datetime.utcnow() + RECOVERY_WINDOW).isoformat()
+    for seq in seqs:
+      entry = self.pending[seq]
+      start = (datetime.fromisoformat(entry['ts']) - RECOVERY_WINDOW).isoformat()
+      ref = self.ref(seq)
+      if any(tx.get('note') == ref for tx in self.ledger.transactions_between(entry['acc'], start, end)):
+        applied.append(seq)
+    return applied
+
+  def _settle(self, applied, rejected, balances):
+    # applied: seqs now in the ledger; rejected: [(seq, reason)] paid out but refused
+    with self.lock:
+      if rejected:
+        with self.conflicts_path.open('a', encoding='utf-8') as fh:
+          for seq, reason in rejected:
+            fh.write(json.dumps(dict(self.pending[seq], ref=self.ref(seq), reason=reason,
+                                     at=datetime.utcnow().isoformat())) + "\n")
+          fh.flush()
+          os.fsync(fh.fileno())
+      done = applied + [seq for seq, _ in rejected]
+      if done:
+        self._append({'done': done})
+      for seq in done:
+        entry = self.pending.pop(seq)
+        self.in_flight.discard(seq)
+        left = self.unsynced[entry['acc']] - entry['amount']
+        if left:
+          self.unsynced[entry['acc']] = left
+        else:
+          del self.unsynced[entry['acc']]
+      for acc, balance in balances.items():
+        if acc in self.cache:
+          self.cache[acc].balance = balance
+      self.settled += len(done)
+      self.stats['synced'] += len(applied)
+      self.stats['conflicts'] += len(rejected)
+      if self.settled >= self.compact_after:
+        self._compact()
+
+  def sync(self):
+    # sends everything pending in batches; returns how many entries were settled
+    settled = 0
+    with self.sync_lock:
+      with self.lock:
+        recovering = sorted(self.in_flight)
+      if recovering:
+        applied = self._recover(recovering)
+        self._settle(applied, [], {})
+        self.stats['recovered'] += len(applied)
+        settled += len(applied)
+      while True:
+        with self.lock:
+          batch = [entry for _, entry in zip(range(self.batch_size), self.pending.values())]
+          if not batch:
+            return settled
+          seqs = [entry['w'] for entry in batch]
+          self._append({'sent': seqs})
+          self.in_flight.update(seqs)
+        ops = [{'op': 'withdraw', 'accountNo': e['acc'], 'amount': e['amount'], 'note': self.ref(e['w'])} for e in batch]
+        result = self.ledger.apply_batch(ops, False)
+        errors = dict(result['errors'])
+        self._settle([seq for row, seq in enumerate(seqs) if row not in errors],
+                     [(seqs[row], reason) for row, reason in errors.items()],
+                     result.get('balances', {}))
+        # a rejection means the cached balance was wrong: fetch it again
+        for acc in {batch[row]['acc'] for row in errors}:
+          self.account(acc, fresh=True)
+        self.stats['batches'] += 1
+        settled += len(batch)
+
+  def start_syncer(self, interval=0.05):
+    def loop():
+      while not self._stop.wait(interval):
+        try:
+          self.sync()
+        except Crash as err:
+          self.crashed = err
+          return
+        except Exception as err:
+          # ledger down: the entries stay pending and go out on a later pass
+          print(f"{self.name}: sync failed: {err}", file=sys.stderr)
+    self._syncer = threading.Thread(target=loop, name=f"sync-{self.name}", daemon=True)
+    self._syncer.start()
+
+  def close(self):
+    self._stop.set()
+    if self._syncer is not None:
+      self._syncer.join()
+    self.fh.close()
+
+
+LEDGER_PROMPTS = {
+  'card': "Enter your account number: ",
+  'card_pin': "Enter your pin",
+}
+
+
+class LedgerATM(ATM):
+  # the ATM menu on a bank account: pins belong to the bank, money goes through the terminal
+  __slots__ = ('terminal', 'account')
+
+  def __init__(self, terminal):
+    super().__init__()
+    self.terminal = terminal
+    self.account = None
+    self.state = 'card'
+
+  def prompt(self):
+    return LEDGER_PROMPTS.get(self.state) or super().prompt()
+
+  def _on_card(self, account_no):
+    self.account = account_no
+    return self._goto('card_pin')
+
+  def _on_card_pin(self, user_pin):
+    try:
+      authorized = self.terminal.authorize(self.account, user_pin)
+    except Exception:
+      # card not cached and the ledger is unreachable: let the customer try again later
+      return self._goto('card', "Not possible")
+    if authorized:
+      self.pin = user_pin
+      return self._goto('menu')
+    self.done = True
+    return "Try again!! Enter correct password please..."
+
+  def _on_menu(self, choice):
+    if choice in ('1', '2'):
+      return self._goto('menu', "Not possible")
+    return super()._on_menu(choice)
+
+  def _on_check_pin(self, user_pin):
+    self.balance = self.terminal.available(self.account)
+    return super()._on_check_pin(user_pin)
+
+  def _on_withdraw_pin(self, user_pin):
+    self.balance = self.terminal.available(self.account)
+    return super()._on_withdraw_pin(user_pin)
+
+  def _on_withdraw_amount(self, text):
+    if not text.isdigit():
+      return self._goto('menu', "Amount must be a number")
+    amount = int(text)
+    try:
+      self.terminal.withdraw(self.account, amount)
+    except ValueError as err:
+      if str(err) == "Insufficient balance":
+        return self._goto('menu', "Garib hai tu!! Limit cross kyun kiya??")
+      return self._goto('menu', str(err))
+    self.balance = self.terminal.available(self.account)
+    return self._goto('menu', f"Successfully Withdraw {amount}\nyour balance is  {self.balance} only")
+
+
+# ---------- simulation ----------
+class SimLedger:
+  # the bank with a slow network in front of it and a terminal that may die mid-sync
+  def __init__(self, bank, latency, crash, seed):
+    self.bank = bank
+    self.latency = latency
+    self.crash = crash
+    self.rng = random.Random(seed)
+    self.rng_lock = threading.Lock()
+    self.crashes = 0
+
+  def _roll(self):
+    with self.rng_lock:
+      return self.rng.random()
+
+  def _wait(self):
+    if self.latency:
+      time.sleep(self.latency * (0.5 + self._roll()))
+
+  def find_user(self, account_no):
+    self._wait()
+    return self.bank.find_user(account_no)
+
+  def transactions_between(self, account_no, start, end):
+    self._wait()
+    return list(self.bank.transactions_between(account_no, start, end))
+
+  def apply_batch(self, ops, atomic=True):
+    self._wait()
+    roll = self._roll()
+    if roll < self.crash / 3:
+      self.crashes += 1
+      raise Crash("terminal died before the batch reached the ledger")
+    if roll < self.crash * 2 / 3 and not atomic and len(ops) > 1:
+      # rows of a non-atomic batch commit one by one: only some of them got through,
+      # so recovery settles newer entries while older ones stay pending
+      with self.rng_lock:
+        some = sorted(self.rng.sample(range(len(ops)), self.rng.randrange(1, len(ops))))
+      self.bank.apply_batch([ops[i] for i in some], atomic)
+      self.crashes += 1
+      raise Crash("terminal died with part of the batch committed")
+    result = self.bank.apply_batch(ops, atomic)
+    if roll < self.crash:
+      self.crashes += 1
+      raise Crash("terminal died after the ledger committed the batch")
+    self._wait()
+    return result
+
+
+class ScriptedLedger:
+  # the bank behind a ledger link that fails on cue, for replaying one exact crash sequence
+  def __init__(self, bank):
+    self.bank = bank
+    self.mode = 'ok'
+
+  def find_user(self, account_no):
+    return self.bank.find_user(account_no)
+
+  def transactions_between(self, account_no, start, end):
+    return list(self.bank.transactions_between(account_no, start, end))
+
+  def apply_batch(self, ops, atomic=True):
+    if self.mode == 'down':
+      raise Crash("terminal died before the batch reached the ledger")
+    if self.mode == 'partial':
+      self.bank.apply_batch(ops[-1:], atomic)
+      raise Crash("terminal died with only the last row committed")
+    return self.bank.apply_batch(ops, atomic)
+
+
+def compact_restart_check(bank, outbox_dir, account_no, amount=20):
+  # newest entry settled, older ones still pending, outbox compacted, terminal restarted:
+  # the next withdrawal must still get a ref never used before. Returns (ok, {ref: (acc, amount)}).
+  ledger = ScriptedLedger(bank)
+
+  def start():
+    terminal = Terminal('compact-check', ledger, outbox_dir, offline_limit=10 ** 9)
+    terminal.compact_after = 1
+    return terminal
+
+  terminal = start()
+  issued = {terminal.withdraw(account_no, amount): (account_no, amount) for _ in range(3)}
+  ledger.mode = 'partial'
+  try:
+    terminal.sync()
+  except Crash:
+    pass
+  terminal.close()
+  # recovery settles the newest entry and compacts; resending the older two dies again
+  terminal = start()
+  ledger.mode = 'down'
+  try:
+    terminal.sync()
+  except Crash:
+    pass
+  terminal.close()
+  terminal = start()
+  ledger.mode = 'ok'
+  ref = terminal.withdraw(account_no, amount)
+  ok = ref not in issued
+  issued[ref] = (account_no, amount)
+  terminal.sync()
+  terminal.close()
+  return ok, issued
+
+
+def _percentiles(latencies):
+  latencies = sorted(latencies)
+  pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e6)
+  return {'p50_us': pick(0.5), 'p99_us': pick(0.99), 'max_us': round(latencies[-1] * 1e6)} if latencies else {}
+
+
+def simulate(args):
+  workdir = Path(tempfile.mkdtemp(prefix="atm_sim_"))
+  outbox_dir = workdir / "outbox"
+  storage = open_storage(args.backend, workdir / ("bank.db" if args.backend == "sqlite" else "data.json"))
+  # cheap PIN hashing: the simulation is about money, not key stretching
+  bank = Bank(storage, {'scheme': 'sha256', 'params': HASHERS['sha256'].default_params})
+  rng = random.Random(args.seed)
+  pin = "1234"
+  accounts = []
+  opening = {}
+  for i in range(args.accounts):
+    acc = bank.create_account(f"Card holder {i}", 30, f"holder{i}@example.com", pin)['accountNo']
+    opening[acc] = bank.deposit(acc, rng.randint(50, 500) * 100)
+    accounts.append(acc)
+  ledger = SimLedger(bank, args.latency, args.crash, args.seed)
+  deposits = {acc: 0 for acc in accounts}
+  paid = {}
+  latencies = []
+  restarts = [0]
+  refused = [0]
+  totals = dict.fromkeys(('withdrawals', 'synced', 'conflicts', 'batches', 'recovered'), 0)
+  results_lock = threading.Lock()
+
+  def retire(terminal):
+    terminal.close()
+    with results_lock:
+      for key in totals:
+        totals[key] += terminal.stats[key]
+  reused = [0]
+
+  def make_terminal(name):
+    terminal = Terminal(name, ledger, outbox_dir, args.offline_limit, args.ttl, args.batch_size)
+    # compact often, so restarts really begin from compacted outboxes
+    terminal.compact_after = args.compact_after
+    return terminal
+
+  def atm(index, count):
+    trng = random.Random(args.seed * 1000 + index)
+    name = f"t{index}"
+    terminal = make_terminal(name)
+    terminal.start_syncer(args.interval)
+    mine = {}
+    times = []
+    for done in range(count):
+      if terminal.crashed is not None or (args.restart_every and done and done % args.restart_every == 0):
+        # restart from the outbox file, as after a power cut (or a planned reboot)
+        retire(terminal)
+        terminal = make_terminal(name)
+        terminal.start_syncer(args.interval)
+        restarts[0] += 1
+      # a few busy cards so terminals really race each other
+      acc = accounts[min(int(trng.expovariate(4 / len(accounts))), len(accounts) - 1)]
+      amount = trng.randint(1, 10) * 20
+      start = time.perf_counter()
+      try:
+        if not terminal.authorize(acc, pin):
+          raise ValueError("bad pin")
+        ref = terminal.withdraw(acc, amount)
+      except Crash:
+        terminal.crashed = True
+        continue
+      except ValueError:
+        with results_lock:
+          refused[0] += 1
+        continue
+      times.append(time.perf_counter() - start)
+      if ref in mine:
+        with results_lock:
+          reused[0] += 1
+      mine[ref] = (acc, amount)
+    retire(terminal)
+    with results_lock:
+      paid.update(mine)
+      latencies.extend(times)
+
+  def teller(stop):
+    # salary payments straight into the ledger while the ATMs run
+    trng = random.Random(args.seed - 1)
+    while not stop.wait(0.01):
+      acc = trng.choice(accounts)
+      amount = trng.randint(1, 5) * 100
+      bank.deposit(acc, amount)
+      deposits[acc] += amount
+
+  per_terminal = [args.withdrawals // args.terminals + (i < args.withdrawals % args.terminals) for i in range(args.terminals)]
+  stop = threading.Event()
+  threads = [threading.Thread(target=atm, args=(i, n)) for i, n in enumerate(per_terminal)]
+  teller_thread = threading.Thread(target=teller, args=(stop,))
+  start = time.perf_counter()
+  teller_thread.start()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  stop.set()
+  teller_thread.join()
+  atm_seconds = time.perf_counter() - start
+
+  compact_restart_ok, issued = compact_restart_check(bank, outbox_dir, accounts[-1])
+  paid.update(issued)
+
+  # every terminal comes back once more and drains its outbox against a healthy ledger
+  left = 0
+  for i in range(args.terminals):
+    terminal = Terminal(f"t{i}", bank, outbox_dir, args.offline_limit, args.ttl, args.batch_size)
+    terminal.sync()
+    left += len(terminal.pending)
+    retire(terminal)
+  drained_seconds = time.perf_counter() - start
+
+  # what the ledger and the conflicts files say happened
+  in_ledger = {}
+  duplicates = 0
+  spent = {acc: 0 for acc in accounts}
+  for acc in accounts:
+    for tx in bank.iter_transactions(acc):
+      note = tx.get('note') or ''
+      if note.startswith('atm:'):
+        duplicates += note in in_ledger
+        in_ledger[note] = (acc, tx['amount'])
+        spent[acc] += tx['amount']
+  conflicts = {}
+  for path in outbox_dir.glob("*.conflicts.jsonl"):
+    with path.open(encoding='utf-8') as fh:
+      for line in fh:
+        entry = json.loads(line)
+        conflicts[entry['ref']] = (entry['acc'], entry['amount'])
+  lost = set(paid) - set(in_ledger) - set(conflicts)
+  unknown = (set(in_ledger) | set(conflicts)) - set(paid)
+  both = set(in_ledger) & set(conflicts)
+  wrong_amount = [ref for ref, got in list(in_ledger.items()) + list(conflicts.items()) if ref in paid and paid[ref] != got]
+  bad_balances = [acc for acc in accounts
+                  if bank.find_user(acc)['balance'] != opening[acc] + deposits[acc] - spent[acc]]
+  report = {
+    'terminals': args.terminals,
+    'accounts': args.accounts,
+    'backend': args.backend,
+    'ledger_latency_s': args.latency,
+    'withdrawals_paid': len(paid),
+    'withdrawals_refused': refused[0],
+    'withdrawal_latency': _percentiles(latencies),
+    'atm_seconds': round(atm_seconds, 3),
+    'drained_seconds': round(drained_seconds, 3),
+    'injected_crashes': ledger.crashes,
+    'terminal_restarts': restarts[0],
+    'in_ledger': len(in_ledger),
+    'conflicts': len(conflicts),
+    'conflict_amount': sum(amount for _, amount in conflicts.values()),
+    'still_pending': left,
+    'lost': len(lost),
+    'double_counted': duplicates + len(both),
+    'reused_refs': reused[0],
+    'compact_restart_ok': compact_restart_ok,
+    'unknown_entries': len(unknown),
+    'wrong_amounts': len(wrong_amount),
+    'balance_mismatches': len(bad_balances),
+    'terminal_stats': totals,
+  }
+  if args.keep:
+    report['workdir'] = str(workdir)
+  else:
+    shutil.rmtree(workdir, ignore_errors=True)
+  print(json.dumps(report, indent=2))
+  ok = not (lost or duplicates or both or unknown or wrong_amount or bad_balances or left or reused[0] or not compact_restart_ok)
+  return 0 if ok else 1
+
+
+def _terminal(args):
+  return Terminal(args.terminal, Bank(), args.outbox_dir, args.offline_limit, args.ttl)
+
+
+def cmd_atm(args):
+  terminal = _terminal(args)
+  terminal.start_syncer(args.interval)
+  try:
+    run(LedgerATM(terminal), ConsoleIO())
+  finally:
+    terminal.close()
+  return cmd_sync(args)
+
+
+def cmd_sync(args):
+  terminal = _terminal(args)
+  try:
+    settled = terminal.sync()
+  except Exception as err:
+    print(f"sync failed, {len(terminal.pending)} withdrawal(s) kept in {terminal.path}: {err}", file=sys.stderr)
+    return 1
+  finally:
+    terminal.close()
+  print(json.dumps({'terminal': args.terminal, 'settled': settled, 'pending': len(terminal.pending),
+                    'conflicts': terminal.stats['conflicts']}))
+  return 0
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  sub = parser.add_subparsers(dest='command', required=True)
+
+  def terminal_options(p):
+    p.add_argument('--outbox-dir', type=Path, default=Path('atm_outbox'))
+    p.add_argument('--offline-limit', type=int, default=2000, help='unsynced amount allowed per account')
+    p.add_argument('--ttl', type=float, default=60.0, help='seconds a cached account is trusted')
+    p.add_argument('--interval', type=float, default=0.05, help='seconds between background syncs')
+
+  p = sub.add_parser('atm', help='run a console session against the ledger')
+  p.add_argument('--terminal', default='atm1')
+  terminal_options(p)
+  p.set_defaults(func=cmd_atm)
+
+  p = sub.add_parser('sync', help="send a terminal's pending withdrawals to the ledger")
+  p.add_argument('--terminal', default='atm1')
+  terminal_options(p)
+  p.set_defaults(func=cmd_sync)
+
+  p = sub.add_parser('simulate', help='many terminals, a slow ledger and crashes; checks the books')
+  p.add_argument('--terminals', type=int, default=8)
+  p.add_argument('--accounts', type=int, default=40)
+  p.add_argument('--withdrawals', type=int, default=4000)
+  p.add_argument('--latency', type=float, default=0.02, help='seconds per ledger call')
+  p.add_argument('--crash', type=float, default=0.05, help='chance a sync batch kills its terminal')
+  p.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+  p.add_argument('--compact-after', type=int, default=50, help='settled entries before an outbox is compacted')
+  p.add_argument('--restart-every', type=int, default=200, help='restart each terminal after this many withdrawals (0: only on crashes)')
+  p.add_argument('--backend', choices=('json', 'sqlite'), default='json')
+  p.add_argument('--seed', type=int, default=1)
+  p.add_argument('--keep', action='store_true', help='keep the ledger and outboxes for inspection')
+  terminal_options(p)
+  p.set_defaults(func=simulate)
+
+  args = parser.parse_args()
+  return args.func(args)
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
@@ -0,0 +1,164 @@
+"""Load generator for the ATM state machine: many scripted sessions on one asyncio loop.
+
+    python atm_load.py --sessions 20000 --concurrency 5000 --steps 40
+    python atm_load.py --sessions 1000 --concurrency 1000 --steps 5000 --think 0.001
+    python atm_load.py --memory 10000     # only measure memory per parked session
+
+Every session gets a seeded script of answers (create pin, balance checks with
+right and wrong pins, withdrawals within and over the limit, pin changes, then
+exit) together with the balance it must end on. Sessions are replayed through
+ATM.arun with an in-memory IO that yields to the loop before every answer
+(--think adds a delay), --concurrency of them live at once, and each final
+balance is checked against its script; any mismatch exits 1.
+
+Memory per session is measured with tracemalloc: --memory sessions (default
+--concurrency) are started and parked at their first prompt, and the traced
+growth is divided by their number. Scripts are built before the measurement.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+
+from ATM import ATM, arun
+
+
+def make_script(rng, steps):
+  # (answers, expected final balance); the model mirrors the ATM's rules
+  pin = str(rng.randint(1000, 9999))
+  balance = rng.randint(0, 100000)
+  lines = ['1', pin, str(balance)]
+  for _ in range(steps):
+    action = rng.random()
+    if action < 0.35:
+      lines += ['3', pin if rng.random() < 0.9 else '0000']
+    elif action < 0.75:
+      if rng.random() < 0.1:
+        lines += ['4', '0000']
+        continue
+      amount = rng.randint(0, balance + 500)
+      lines += ['4', pin, str(amount)]
+      if amount <= balance:
+        balance -= amount
+    elif action < 0.9:
+      new_pin = str(rng.randint(1000, 9999))
+      if rng.random() < 0.9:
+        lines += ['2', pin, new_pin]
+        pin = new_pin
+      else:
+        lines += ['2', '0000']
+    else:
+      # a top-up: create pin again with a new balance
+      balance = rng.randint(0, 100000)
+      lines += ['1', pin, str(balance)]
+  lines.append('5')
+  return lines, balance
+
+
+class ReplayIO:
+  # answers from a script; output is only counted
+  __slots__ = ('lines', 'pos', 'think', 'gate', 'shown')
+
+  def __init__(self, lines, think=0.0, gate=None):
+    self.lines = lines
+    self.pos = 0
+    self.think = think
+    self.gate = gate
+    self.shown = 0
+
+  async def read(self, prompt):
+    if self.gate is not None:
+      await self.gate.wait()
+      self.gate = None
+    # yield every time, like a terminal waiting for a key press
+    await asyncio.sleep(self.think)
+    if self.pos == len(self.lines):
+      raise EOFError
+    line = self.lines[self.pos]
+    self.pos += 1
+    return line
+
+  async def write(self, text):
+    self.shown += 1
+
+
+async def replay(script, think=0.0, gate=None):
+  lines, expected = script
+  atm = await arun(ATM(), ReplayIO(lines, think, gate))
+  return atm.done and atm.balance == expected
+
+
+async def run_load(sessions, concurrency, steps, think, seed):
+  rng = random.Random(seed)
+  queue = iter(range(sessions))
+  stats = {'ok': 0, 'mismatches': 0, 'inputs': 0}
+
+  async def worker():
+    # one live session at a time per worker; scripts are made on demand
+    for _ in queue:
+      script = make_script(rng, steps)
+      stats['inputs'] += len(script[0])
+      if await replay(script, think):
+        stats['ok'] += 1
+      else:
+        stats['mismatches'] += 1
+
+  start = time.perf_counter()
+  await asyncio.gather(*(worker() for _ in range(min(concurrency, sessions))))
+  elapsed = time.perf_counter() - start
+  return dict(stats, seconds=round(elapsed, 3),
+              sessions_per_s=round(sessions / elapsed),
+              inputs_per_s=round(stats['inputs'] / elapsed))
+
+
+async def measure_memory(n, steps, seed):
+  # bytes per session parked at its first prompt (ATM, IO, task and coroutine frames)
+  rng = random.Random(seed)
+  scripts = [make_script(rng, steps) for _ in range(n)]
+  gate = asyncio.Event()
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  tasks = [asyncio.ensure_future(replay(script, 0.0, gate)) for script in scripts]
+  await asyncio.sleep(0)
+  parked = tracemalloc.get_traced_memory()[0] - before
+  tracemalloc.stop()
+  gate.set()
+  results = await asyncio.gather(*tasks)
+  return {'sessions': n, 'bytes_per_session': round(parked / n),
+          'all_correct': all(results)}
+
+
+def _peak_rss_mb():
+  # None where the resource module does not exist (Windows)
+  try:
+    import resource
+  except ImportError:
+    return None
+  return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--sessions', type=int, default=10000)
+  parser.add_argument('--concurrency', type=int, default=1000, help='sessions live at once')
+  parser.add_argument('--steps', type=int, default=40, help='menu actions per session')
+  parser.add_argument('--think', type=float, default=0.0, help='seconds before each answer')
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--memory', type=int, metavar='N', help='only measure memory with N parked sessions')
+  args = parser.parse_args()
+
+  report = {}
+  if args.memory is None:
+    report['load'] = asyncio.run(run_load(args.sessions, args.concurrency, args.steps, args.think, args.seed))
+    report['load'].update(sessions=args.sessions, concurrency=args.concurrency, steps=args.steps, think=args.think)
+  report['memory'] = asyncio.run(measure_memory(args.memory or args.concurrency, args.steps, args.seed))
+  report['peak_rss_mb'] = _peak_rss_mb()
+  print(json.dumps(report, indent=2))
+  failed = report.get('load', {}).get('mismatches') or not report['memory']['all_correct']
+  return 1 if failed else 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
@@ -1,59 +1,142 @@
-#BANK MANAGEMENT PROJECT 
-import json
-import random
-import string
+#BANK MANAGEMENT PROJECT
+import sys
 from pathlib import Path
 
+from bank_account_numbers import AccountNumberAllocator
+from bank_snapshot import load_records, save_records
+from bank_storage import SequenceFile
+
 
 class Bank:
-    database = 'data.json'
-    data = [] 
-    try:
-        if Path(database).exists():
-            with open(database, 'r', encoding='utf-8') as fs:
-                content = fs.read().strip()
-                if content:
-                    data = json.loads(content)
-                else:
-                    data = []
-        else:
-            print("no such file exist")
-    except Exception as err:
-        print(f"an exception occured as {err}")
-        
-    @classmethod
-    def __update(cls):
-        with open(cls.database, 'w', encoding='utf-8') as fs:
-            fs.write(json.dumps(cls.data))
-    @classmethod
-    def __accountgenerate(cls):
-        alpha = ''.join(random.choices(string.ascii_letters, k=3))
-        num = ''.join(random.choices(string.digits, k=3))
-        spchar = random.choice("!@#$%^&*")
-        id_parts = list(alpha + num + spchar)
-        random.shuffle(id_parts)
-        return "".join(id_parts)
-        
-    
-    def createaccount(self):
-       info =  {
-           "name": input("Tell your name:-"),
-            "age": int(input("Tell your age:-")),
-            "email": input("tell your email:-"),
-            "pin": int(input("Tell your 4 number pin:-")),
-            "accountNo": Bank.__accountgenerate(),
-            "balance": 0
+    # nothing is read or written until a Bank is made, so the module imports cleanly;
+    # the methods without input()/print() are the ones to call from other code
+    def __init__(self, database=None, autosave=True):
+        # a binary data.snap (see convert_snapshot.py) opens without parsing every account
+        if database is None:
+            database = 'data.snap' if Path('data.snap').exists() else 'data.json'
+        self.database = Path(database)
+        # with autosave off, changes stay in memory until save() (bulk mode writes once)
+        self.autosave = autosave
+        self.numbers = AccountNumberAllocator(SequenceFile(self.database.with_suffix('.seq')).reserve)
+        self.data = []
+        try:
+            if self.database.exists():
+                self.data = load_records(self.database)
+            else:
+                print("no such file exist")
+        except Exception as err:
+            print(f"an exception occured as {err}")
+        # accountNo -> record; a snapshot has its own sorted index, so none is built for it
+        self.index = None
+        if not hasattr(self.data, 'find'):
+            self.index = {}
+            for i in self.data:
+                if 'accountNo' in i:
+                    self.index.setdefault(i['accountNo'], i)
+
+    def save(self):
+        save_records(self.database, self.data)
+
+    def _changed(self):
+        if self.autosave:
+            self.save()
+
+    def lookup(self, accnumber):
+        if self.index is not None:
+            return self.index.get(accnumber)
+        return self.data.find(accnumber)
+
+    def find(self, accnumber, pin):
+        # only entries that contain both keys can match
+        user = self.lookup(accnumber)
+        if user is not None and 'pin' in user and user['pin'] == pin:
+            return user
+        return None
+
+    def create(self, name, age, email, pin, accnumber=None, balance=0):
+        # accnumber/balance carry over an existing account when importing legacy data
+        if age < 18 or len(str(pin)) != 4:
+            raise ValueError("sorry you cannot create your account")
+        if accnumber is not None and self.lookup(accnumber) is not None:
+            raise ValueError("account number already exists")
+        if balance < 0:
+            raise ValueError("balance cannot be negative")
+        info = {
+            "name": name,
+            "age": age,
+            "email": email,
+            "pin": pin,
+            # unique by construction: a sequence kept next to data.json, permuted so it still looks random
+            "accountNo": accnumber or self.numbers.next(),
+            "balance": balance
         }
-       if info['age'] < 18 or len(str(info['pin']))!=4:
-           print("sorry you cannot create your account")
-       else:
-           print("account has been created succesfully")
-           for i in info:
-               print(f"{i}:{info[i]}")
-           print("please note down your account details")
-           Bank.data.append(info)
-           Bank.__update()
-    
+        self.data.append(info)
+        if self.index is not None:
+            self.index[info['accountNo']] = info
+        self._changed()
+        return info
+
+    def deposit(self, accnumber, pin, amount):
+        user = self.find(accnumber, pin)
+        if user is None:
+            raise ValueError("Sorry no data found")
+        if amount > 10000 or amount <= 0:
+            raise ValueError("sorry the amount is too much or invalid; deposit must be between 1 and 10000")
+        user['balance'] += amount
+        self._changed()
+        return user['balance']
+
+    def withdraw(self, accnumber, pin, amount):
+        user = self.find(accnumber, pin)
+        if user is None:
+            raise ValueError("Sorry no data found")
+        if amount <= 0:
+            raise ValueError("sorry the amount is invalid")
+        if user['balance'] < amount:
+            raise ValueError("sorry you don't have that much money")
+        user['balance'] -= amount
+        self._changed()
+        return user['balance']
+
+    def update(self, accnumber, pin, name="", email="", newpin=""):
+        # empty values keep the current ones; age, account number and balance never change
+        user = self.find(accnumber, pin)
+        if user is None:
+            raise ValueError("no such user found")
+        if name != "":
+            user['name'] = name
+        if email != "":
+            user['email'] = email
+        if newpin != "":
+            user['pin'] = int(newpin)
+        self._changed()
+        return user
+
+    def delete(self, accnumber, pin):
+        user = self.find(accnumber, pin)
+        if user is None:
+            raise ValueError("sorry no such data exist")
+        self.data.pop(self.data.index(user))
+        if self.index is not None:
+            del self.index[accnumber]
+        self._changed()
+
+    def createaccount(self):
+        try:
+            info = self.create(
+                input("Tell your name:-"),
+                int(input("Tell your age:-")),
+                input("tell your email:-"),
+                int(input("Tell your 4 number pin:-")),
+            )
+        except ValueError as err:
+            print(err)
+            return
+        print("account has been created succesfully")
+        for i in info:
+            print(f"{i}:{info[i]}")
+        print("please note down your account details")
+
     def depositmoney(self):
         accnumber = input("Please tell your account number:-").strip()
         try:
@@ -61,27 +144,23 @@ class Bank:
         except ValueError:
             print("Invalid pin format")
             return
-        
-        # FIX: only check entries that contain both keys
-        userdata_list = [i for i in Bank.data if 'accountNo' in i and 'pin' in i and i['accountNo'] == accnumber and i['pin'] == pin]
-        
-        if not userdata_list:
+
+        if self.find(accnumber, pin) is None:
             print("Sorry no data found")
+            return
+        try:
+            amount = int(input("How much you want to deposit:-"))
+        except ValueError:
+            print("Invalid amount")
+            return
+        try:
+            self.deposit(accnumber, pin, amount)
+        except ValueError as err:
+            print(err)
         else:
-            user = userdata_list[0]
-            try:
-                amount = int(input("How much you want to deposit:-"))
-            except ValueError:
-                print("Invalid amount")
-                return
-            if amount > 10000 or amount <= 0:
-                print("sorry the amount is too much or invalid; deposit must be between 1 and 10000")  
-            else:
-                user['balance'] += amount
-                Bank.__update()
-                print("Amount deposited successfully")
-    
-    
+            print("Amount deposited successfully")
+
+
     def withdrawmoney(self):
         accnumber = input("Please tell your account number:-").strip()
         try:
@@ -89,122 +168,103 @@ class Bank:
         except ValueError:
             print("Invalid pin format")
             return
-        
-        # FIX: only check entries that contain both keys
-        userdata_list = [i for i in Bank.data if 'accountNo' in i and 'pin' in i and i['accountNo'] == accnumber and i['pin'] == pin]
-        
-        if not userdata_list:
+
+        if self.find(accnumber, pin) is None:
             print("Sorry no data found")
+            return
+        try:
+            amount = int(input("How much you want to withdraw:-"))
+        except ValueError:
+            print("Invalid amount")
+            return
+        try:
+            self.withdraw(accnumber, pin, amount)
+        except ValueError as err:
+            print(err)
         else:
-            user = userdata_list[0]
-            try:
-                amount = int(input("How much you want to withdraw:-"))
-            except ValueError:
-                print("Invalid amount")
-                return
-            if userdata_list[0]['balance'] < amount:
-                print("sorry you don't have that much money")  
-            else:
-                user['balance'] -= amount
-                Bank.__update()
-                print("Amount withdrew successfully")
+            print("Amount withdrew successfully")
+
 
-    
     def showdetails(self):
         accnumber = input("Please tell your account number:-").strip()
         pin = int(input("please tell your pin as well:-"))
-        userdata_list = [i for i in Bank.data if 'accountNo' in i and 'pin' in i and i['accountNo'] == accnumber and i['pin'] == pin]
+        user = self.find(accnumber, pin)
+        if user is None:
+            print("Sorry no data found")
+            return
         print("Your Information are: \n\n")
-        for i in userdata_list[0]:
-            print(f"{i}:{userdata_list[0][i]}")
-            
-    
+        for i in user:
+            print(f"{i}:{user[i]}")
+
+
     def updatedetails(self):
         accnumber = input("Please tell your account number:-").strip()
         pin = int(input("please tell your pin as well:-"))
-        userdata_list = [i for i in Bank.data if 'accountNo' in i and 'pin' in i and i['accountNo'] == accnumber and i['pin'] == pin]
-        
-        if userdata_list == False:
+
+        if self.find(accnumber, pin) is None:
             print("no such user found")
         else:
-            print("You cannot change the age, account number, balance") 
-            
-            print("Fill the details for change or leave it empty if no change")   
-            newdata = {
-                "name": input("please tell new name or press enter:"),
-                "email": input("Please tell your new Email or press enter to skip:"),
-                "pin":input("Enter new pin or press enter to skip:")
-            }
-            
-            if newdata["name"] == "":
-                newdata["name"] = userdata_list[0]['name']
-            
-            if newdata["email"] == "":
-                newdata["email"] = userdata_list[0]['email']
-            
-            if newdata["pin"] == "":
-                newdata["pin"] = userdata_list[0]['pin']
-                
-            newdata['age'] = userdata_list[0]['age']
-            newdata['accountNo'] = userdata_list[0]['accountNo']
-            newdata['balance'] = userdata_list[0]['balance']
-            
-            if type(newdata["pin"]) == str:
-                newdata["pin"] = int(newdata["pin"])
-            
-            for i in newdata:
-                if newdata[i] == userdata_list[0][i]:
-                    continue
-                else:
-                    userdata_list[0][i] = newdata[i]  
-            Bank.__update()
+            print("You cannot change the age, account number, balance")
+
+            print("Fill the details for change or leave it empty if no change")
+            self.update(
+                accnumber, pin,
+                name=input("please tell new name or press enter:"),
+                email=input("Please tell your new Email or press enter to skip:"),
+                newpin=input("Enter new pin or press enter to skip:"),
+            )
             print("details updtated succesfully")
-            
+
     def Delete(self):
         accnumber = input("Please tell your account number:-").strip()
         pin = int(input("please tell your pin as well:-"))
-        userdata_list = [i for i in Bank.data if 'accountNo' in i and 'pin' in i and i['accountNo'] == accnumber and i['pin'] == pin]
-        
-        if userdata_list == False:
-            print("sorry no such data exist") 
+
+        if self.find(accnumber, pin) is None:
+            print("sorry no such data exist")
         else:
-            check = input("press y if you actually want to delete the account or press n")  
+            check = input("press y if you actually want to delete the account or press n")
             if check == 'n' or check == 'N':
                 print("bypassed")
             else:
-                index = Bank.data.index(userdata_list[0])
-                Bank.data.pop(index)
+                self.delete(accnumber, pin)
                 print("account deleted successfully")
-                Bank.__update
-
-                    
-            
-user = Bank()
-# USER INPUT
-print("press 1 for creating an account")
-print("press 2 for deposit the money in the bank")
-print("press 3 for withdrawing the money")
-print("press 4 for details:")
-print("press 5 for updating the details")
-print("press 6 for deleting your account")
-
-#INPUT
-check = int(input("tell your response:-"))
-
-if check == 1:
-    user.createaccount()
-    
-if check == 2:
-    user.depositmoney()
-
-if check == 3:
-    user.withdrawmoney()
-    
-if check == 4:
-    user.showdetails()
- 
-if check == 5:
-    user.updatedetails() 
-   
-if check == 6:
-    user.Delete()
\ No newline at end of file
+
+
+def main():
+    if len(sys.argv) > 1:
+        # headless bulk mode: python OOPS_Project.py import ops.csv (see oops_bulk.py)
+        from oops_bulk import main as bulk_main
+        return bulk_main(sys.argv[1:])
+    user = Bank()
+    # USER INPUT
+    print("press 1 for creating an account")
+    print("press 2 for deposit the money in the bank")
+    print("press 3 for withdrawing the money")
+    print("press 4 for details:")
+    print("press 5 for updating the details")
+    print("press 6 for deleting your account")
+
+    #INPUT
+    check = int(input("tell your response:-"))
+
+    if check == 1:
+        user.createaccount()
+
+    if check == 2:
+        user.depositmoney()
+
+    if check == 3:
+        user.withdrawmoney()
+
+    if check == 4:
+        user.showdetails()
+
+    if check == 5:
+        user.updatedetails()
+
+    if check == 6:
+        user.Delete()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,475 @@
+"""Local HTTP/JSON service in front of bank_core.Bank, plus a load-test client.
+
+    python bank_api.py serve --port 8765                       # storage from BANK_STORAGE etc.
+    python bank_api.py serve --data bank.db --pin-scheme sha256
+    python bank_api.py load --url http://127.0.0.1:8765 --concurrency 64 --seconds 10
+    python bank_api.py load --spawn --accounts 200             # starts a throwaway server
+
+Endpoints (JSON bodies and responses):
+
+    POST /accounts                       {name, age, email, pin} -> 201 account
+    POST /auth                           {accountNo, pin} -> account, or 401
+    POST /accounts/<acc>/deposit         {amount, note?} -> {accountNo, balance}
+    POST /accounts/<acc>/withdraw        {amount, note?} -> {accountNo, balance}
+    GET  /accounts/<acc>/balance         -> {accountNo, balance}
+    GET  /accounts/<acc>/transactions?offset=0&limit=50   -> newest first
+    GET  /health                         -> service counters
+
+Requests for one account are applied in arrival order; different accounts
+proceed together. Deposits and withdrawals waiting while a commit is in flight
+go into the next one as a single Bank.apply_batch, so one journal write and
+fsync covers many accounts. Commits run on one worker thread, and reads and
+PIN hashing on a thread pool, so the event loop never blocks on storage.
+Concurrent balance reads of one account share a single lookup. The service
+binds to 127.0.0.1; set BANK_API_KEY to require a matching X-Api-Key header.
+"""
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from bank_core import Bank
+from bank_pin import HASHERS, load_policy
+from bank_storage import JsonStorage, SqliteStorage, open_storage
+
+DEFAULT_PORT = 8765
+MAX_BODY = 1 << 16
+MAX_BATCH = 512
+MAX_PAGE = 500
+PUBLIC_FIELDS = ("accountNo", "name", "age", "email", "balance", "created_at", "tx_count")
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _public(user: dict) -> dict:
+    return {k: user.get(k) for k in PUBLIC_FIELDS}
+
+
+def _error_status(err: Exception) -> int:
+    if isinstance(err, RuntimeError):
+        return 503  # Bank._retry gave up: the account stayed busy
+    return 404 if str(err) == "Account not found" else 400
+
+
+class BankService:
+    def __init__(self, bank: Bank, workers: int = 8, max_batch: int = MAX_BATCH):
+        self.bank = bank
+        self.max_batch = max_batch
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="bank-api")
+        self.committer = ThreadPoolExecutor(1, thread_name_prefix="bank-commit")
+        self.locks = {}     # accountNo -> [asyncio.Lock, holders + waiters]
+        self.reads = {}     # accountNo -> in-flight balance lookup
+        self.pending = []   # [(operation, future)] waiting for the next commit
+        self.wakeup = None
+        self.counters = {"requests": 0, "commits": 0, "committed_ops": 0, "reads": 0, "coalesced_reads": 0}
+
+    async def start(self):
+        self.wakeup = asyncio.Event()
+        self._committer_task = asyncio.create_task(self._commit_loop())
+
+    def close(self):
+        self._committer_task.cancel()
+        self.pool.shutdown(wait=True)
+        self.committer.shutdown(wait=True)
+
+    def _run(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.pool, functools.partial(func, *args))
+
+    @contextlib.asynccontextmanager
+    async def _account(self, account_no: str):
+        # per-account FIFO; the entry goes away when nobody holds or waits for it
+        entry = self.locks.get(account_no)
+        if entry is None:
+            entry = self.locks[account_no] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.locks[account_no]
+
+    # ---------- operations ----------
+    async def create(self, body: dict) -> dict:
+        try:
+            age = int(body.get("age", 0))
+        except (TypeError, ValueError):
+            raise HttpError(400, "age must be a whole number") from None
+        user = await self._run(self.bank.create_account, str(body.get("name", "")), age,
+                               str(body.get("email", "")), str(body.get("pin", "")))
+        return _public(user)
+
+    async def authenticate(self, body: dict) -> dict:
+        user = await self._run(self.bank.authenticate, str(body.get("accountNo", "")).strip(), str(body.get("pin", "")))
+        if user is None:
+            raise HttpError(401, "Invalid account number or PIN")
+        return _public(user)
+
+    async def mutate(self, kind: str, account_no: str, body: dict) -> dict:
+        try:
+            amount = int(body.get("amount"))
+        except (TypeError, ValueError):
+            raise HttpError(400, "amount must be a whole number") from None
+        op = {"op": kind, "accountNo": account_no, "amount": amount, "note": str(body.get("note") or "")}
+        async with self._account(account_no):
+            future = asyncio.get_running_loop().create_future()
+            self.pending.append((op, future))
+            self.wakeup.set()
+            balance = await future
+        return {"accountNo": account_no, "balance": balance}
+
+    async def _commit_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.pending:
+                batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+                ops = [op for op, _ in batch]
+                try:
+                    result = await loop.run_in_executor(self.committer, self.bank.apply_batch, ops, False)
+                except Exception as err:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(err)
+                    continue
+                self.counters["commits"] += 1
+                self.counters["committed_ops"] += result["applied"]
+                errors = dict(result["errors"])
+                for row, (op, future) in enumerate(batch):
+                    # a lookup started before this commit must not serve later readers
+                    self.reads.pop(op["accountNo"], None)
+                    if future.done():
+                        continue  # client went away; the operation still stands
+                    if row in errors:
+                        future.set_exception(ValueError(errors[row]))
+                    else:
+                        future.set_result(result["balances"][op["accountNo"]])
+
+    async def balance(self, account_no: str) -> dict:
+        self.counters["reads"] += 1
+        future = self.reads.get(account_no)
+        if future is None:
+            future = self.reads[account_no] = asyncio.ensure_future(self._run(self.bank.find_user, account_no))
+            future.add_done_callback(lambda f, acc=account_no: self.reads.pop(acc, None) if self.reads.get(acc) is f else None)
+        else:
+            self.counters["coalesced_reads"] += 1
+        user = await asyncio.shield(future)
+        if user is None:
+            raise HttpError(404, "Account not found")
+        return {"accountNo": account_no, "balance": user.get("balance", 0)}
+
+    async def transactions(self, account_no: str, query: dict) -> dict:
+        offset = max(0, int(query.get("offset", ["0"])[0]))
+        limit = min(MAX_PAGE, max(1, int(query.get("limit", ["50"])[0])))
+        user = await self._run(self.bank.find_user, account_no)
+        if user is None:
+            raise HttpError(404, "Account not found")
+        rows = await self._run(self.bank.transactions, account_no, offset, limit)
+        return {"accountNo": account_no, "total": user.get("tx_count", 0), "offset": offset, "transactions": rows}
+
+    def health(self) -> dict:
+        out = dict(self.counters, pending=len(self.pending), locked_accounts=len(self.locks))
+        out["ops_per_commit"] = round(self.counters["committed_ops"] / self.counters["commits"], 2) if self.counters["commits"] else None
+        return out
+
+    # ---------- HTTP ----------
+    async def dispatch(self, method: str, target: str, headers: dict, body: bytes):
+        api_key = os.environ.get("BANK_API_KEY")
+        if api_key and headers.get("x-api-key") != api_key:
+            raise HttpError(401, "Missing or wrong X-Api-Key")
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        data = {}
+        if method == "POST":
+            try:
+                data = json.loads(body or b"{}")
+            except ValueError:
+                raise HttpError(400, "Body must be JSON") from None
+            if not isinstance(data, dict):
+                raise HttpError(400, "Body must be a JSON object")
+        route = (method, len(parts) and parts[0], len(parts))
+        if route == ("GET", "health", 1):
+            return 200, self.health()
+        if route == ("POST", "accounts", 1):
+            return 201, await self.create(data)
+        if route == ("POST", "auth", 1):
+            return 200, await self.authenticate(data)
+        if len(parts) == 3 and parts[0] == "accounts":
+            action = (method, parts[2])
+            if action in (("POST", "deposit"), ("POST", "withdraw")):
+                return 200, await self.mutate(parts[2], parts[1], data)
+            if action == ("GET", "balance"):
+                return 200, await self.balance(parts[1])
+            if action == ("GET", "transactions"):
+                return 200, await self.transactions(parts[1], parse_qs(url.query))
+            if parts[2] in ("deposit", "withdraw", "balance", "transactions"):
+                raise HttpError(405, f"{method} not allowed here")
+        raise HttpError(404, "No such endpoint")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # minimal HTTP/1.1 with keep-alive; one request at a time per connection
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    raw = await reader.readline()
+                    if raw in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = raw.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if length > MAX_BODY:
+                    status, payload, keep_alive = 413, {"error": "Body too large"}, False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    self.counters["requests"] += 1
+                    try:
+                        status, payload = await self.dispatch(method, target, headers, body)
+                    except HttpError as err:
+                        status, payload = err.status, {"error": str(err)}
+                    except (ValueError, RuntimeError) as err:
+                        status, payload = _error_status(err), {"error": str(err)}
+                    except Exception as err:
+                        status, payload = 500, {"error": f"{type(err).__name__}: {err}"}
+                data = json.dumps(payload).encode("utf-8")
+                head = f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                if not keep_alive:
+                    head += "Connection: close\r\n"
+                writer.write(head.encode("latin-1") + b"\r\n" + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+
+
+def _storage(path):
+    if path is None:
+        return open_storage()
+    path = Path(path)
+    return SqliteStorage(path) if path.suffix == ".db" else JsonStorage(path)
+
+
+async def serve(args):
+    policy = load_policy()
+    if args.pin_scheme and args.pin_scheme != policy["scheme"]:
+        policy = {"scheme": args.pin_scheme, "params": HASHERS[args.pin_scheme].default_params}
+    storage = _storage(args.data)
+    service = BankService(Bank(storage, pin_policy=policy), workers=args.workers, max_batch=args.max_batch)
+    await service.start()
+    server = await asyncio.start_server(service.handle, args.host, args.port, backlog=1024)
+    print(f"bank API on http://{args.host}:{args.port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+        storage.close()
+
+
+# ---------- load test client ----------
+class Connection:
+    def __init__(self, host: str, port: int, api_key: str = None):
+        self.host, self.port, self.api_key = host, port, api_key
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: dict = None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(data)}\r\n"
+        if data:
+            head += "Content-Type: application/json\r\n"
+        if self.api_key:
+            head += f"X-Api-Key: {self.api_key}\r\n"
+        self.writer.write(head.encode("latin-1") + b"\r\n" + data)
+        status = int((await self.reader.readline()).split()[1])
+        length, close = 0, False
+        while True:
+            raw = await self.reader.readline()
+            if raw in (b"\r\n", b""):
+                break
+            key, _, value = raw.decode("latin-1").partition(":")
+            key = key.strip().lower()
+            if key == "content-length":
+                length = int(value)
+            elif key == "connection" and value.strip().lower() == "close":
+                close = True
+        payload = json.loads(await self.reader.readexactly(length)) if length else None
+        if close:
+            self.close()
+        return status, payload
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def _mix(spec: str) -> list:
+    # "deposit:40,withdraw:10,balance:50" -> [(op, cumulative weight)]
+    out, total = [], 0
+    for part in spec.split(","):
+        op, _, weight = part.partition(":")
+        total += float(weight or 1)
+        out.append((op.strip(), total))
+    return [(op, w / total) for op, w in out]
+
+
+async def load_test(args) -> dict:
+    from bank_bench import summarize
+
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    api_key = args.api_key or os.environ.get("BANK_API_KEY")
+    setup = Connection(host, port, api_key)
+    accounts = []
+    for i in range(args.accounts):
+        status, user = await setup.request("POST", "/accounts", {"name": f"load{i}", "age": 30,
+                                                                 "email": f"load{i}@example.com", "pin": "1234"})
+        if status != 201:
+            raise SystemExit(f"could not create test accounts: {status} {user}")
+        accounts.append(user["accountNo"])
+        await setup.request("POST", f"/accounts/{user['accountNo']}/deposit", {"amount": 1000000})
+    setup.close()
+
+    mix = _mix(args.mix)
+    latencies = {op: [] for op, _ in mix}
+    statuses = {}
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + args.seconds
+
+    async def worker():
+        conn = Connection(host, port, api_key)
+        try:
+            while time.perf_counter() < deadline:
+                r = rng.random()
+                op = next(o for o, w in mix if r <= w)
+                acc = rng.choice(accounts)
+                start = time.perf_counter()
+                if op == "balance":
+                    status, _ = await conn.request("GET", f"/accounts/{acc}/balance")
+                elif op == "transactions":
+                    status, _ = await conn.request("GET", f"/accounts/{acc}/transactions?limit=20")
+                elif op == "auth":
+                    status, _ = await conn.request("POST", "/auth", {"accountNo": acc, "pin": "1234"})
+                else:
+                    status, _ = await conn.request("POST", f"/accounts/{acc}/{op}", {"amount": rng.randint(1, 100)})
+                latencies[op].append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            conn.close()
+
+    began = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - began
+    everything = [x for v in latencies.values() for x in v]
+    if not everything:
+        raise SystemExit("no requests completed")
+    overall = summarize(everything, elapsed)
+    health = Connection(host, port, api_key)
+    _, server = await health.request("GET", "/health")
+    health.close()
+    return {
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "accounts": args.accounts,
+        "seconds": round(elapsed, 2),
+        "requests": overall["count"],
+        "rps": overall["ops_per_s"],
+        "p50_ms": round(overall["p50_us"] / 1000, 3),
+        "p99_ms": round(overall["p99_us"] / 1000, 3),
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "by_op": {op: dict(summarize(v, elapsed)) for op, v in latencies.items() if v},
+        "server": server,
+    }
+
+
+def cmd_load(args):
+    server = workdir = None
+    if args.spawn:
+        # throwaway server on a temporary database, cheap PIN hashing so setup is quick
+        workdir = Path(tempfile.mkdtemp(prefix="bank_api_"))
+        port = args.port or DEFAULT_PORT + 1
+        server = subprocess.Popen(
+            [sys.executable, __file__, "serve", "--port", str(port), "--data", str(workdir / ("data" + args.spawn_suffix)),
+             "--pin-scheme", "sha256"],
+            stdout=subprocess.PIPE, text=True, cwd=Path(__file__).resolve().parent,
+        )
+        server.stdout.readline()  # the "bank API on ..." line means it is listening
+        args.url = f"http://127.0.0.1:{port}"
+    try:
+        report = asyncio.run(load_test(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve", help="run the API")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--data", type=Path, help="data.json / data.snap / bank.db; default from BANK_STORAGE")
+    p.add_argument("--workers", type=int, default=8, help="threads for reads and PIN hashing")
+    p.add_argument("--max-batch", type=int, default=MAX_BATCH, help="most operations in one commit")
+    p.add_argument("--pin-scheme", choices=sorted(HASHERS), help="override the PIN policy")
+    p.set_defaults(func=lambda a: asyncio.run(serve(a)))
+
+    p = sub.add_parser("load", help="drive a running (or --spawn'ed) server and report rps and latency")
+    p.add_argument("--url", default=f"http://127.0.0.1:{DEFAULT_PORT}")
+    p.add_argument("--spawn", action="store_true", help="start a server on a temporary database")
+    p.add_argument("--spawn-suffix", choices=[".json", ".snap", ".db"], default=".json")
+    p.add_argument("--port", type=int, help="port for --spawn")
+    p.add_argument("--concurrency", type=int, default=64)
+    p.add_argument("--seconds", type=float, default=10)
+    p.add_argument("--accounts", type=int, default=100)
+    p.add_argument("--mix", default="deposit:40,withdraw:10,balance:45,transactions:5")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--api-key")
+    p.set_defaults(func=cmd_load)
+
+    args = parser.parse_args()
+    try:
+        raise SystemExit(args.func(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Latency and throughput benchmarks for the bank engines, as JSON.
+
+    python bank_bench.py run --sizes 1000,10000 --transactions 10 --out bench.json
+    python bank_bench.py run --engines sqlite --sizes 100000 --ops 2000
+    python bank_bench.py compare baseline.json bench.json --tolerance 0.25
+
+Engines: json and snap are bank_core.Bank on JsonStorage (data.json / binary
+data.snap), sqlite is bank_core.Bank on SqliteStorage, oops is the Bank class
+from OOPS_Project.py. Every run builds a fresh dataset per engine and size
+with bank_datagen.py in a temporary directory, then times create_account,
+authenticate, deposit, withdraw, find_user, save, load and the CSV exports.
+Each operation stops after --ops calls or --budget seconds, whichever comes
+first. Latencies are in microseconds; ops_per_s is calls over total time.
+
+compare exits 1 when any operation's p50 latency or throughput in the second
+file is worse than the first by more than the tolerance, so it can gate CI.
+"""
+import argparse
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bank_core import Bank
+from bank_datagen import PIN, write_dataset, write_oops_dataset
+from bank_export import iter_accounts_csv, iter_transactions_csv
+from bank_pin import HASHERS
+from bank_storage import JsonStorage, SqliteStorage
+import OOPS_Project
+
+ENGINES = ("json", "snap", "sqlite", "oops")
+SUFFIX = {"json": ".json", "snap": ".snap", "sqlite": ".db", "oops": ".json"}
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    # latencies in seconds; nearest-rank percentiles
+    ordered = sorted(latencies)
+    n = len(ordered)
+
+    def pct(p):
+        return round(ordered[min(n - 1, max(0, -(-p * n // 100) - 1))] * 1e6, 1)
+
+    return {
+        "count": n,
+        "p50_us": pct(50),
+        "p90_us": pct(90),
+        "p99_us": pct(99),
+        "max_us": round(ordered[-1] * 1e6, 1),
+        "mean_us": round(sum(ordered) / n * 1e6, 1),
+        "ops_per_s": round(n / elapsed, 1) if elapsed else None,
+    }
+
+
+def timed(func, args_iter, ops: int, budget: float) -> dict:
+    # calls func(*args) for each args until ops calls or budget seconds
+    latencies = []
+    clock = time.perf_counter
+    began = clock()
+    for args in args_iter:
+        start = clock()
+        func(*args)
+        latencies.append(clock() - start)
+        if len(latencies) >= ops or clock() - began >= budget:
+            break
+    return summarize(latencies, clock() - began)
+
+
+def _drain(chunks) -> int:
+    return sum(len(c) for c in chunks)
+
+
+def _open(engine: str, path: Path):
+    return SqliteStorage(path) if engine == "sqlite" else JsonStorage(path)
+
+
+def bench_core(engine: str, path: Path, accounts: list, args) -> dict:
+    rng = random.Random(args.seed)
+    pick = lambda: (rng.choice(accounts),)
+    policy = {"scheme": args.pin_scheme, "params": HASHERS[args.pin_scheme].default_params}
+    results = {}
+
+    def load():
+        _open(engine, path).close()
+
+    results["load"] = timed(load, iter(lambda: (), None), args.load_ops, args.budget)
+    storage = _open(engine, path)
+    bank = Bank(storage, pin_policy=policy)
+    try:
+        counter = iter(range(10 ** 9))
+        results["create_account"] = timed(
+            lambda i: bank.create_account(f"bench{i}", 30, f"bench{i}@example.com", PIN),
+            ((next(counter),) for _ in iter(int, 1)), args.ops, args.budget)
+        results["authenticate"] = timed(lambda a: bank.authenticate(a, PIN), iter(pick, None), args.ops, args.budget)
+        results["find_user"] = timed(bank.find_user, iter(pick, None), args.ops, args.budget)
+        touched = []
+
+        def deposit(a):
+            bank.deposit(a, 100)
+            touched.append(a)
+
+        results["deposit"] = timed(deposit, iter(pick, None), args.ops, args.budget)
+        # withdraw only from accounts just topped up, so every call succeeds
+        results["withdraw"] = timed(lambda a: bank.withdraw(a, 1), ((a,) for a in touched), args.ops, args.budget)
+        results["save"] = timed(bank.save, iter(lambda: (), None), args.load_ops, args.budget)
+
+        start = time.perf_counter()
+        size = _drain(iter_accounts_csv(bank))
+        elapsed = time.perf_counter() - start
+        n = storage.count()
+        results["export_accounts_csv"] = {"rows": n, "bytes": size, "seconds": round(elapsed, 3),
+                                          "rows_per_s": round(n / elapsed, 1) if elapsed else None}
+        results["export_transactions_csv"] = timed(lambda a: _drain(iter_transactions_csv(bank, a)),
+                                                   iter(pick, None), args.ops, args.budget)
+    finally:
+        storage.close()
+    return results
+
+
+def bench_oops(path: Path, accounts: list, args) -> dict:
+    # every OOPS_Project write rewrites the whole file, so these usually hit the budget first
+    rng = random.Random(args.seed)
+    pick = lambda: (rng.choice(accounts), int(PIN))
+    results = {"load": timed(lambda: OOPS_Project.Bank(path), iter(lambda: (), None), args.load_ops, args.budget)}
+    bank = OOPS_Project.Bank(path)
+    counter = iter(range(10 ** 9))
+    results["create_account"] = timed(lambda i: bank.create(f"bench{i}", 30, f"bench{i}@example.com", int(PIN)),
+                                      ((next(counter),) for _ in iter(int, 1)), args.ops, args.budget)
+    results["find_user"] = timed(bank.find, iter(pick, None), args.ops, args.budget)
+    touched = []
+
+    def deposit(a, pin):
+        bank.deposit(a, pin, 100)
+        touched.append((a, pin))
+
+    results["deposit"] = timed(deposit, iter(pick, None), args.ops, args.budget)
+    results["withdraw"] = timed(lambda a, pin: bank.withdraw(a, pin, 1), iter(touched), args.ops, args.budget)
+    results["save"] = timed(bank.save, iter(lambda: (), None), args.load_ops, args.budget)
+    return results
+
+
+def _account_numbers(engine: str, path: Path) -> list:
+    if engine == "oops":
+        return [u["accountNo"] for u in OOPS_Project.Bank(path).data]
+    storage = _open(engine, path)
+    try:
+        return [u["accountNo"] for u in storage.accounts()]
+    finally:
+        storage.close()
+
+
+def cmd_run(args):
+    sizes = [int(s) for s in args.sizes.split(",")]
+    engines = args.engines.split(",")
+    for engine in engines:
+        if engine not in ENGINES:
+            raise SystemExit(f"unknown engine {engine}; choose from {', '.join(ENGINES)}")
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "transactions_per_account": args.transactions,
+            "pin_scheme": args.pin_scheme,
+            "ops": args.ops,
+            "budget_s": args.budget,
+        },
+        "runs": [],
+    }
+    for engine in engines:
+        for size in sizes:
+            workdir = Path(tempfile.mkdtemp(prefix="bank_bench_"))
+            try:
+                path = workdir / ("data" + SUFFIX[engine])
+                start = time.perf_counter()
+                if engine == "oops":
+                    write_oops_dataset(path, size, args.transactions, args.seed)
+                else:
+                    write_dataset(path, size, args.transactions, args.seed, args.pin_scheme)
+                generate_s = time.perf_counter() - start
+                accounts = _account_numbers(engine, path)
+                ops = bench_oops(path, accounts, args) if engine == "oops" else bench_core(engine, path, accounts, args)
+                report["runs"].append({
+                    "engine": engine,
+                    "accounts": size,
+                    "dataset_bytes": path.stat().st_size,
+                    "generate_s": round(generate_s, 2),
+                    "ops": ops,
+                })
+                print(f"{engine} x {size}: done", file=sys.stderr)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n", encoding="utf-8")
+    print(text)
+    return 0
+
+
+def cmd_compare(args):
+    def load(path):
+        with path.open("r", encoding="utf-8") as fh:
+            return {(r["engine"], r["accounts"]): r["ops"] for r in json.load(fh)["runs"]}
+
+    base, new = load(args.baseline), load(args.current)
+    regressions = []
+    for key in sorted(base.keys() & new.keys()):
+        for op, before in base[key].items():
+            after = new[key].get(op)
+            if after is None:
+                continue
+            for metric, worse in (("p50_us", after.get("p50_us", 0) > before.get("p50_us", 0) * (1 + args.tolerance)),
+                                  ("ops_per_s", (after.get("ops_per_s") or 0) < (before.get("ops_per_s") or 0) / (1 + args.tolerance))):
+                if metric in before and worse:
+                    regressions.append({"engine": key[0], "accounts": key[1], "op": op, "metric": metric,
+                                        "baseline": before[metric], "current": after[metric]})
+    print(json.dumps({"compared": len(base.keys() & new.keys()), "regressions": regressions}, indent=2))
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="build datasets and time every operation")
+    p.add_argument("--engines", default=",".join(ENGINES))
+    p.add_argument("--sizes", default="1000,10000", help="comma-separated account counts")
+    p.add_argument("--transactions", type=int, default=10, help="per generated account")
+    p.add_argument("--ops", type=int, default=1000, help="calls per operation")
+    p.add_argument("--load-ops", type=int, default=5, help="calls for load and save")
+    p.add_argument("--budget", type=float, default=10, help="seconds per operation")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--pin-scheme", choices=sorted(HASHERS), default="sha256",
+                   help="sha256 measures the engine; scrypt adds the real login cost")
+    p.add_argument("--out", type=Path)
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("compare", help="fail on regressions between two run outputs")
+    p.add_argument("baseline", type=Path)
+    p.add_argument("current", type=Path)
+    p.add_argument("--tolerance", type=float, default=0.25)
+    p.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    raise SystemExit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
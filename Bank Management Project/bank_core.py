@@ -0,0 +1,268 @@
+import re
+import random
+import threading
+import time
+from datetime import datetime
+
+from bank_account_numbers import AccountNumberAllocator, is_plausible
+from bank_pin import load_policy, needs_rehash, pin_fields, verify_pin
+from bank_storage import ConflictError, Storage, open_storage
+
+# how often a commit is retried after another writer changed the account first
+COMMIT_RETRIES = 50
+MAX_DEPOSIT = 1000000
+
+
+class BatchError(ValueError):
+    # raised by an all-or-nothing batch; errors is [(row, message), ...]
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} operation(s) rejected, nothing applied")
+        self.errors = errors
+
+# ---------- Security helpers ----------
+def _is_valid_email(email: str) -> bool:
+    return bool(re.match(r"^[^@\s]+@[^@\s]+\.[^@\s]+$", email))
+
+# ---------- Core bank logic ----------
+class Bank:
+    # One instance may be shared by many Streamlit sessions (threads), so every
+    # read-modify-write runs under a lock.
+    def __init__(self, storage: Storage = None, pin_policy: dict = None):
+        self.storage = storage if storage is not None else open_storage()
+        self.lock = threading.RLock()
+        # {"scheme": ..., "params": {...}} used for new PINs and login rehashes
+        self.pin_policy = pin_policy or load_policy()
+        self.account_numbers = AccountNumberAllocator(self.storage.reserve_account_numbers)
+
+    @property
+    def generation(self) -> int:
+        return self.storage.generation
+
+    def save(self):
+        with self.lock:
+            self.storage.save()
+
+    def reload(self):
+        with self.lock:
+            self.storage.reload()
+
+    def refresh(self) -> bool:
+        with self.lock:
+            return self.storage.refresh()
+
+    def _retry(self, attempt):
+        # attempt() re-reads the account and commits against the version it saw;
+        # on ConflictError the storage has caught up, so simply run it again
+        for i in range(COMMIT_RETRIES):
+            try:
+                with self.lock:
+                    return attempt()
+            except ConflictError:
+                time.sleep(random.uniform(0, 0.001 * (i + 1)))
+        raise RuntimeError("Account is busy, please try again")
+
+    def find_user(self, account_no: str):
+        # a mistyped new-style number fails its check character before any lookup
+        if not is_plausible(account_no):
+            return None
+        return self.storage.get(account_no)
+
+    def find_by_email(self, email: str) -> list:
+        return self.storage.find_by_email(email)
+
+    def accounts(self):
+        return self.storage.accounts()
+
+    def transactions(self, account_no: str, offset: int = 0, limit: int = None) -> list:
+        # newest first
+        return self.storage.transactions(account_no, offset, limit)
+
+    def iter_transactions(self, account_no: str):
+        # oldest first, without loading the whole history
+        return self.storage.iter_transactions(account_no)
+
+    def balance_at(self, account_no: str, ts: str) -> int:
+        # balance at the instant ts (ISO date or datetime): every transaction strictly before it
+        balance = self.storage.balance_at(account_no, ts)
+        if balance is None:
+            raise ValueError("Account not found")
+        return balance
+
+    def transactions_between(self, account_no: str, start: str, end: str):
+        # start <= ts < end, oldest first, without reading history outside the range
+        return self.storage.transactions_between(account_no, start, end)
+
+    def query_accounts(self, sort: str = "created_at", descending: bool = False, search: str = None,
+                       field: str = "name", offset: int = 0, limit: int = 50) -> dict:
+        # one page of accounts, optionally filtered by a case-insensitive prefix of field
+        with self.lock:
+            return self.storage.query_accounts(sort, descending, search, field, offset, limit)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return self.storage.stats()
+
+    def create_account(self, name: str, age: int, email: str, pin: str) -> dict:
+        name = name.strip()
+        email = email.strip()
+        if not name:
+            raise ValueError("Name is required")
+        if age < 18:
+            raise ValueError("Minimum age is 18")
+        if not _is_valid_email(email):
+            raise ValueError("Enter a valid email")
+        if len(pin) != 4 or not pin.isdigit():
+            raise ValueError("PIN must be 4 digits")
+
+        pin_record = pin_fields(pin, self.pin_policy)
+
+        def attempt():
+            # unique by construction; a retry only happens if an old random number is hit
+            acc = self.account_numbers.next()
+            user = {
+                "name": name,
+                "age": age,
+                "email": email,
+                **pin_record,
+                "accountNo": acc,
+                "balance": 0,
+                "created_at": datetime.utcnow().isoformat(),
+                "tx_count": 0,
+                "version": 0,
+            }
+            self.storage.insert(user)
+            return user
+        return self._retry(attempt)
+
+    def authenticate(self, account_no: str, pin: str):
+        # hashing runs outside the bank lock; it is deliberately slow
+        user = self.find_user(account_no)
+        if not user or not verify_pin(user, pin):
+            return None
+        if needs_rehash(user, self.pin_policy):
+            changes = pin_fields(pin, self.pin_policy)
+            try:
+                with self.lock:
+                    self.storage.update(account_no, changes, expected_version=user.get("version", 0))
+                user = self.find_user(account_no) or user
+            except ConflictError:
+                pass  # changed meanwhile; the upgrade happens on a later login
+        return user
+
+    def _record_tx(self, user: dict, kind: str, amount: int, balance: int, note: str):
+        self.storage.append_tx(user["accountNo"], {
+            "ts": datetime.utcnow().isoformat(),
+            "type": kind,
+            "amount": int(amount),
+            "balance": balance,
+            "note": note,
+        }, expected_version=user.get("version", 0))
+        return balance
+
+    def deposit(self, account_no: str, amount: int, note: str = ""):
+        if amount <= 0 or amount > MAX_DEPOSIT:
+            raise ValueError("Amount must be between 1 and 1,000,000")
+
+        def attempt():
+            user = self.find_user(account_no)
+            if not user:
+                raise ValueError("Account not found")
+            balance = int(user.get("balance", 0)) + int(amount)
+            return self._record_tx(user, "deposit", amount, balance, note)
+        return self._retry(attempt)
+
+    def withdraw(self, account_no: str, amount: int, note: str = ""):
+        if amount <= 0:
+            raise ValueError("Invalid amount")
+
+        def attempt():
+            user = self.find_user(account_no)
+            if not user:
+                raise ValueError("Account not found")
+            if user.get("balance", 0) < amount:
+                raise ValueError("Insufficient balance")
+            balance = int(user.get("balance", 0)) - int(amount)
+            return self._record_tx(user, "withdraw", amount, balance, note)
+        return self._retry(attempt)
+
+    def apply_batch(self, operations, atomic: bool = True) -> dict:
+        # operations: dicts with op ("deposit"/"withdraw"), accountNo, amount and optional note.
+        # Everything is validated first (withdrawals see earlier rows' balances), then
+        # committed in one storage write. atomic=False commits the valid rows and
+        # reports the rest instead of raising BatchError.
+        ops = operations if isinstance(operations, list) else list(operations)
+
+        def attempt():
+            balances = {}
+            versions = {}
+            entries = []
+            errors = []
+            ts = datetime.utcnow().isoformat()
+            for row, op in enumerate(ops):
+                try:
+                    kind = op.get("op")
+                    acc = str(op.get("accountNo", "")).strip()
+                    amount = int(op.get("amount"))
+                    if kind not in ("deposit", "withdraw"):
+                        raise ValueError(f"Unknown operation: {kind}")
+                    if acc not in balances:
+                        user = self.find_user(acc)
+                        if not user:
+                            raise ValueError("Account not found")
+                        balances[acc] = int(user.get("balance", 0))
+                        versions[acc] = user.get("version", 0)
+                    if kind == "deposit":
+                        if amount <= 0 or amount > MAX_DEPOSIT:
+                            raise ValueError("Amount must be between 1 and 1,000,000")
+                        balance = balances[acc] + amount
+                    else:
+                        if amount <= 0:
+                            raise ValueError("Invalid amount")
+                        if balances[acc] < amount:
+                            raise ValueError("Insufficient balance")
+                        balance = balances[acc] - amount
+                except (TypeError, ValueError) as e:
+                    errors.append((row, str(e)))
+                    continue
+                balances[acc] = balance
+                entries.append((acc, {"ts": ts, "type": kind, "amount": amount, "balance": balance, "note": op.get("note") or ""}))
+            if errors and atomic:
+                raise BatchError(errors)
+            if entries:
+                touched = {acc for acc, _ in entries}
+                self.storage.append_tx_batch(entries, {acc: versions[acc] for acc in touched})
+            # balances: each touched account's balance after its last applied row
+            return {"applied": len(entries), "errors": errors, "balances": {acc: balances[acc] for acc, _ in entries}}
+        return self._retry(attempt)
+
+    def update_details(self, account_no: str, **kwargs):
+        user = self.find_user(account_no)
+        if not user:
+            raise ValueError("Account not found")
+        changes = {}
+        if "name" in kwargs and kwargs["name"] is not None:
+            changes["name"] = kwargs["name"].strip()
+        if "email" in kwargs and kwargs["email"] is not None:
+            if not _is_valid_email(kwargs["email"]):
+                raise ValueError("Enter a valid email")
+            changes["email"] = kwargs["email"].strip()
+        if "pin" in kwargs and kwargs["pin"]:
+            pin = kwargs["pin"]
+            if len(pin) != 4 or not pin.isdigit():
+                raise ValueError("PIN must be 4 digits")
+            changes.update(pin_fields(pin, self.pin_policy))
+
+        def attempt():
+            current = self.find_user(account_no)
+            if not current:
+                raise ValueError("Account not found")
+            self.storage.update(account_no, changes, expected_version=current.get("version", 0))
+            return self.find_user(account_no)
+        return self._retry(attempt)
+
+    def delete_account(self, account_no: str):
+        with self.lock:
+            if not self.storage.exists(account_no):
+                raise ValueError("Account not found")
+            self.storage.delete(account_no)
+        return True
@@ -0,0 +1,142 @@
+"""Seeded synthetic bank data: N accounts with M transactions each.
+
+    python bank_datagen.py data.json --accounts 10000 --transactions 20
+    python bank_datagen.py data.snap --accounts 1000000 --seed 7
+    python bank_datagen.py bank.db --accounts 10000 --transactions 50
+    python bank_datagen.py oops.json --accounts 10000 --format oops   # OOPS_Project.py records
+
+The target's suffix picks the layout: .json and .snap are the JsonStorage
+snapshot with history in segment files, .db is SqliteStorage. Account numbers
+are reserved from the target's own sequence, so the app and the generator
+never hand out the same number. Every account's PIN is 1234; it is hashed
+once with the given scheme and shared, so generation cost does not depend on
+the PIN policy. The same seed always gives the same names, balances and
+histories.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bank_account_numbers import FeistelPermutation, encode
+from bank_pin import HASHERS, pin_fields
+from bank_snapshot import save_records
+from bank_storage import HistoryStore, SequenceFile, SqliteStorage
+
+PIN = "1234"
+START = datetime(2024, 1, 1)
+
+
+def generate(accounts: int, transactions: int, seed: int, numbers, pin: dict):
+    # numbers(i) -> accountNo; pin: stored pin fields shared by every account.
+    # Yields account dicts with their history inline under "transactions".
+    rng = random.Random(seed)
+    for i in range(accounts):
+        created = START + timedelta(seconds=rng.randrange(86400 * 365))
+        ts = created
+        balance = deposited = 0
+        txs = []
+        for _ in range(transactions):
+            ts += timedelta(seconds=rng.randrange(1, 86400 * 3))
+            amount = rng.randint(1, 5000)
+            kind = "deposit" if amount > balance or rng.random() < 0.6 else "withdraw"
+            if kind == "deposit":
+                balance += amount
+                deposited += amount
+            else:
+                balance -= amount
+            txs.append({"ts": ts.isoformat(), "type": kind, "amount": amount, "balance": balance, "note": ""})
+        user = {
+            "name": f"customer{i}",
+            "age": rng.randint(18, 90),
+            "email": f"customer{i}@example.com",
+            "accountNo": numbers(i),
+            "balance": balance,
+            "created_at": created.isoformat(),
+            "tx_count": transactions,
+            "total_deposited": deposited,
+            "version": 0,
+        }
+        user.update(pin)
+        user["transactions"] = txs
+        yield user
+
+
+def _numbers(start: int, key: bytes):
+    perm = FeistelPermutation(key)
+    return lambda i: encode(perm.permute(start + i))
+
+
+def write_dataset(path: Path, accounts: int, transactions: int, seed: int = 1, pin_scheme: str = "sha256") -> int:
+    # writes a fresh dataset at path (json/snap/db); returns the account count
+    path = Path(path)
+    pin = pin_fields(PIN, {"scheme": pin_scheme, "params": HASHERS[pin_scheme].default_params})
+    if path.suffix == ".db":
+        db = SqliteStorage(path)
+        try:
+            if db.count():
+                raise SystemExit(f"{path} already holds accounts")
+            start, key = db.reserve_account_numbers(max(accounts, 1))
+            return db.insert_many(generate(accounts, transactions, seed, _numbers(start, key), pin))
+        finally:
+            db.close()
+
+    sequence = SequenceFile(path.with_suffix(".seq"))
+    start, key = sequence.reserve(max(accounts, 1))
+    sequence.close()
+    history = HistoryStore(path.with_suffix(".history"))
+    count = 0
+
+    def records():
+        nonlocal count
+        for user in generate(accounts, transactions, seed, _numbers(start, key), pin):
+            history.write_all(user["accountNo"], user.pop("transactions"))
+            count += 1
+            yield user
+
+    save_records(path, records())
+    return count
+
+
+def write_oops_dataset(path: Path, accounts: int, transactions: int, seed: int = 1) -> int:
+    # OOPS_Project.py keeps a plain integer pin and only the resulting balance
+    path = Path(path)
+    sequence = SequenceFile(path.with_suffix(".seq"))
+    start, key = sequence.reserve(max(accounts, 1))
+    sequence.close()
+    count = 0
+
+    def records():
+        nonlocal count
+        for user in generate(accounts, transactions, seed, _numbers(start, key), {}):
+            count += 1
+            yield {"name": user["name"], "age": user["age"], "email": user["email"], "pin": int(PIN),
+                   "accountNo": user["accountNo"], "balance": user["balance"]}
+
+    save_records(path, records())
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("target", type=Path)
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--transactions", type=int, default=10, help="per account")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--pin-scheme", choices=sorted(HASHERS), default="sha256")
+    parser.add_argument("--format", choices=["bank", "oops"], default="bank")
+    args = parser.parse_args()
+
+    if args.target.exists():
+        raise SystemExit(f"{args.target} already exists")
+    start = time.perf_counter()
+    if args.format == "oops":
+        n = write_oops_dataset(args.target, args.accounts, args.transactions, args.seed)
+    else:
+        n = write_dataset(args.target, args.accounts, args.transactions, args.seed, args.pin_scheme)
+    print(f"wrote {n} accounts to {args.target} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Streaming CSV exports of accounts and transaction history.
+
+    python bank_export.py accounts accounts.csv
+    python bank_export.py accounts accounts.csv.gz           # gzip by extension
+    python bank_export.py transactions tx.csv --account ND5ZU7ONDK
+    python bank_export.py transactions all_tx.csv.gz        # every account
+
+Rows are produced by generators and written in chunks, so memory stays flat
+however many accounts or transactions there are.
+"""
+import argparse
+import csv
+import io
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+from bank_core import Bank
+
+ACCOUNT_FIELDS = ["accountNo", "name", "age", "email", "balance", "created_at", "tx_count"]
+TX_FIELDS = ["ts", "type", "amount", "balance", "note"]
+CHUNK_ROWS = 1000
+
+
+def _csv_chunks(header, rows, chunk_rows: int = CHUNK_ROWS):
+    # yields str chunks of up to chunk_rows CSV lines
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    n = 0
+    for row in rows:
+        writer.writerow(row)
+        n += 1
+        if n >= chunk_rows:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            n = 0
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def iter_accounts_csv(bank: Bank, chunk_rows: int = CHUNK_ROWS):
+    rows = ([a.get(k) for k in ACCOUNT_FIELDS] for a in bank.accounts())
+    return _csv_chunks(ACCOUNT_FIELDS, rows, chunk_rows)
+
+
+def iter_transactions_csv(bank: Bank, account_no: str = None, chunk_rows: int = CHUNK_ROWS):
+    # one account oldest first, or every account with an accountNo column
+    if account_no is not None:
+        rows = ([t.get(k, "") for k in TX_FIELDS] for t in bank.iter_transactions(account_no))
+        return _csv_chunks(TX_FIELDS, rows, chunk_rows)
+    rows = (
+        [a["accountNo"]] + [t.get(k, "") for k in TX_FIELDS]
+        for a in bank.accounts() if a.get("tx_count")
+        for t in bank.iter_transactions(a["accountNo"])
+    )
+    return _csv_chunks(["accountNo"] + TX_FIELDS, rows, chunk_rows)
+
+
+def gzip_chunks(chunks):
+    # str chunks in, gzip-framed bytes out, without buffering the whole stream
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = z.compress(chunk.encode("utf-8"))
+        if out:
+            yield out
+    yield z.flush()
+
+
+def write_chunks(chunks, path: Path, gzip: bool = False) -> int:
+    written = 0
+    with path.open("wb") as fh:
+        for chunk in (gzip_chunks(chunks) if gzip else (c.encode("utf-8") for c in chunks)):
+            fh.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def spool(chunks, gzip: bool = False):
+    # file object for st.download_button: RAM up to 8 MiB, then spills to disk
+    fh = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    for chunk in (gzip_chunks(chunks) if gzip else (c.encode("utf-8") for c in chunks)):
+        fh.write(chunk)
+    fh.seek(0)
+    return fh
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("what", choices=["accounts", "transactions"])
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--account", help="only this account's transactions")
+    parser.add_argument("--gzip", action="store_true", help="compress (implied by a .gz output name)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    bank = Bank()
+    if args.what == "accounts":
+        chunks = iter_accounts_csv(bank, args.chunk_rows)
+    else:
+        if args.account and not bank.find_user(args.account):
+            sys.exit(f"Account not found: {args.account}")
+        chunks = iter_transactions_csv(bank, args.account, args.chunk_rows)
+    start = time.perf_counter()
+    written = write_chunks(chunks, args.output, gzip=args.gzip or args.output.suffix == ".gz")
+    print(f"wrote {written} bytes to {args.output} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
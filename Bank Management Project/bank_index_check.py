@@ -0,0 +1,108 @@
+"""Consistency check for the accountNo/email index of the JSON storage.
+
+Two JsonStorage instances share one data file. A seeded random sequence of
+creates, updates (name and email, including case-only email changes),
+deletes, deposits, refreshes from the other instance, compactions and reloads
+runs against them, and after every step each instance's index is compared
+with a fresh AccountIndex built from its records. The first mismatch is
+printed with the step that caused it and the exit status is 1.
+
+    python bank_index_check.py --steps 5000 --seed 7
+"""
+import argparse
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+from bank_storage import AccountIndex, ConflictError, JsonStorage
+
+EMAILS = ["ann@example.com", "bob@example.com", "cy@example.com", "dee@example.com"]
+
+
+def _email(rng):
+    # few distinct addresses, so several accounts share one, in varying case
+    email = rng.choice(EMAILS)
+    return email.upper() if rng.random() < 0.3 else email
+
+
+def _step(rng, writer, reader, counter):
+    # one random operation; returns its description
+    accounts = [u["accountNo"] for u in writer.data]
+    roll = rng.random()
+    if roll < 0.25 or not accounts:
+        counter[0] += 1
+        acc = f"{counter[0]:08d}"
+        writer.insert({"accountNo": acc, "name": f"user{counter[0]}", "email": _email(rng), "pin": 1234,
+                       "balance": 0, "version": 0})
+        return f"create {acc}"
+    acc = rng.choice(accounts)
+    if roll < 0.4:
+        changes = {"email": _email(rng)} if rng.random() < 0.7 else {"name": f"renamed{rng.randint(0, 99)}"}
+        writer.update(acc, changes)
+        return f"update {acc} {changes}"
+    if roll < 0.55:
+        writer.delete(acc)
+        return f"delete {acc}"
+    if roll < 0.8:
+        user = writer.get(acc)
+        amount = rng.randint(1, 500)
+        writer.append_tx(acc, {"type": "deposit", "amount": amount, "balance": user["balance"] + amount,
+                               "timestamp": "2024-01-01T00:00:00"})
+        return f"deposit {acc} {amount}"
+    if roll < 0.9:
+        reader.refresh()
+        return "refresh reader"
+    if roll < 0.95:
+        writer.save()
+        return "compact writer"
+    reader.reload()
+    return "reload reader"
+
+
+def run(steps: int, seed: int) -> bool:
+    rng = random.Random(seed)
+    workdir = Path(tempfile.mkdtemp(prefix="bank_index_check_"))
+    path = workdir / "data.json"
+    path.write_text("[]", encoding="utf-8")
+    first, second = JsonStorage(path), JsonStorage(path)
+    counter = [0]
+    try:
+        for step in range(1, steps + 1):
+            # the two instances take turns writing, so each also catches up on the other's journal
+            writer, reader = (first, second) if rng.random() < 0.5 else (second, first)
+            try:
+                action = _step(rng, writer, reader, counter)
+            except ConflictError as err:
+                # picked from a stale view: the other instance deleted the account meanwhile
+                action = f"conflict on {err}"
+            for name, storage in (("first", first), ("second", second)):
+                try:
+                    storage.index.verify(storage.data)
+                except RuntimeError as err:
+                    print(f"step {step} ({action}): {name} instance: {err}")
+                    return False
+        first.refresh()
+        second.refresh()
+        if sorted(u["accountNo"] for u in first.data) != sorted(u["accountNo"] for u in second.data):
+            print("the two instances disagree on the accounts after a final refresh")
+            return False
+        fresh = AccountIndex(first.data)
+        print(f"ok: {steps} steps, {len(first.data)} accounts, {len(fresh.by_email)} distinct emails")
+        return True
+    finally:
+        first.close()
+        second.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    raise SystemExit(0 if run(args.steps, args.seed) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+"""Timing histograms, counters and bytes-written metrics for Bank and storage calls.
+
+    BANK_METRICS=1 streamlit run bank_streamlit_app.py     # dumps to metrics/ every 15s
+    python bank_metrics.py overhead --accounts 2000         # cost per call, off vs on
+
+Instrumentation is off by default and then costs nothing: enable() swaps
+timing wrappers onto the Bank, storage, history, journal and PIN hashing
+methods, and disable() puts the originals back. Every wrapped call lands in
+the bank_op_seconds histogram under its name ("Bank.deposit",
+"JsonStorage._write_snapshot", "pin.scrypt", ...); exceptions are counted in
+bank_op_errors_total. Journal, history and snapshot writes add to
+bank_bytes_written_total, and the outermost call on a thread records what it
+wrote in total in bank_op_bytes, so a deposit or a save shows its own cost.
+
+With BANK_METRICS=1 the app also writes bank_metrics.prom (Prometheus text
+format) and bank_metrics.json to BANK_METRICS_DIR (default metrics) every
+BANK_METRICS_INTERVAL seconds. profile_next(op, "cprofile" | "tracemalloc")
+captures the next call of one operation; reports show up in profiles().
+"""
+import argparse
+import bisect
+import cProfile
+import inspect
+import io
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import bank_core
+import bank_pin
+import bank_storage
+
+SECONDS_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+BYTES_BUCKETS = tuple(256 * 4 ** i for i in range(12))  # 256 B .. 1 GiB
+EXPORT_INTERVAL = 15.0
+EXPORT_DIR = Path("metrics")
+
+
+class Histogram:
+    # cumulative-style buckets as Prometheus expects; quantiles are interpolated within a bucket
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.histograms = {}  # (metric, label) -> Histogram
+        self.counters = {}    # (metric, label) -> number
+
+    def observe(self, metric: str, label: str, value: float, buckets=SECONDS_BUCKETS):
+        with self.lock:
+            hist = self.histograms.get((metric, label))
+            if hist is None:
+                hist = self.histograms[metric, label] = Histogram(buckets)
+            hist.observe(value)
+
+    def inc(self, metric: str, label: str, amount: float = 1):
+        with self.lock:
+            self.counters[metric, label] = self.counters.get((metric, label), 0) + amount
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> dict:
+        # plain dict for JSON: per-op latency summary in ms, bytes per target, other counters
+        with self.lock:
+            ops = {}
+            for (metric, label), h in self.histograms.items():
+                if metric == "bank_op_seconds":
+                    ops[label] = {
+                        "count": h.count,
+                        "errors": self.counters.get(("bank_op_errors_total", label), 0),
+                        "total_s": round(h.sum, 6),
+                        "mean_ms": round(h.sum / h.count * 1000, 4),
+                        "p50_ms": round(h.quantile(0.5) * 1000, 4),
+                        "p90_ms": round(h.quantile(0.9) * 1000, 4),
+                        "p99_ms": round(h.quantile(0.99) * 1000, 4),
+                    }
+            op_bytes = {label: {"count": h.count, "mean": round(h.sum / h.count), "p99": round(h.quantile(0.99))}
+                        for (metric, label), h in self.histograms.items() if metric == "bank_op_bytes"}
+            written = {label: n for (metric, label), n in self.counters.items() if metric == "bank_bytes_written_total"}
+            return {"since": self.started, "at": time.time(), "ops": ops, "op_bytes": op_bytes, "bytes_written": written}
+
+    def prometheus(self) -> str:
+        label_names = {"bank_op_seconds": "op", "bank_op_bytes": "op", "bank_op_errors_total": "op",
+                       "bank_bytes_written_total": "target"}
+        out = []
+        with self.lock:
+            for metric in ("bank_op_seconds", "bank_op_bytes"):
+                rows = sorted((label, h) for (m, label), h in self.histograms.items() if m == metric)
+                if not rows:
+                    continue
+                out.append(f"# TYPE {metric} histogram")
+                name = label_names[metric]
+                for label, h in rows:
+                    cumulative = 0
+                    for bound, n in zip(h.buckets, h.counts):
+                        cumulative += n
+                        out.append(f'{metric}_bucket{{{name}="{label}",le="{bound:g}"}} {cumulative}')
+                    out.append(f'{metric}_bucket{{{name}="{label}",le="+Inf"}} {h.count}')
+                    out.append(f'{metric}_sum{{{name}="{label}"}} {h.sum:.9g}')
+                    out.append(f'{metric}_count{{{name}="{label}"}} {h.count}')
+            for metric in ("bank_op_errors_total", "bank_bytes_written_total"):
+                rows = sorted((label, n) for (m, label), n in self.counters.items() if m == metric)
+                if not rows:
+                    continue
+                out.append(f"# TYPE {metric} counter")
+                for label, n in rows:
+                    out.append(f'{metric}{{{label_names[metric]}="{label}"}} {n}')
+        return "\n".join(out) + "\n"
+
+
+METRICS = Metrics()
+
+# ---------- Instrumentation ----------
+_installed = []        # (owner, attribute, original), in install order
+_ops = set()           # names of the timed operations while enabled
+_hooks = {}            # op -> ProfileHook armed for its next call(s)
+_profiles = {}         # op -> last captured report
+_local = threading.local()
+_install_lock = threading.Lock()
+
+
+def _wrote(target: str, amount: int):
+    if amount > 0:
+        METRICS.inc("bank_bytes_written_total", target, amount)
+        _local.bytes = getattr(_local, "bytes", 0) + amount
+
+
+def _timed(op: str, func):
+    clock = time.perf_counter
+    _ops.add(op)
+
+    def wrapper(*args, **kwargs):
+        hook = _hooks.get(op)
+        depth = getattr(_local, "depth", 0)
+        _local.depth = depth + 1
+        start = clock()
+        try:
+            if hook is not None:
+                return hook.run(op, func, args, kwargs)
+            return func(*args, **kwargs)
+        except BaseException:
+            METRICS.inc("bank_op_errors_total", op)
+            raise
+        finally:
+            if hook is None:
+                # a profiled call is slowed by the profiler, so it stays out of the histogram
+                METRICS.observe("bank_op_seconds", op, clock() - start)
+            _local.depth = depth
+            if not depth:
+                written = getattr(_local, "bytes", 0)
+                if written:
+                    METRICS.observe("bank_op_bytes", op, written, BYTES_BUCKETS)
+                    _local.bytes = 0
+
+    wrapper.__wrapped__ = func
+    wrapper.__name__ = getattr(func, "__name__", op)
+    return wrapper
+
+
+def _journal_writer(func):
+    def wrapper(self, *args, **kwargs):
+        before = self.size
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            _wrote("journal", self.size - before)
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _history_writer(func, segments):
+    # segments(self, *args) -> segment paths the call may append to
+    def wrapper(self, *args, **kwargs):
+        paths = segments(self, *args)
+        before = [_size(p) for p in paths]
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            _wrote("history", sum(_size(p) - b for p, b in zip(paths, before)))
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+def _snapshot_writer(func):
+    def wrapper(self, *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            _wrote("snapshot", _size(self.path))
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+def _patch(owner, attr: str, wrapper):
+    original = owner.__dict__[attr] if isinstance(owner, type) else getattr(owner, attr)
+    _installed.append((owner, attr, original))
+    setattr(owner, attr, wrapper)
+
+
+def _methods(cls, extra=()):
+    # public, non-generator methods defined on cls, plus the named private ones
+    for name, value in vars(cls).items():
+        if not callable(value) or isinstance(value, (staticmethod, classmethod, type)):
+            continue
+        if (name.startswith("_") and name not in extra) or inspect.isgeneratorfunction(value):
+            continue
+        yield name, value
+
+
+def enabled() -> bool:
+    return bool(_installed)
+
+
+def enable():
+    with _install_lock:
+        if _installed:
+            return
+        for cls in (bank_core.Bank, bank_storage.JsonStorage, bank_storage.SqliteStorage):
+            for name, func in list(_methods(cls, extra=("_write_snapshot", "_catch_up", "_load", "_commit"))):
+                _patch(cls, name, _timed(f"{cls.__name__}.{name}", func))
+        for name in ("append", "append_many", "_read_segment", "checkpoints"):
+            _patch(bank_storage.HistoryStore, name, _timed(f"HistoryStore.{name}", vars(bank_storage.HistoryStore)[name]))
+        for name in ("_read_data", "_atomic_write", "_atomic_write_text"):
+            _patch(bank_storage, name, _timed(f"storage.{name}", getattr(bank_storage, name)))
+        for name in ("verify_pin", "pin_fields"):
+            _patch(bank_core, name, _timed(f"pin.{name}", getattr(bank_core, name)))
+        for hasher in bank_pin.HASHERS.values():
+            _patch(hasher, "hash", _timed(f"pin.{hasher.name}", hasher.hash))
+        # bytes written, attributed to whichever instrumented call is outermost on the thread
+        for name in ("append", "append_many"):
+            _patch(bank_storage.Journal, name, _journal_writer(vars(bank_storage.Journal)[name]))
+        history = bank_storage.HistoryStore
+        _patch(history, "append", _history_writer(history.append, lambda self, acc, n, tx: [self._segment(acc, n // self.segment_size)]))
+        _patch(history, "append_many", _history_writer(history.append_many, lambda self, acc, start, txs, *rest: [
+            self._segment(acc, seg)
+            for seg in range(start // self.segment_size, (start + max(len(txs), 1) - 1) // self.segment_size + 1)
+        ]))
+        _patch(bank_storage.JsonStorage, "_write_snapshot", _snapshot_writer(bank_storage.JsonStorage._write_snapshot))
+
+
+def disable():
+    with _install_lock:
+        while _installed:
+            owner, attr, original = _installed.pop()
+            if isinstance(owner, type) or inspect.ismodule(owner):
+                setattr(owner, attr, original)
+            else:
+                # instance attribute (a hasher's bound method): drop it to expose the class method again
+                delattr(owner, attr)
+        _hooks.clear()
+        _ops.clear()
+
+
+def operations() -> list:
+    return sorted(_ops)
+
+
+# ---------- Profiling one operation ----------
+class ProfileHook:
+    def __init__(self, mode: str, calls: int, out_dir: Path = None, top: int = 25):
+        if mode not in ("cprofile", "tracemalloc"):
+            raise ValueError(f"Unknown profiler: {mode}")
+        self.mode = mode
+        self.remaining = calls
+        self.out_dir = out_dir
+        self.top = top
+
+    def run(self, op: str, func, args, kwargs):
+        with _install_lock:
+            self.remaining -= 1
+            if self.remaining <= 0:
+                _hooks.pop(op, None)
+        started = time.perf_counter()
+        if self.mode == "cprofile":
+            prof = cProfile.Profile()
+            try:
+                return prof.runcall(func, *args, **kwargs)
+            finally:
+                text = io.StringIO()
+                pstats.Stats(prof, stream=text).sort_stats("cumulative").print_stats(self.top)
+                if self.out_dir is not None:
+                    self.out_dir.mkdir(parents=True, exist_ok=True)
+                    prof.dump_stats(self.out_dir / f"{op}.{int(time.time())}.prof")
+                self._record(op, started, text.getvalue())
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if not was_tracing:
+                tracemalloc.stop()
+            lines = [f"peak traced memory during call: {peak / 1024:.1f} KiB"]
+            lines += [str(stat) for stat in after.compare_to(before, "lineno")[:self.top]]
+            self._record(op, started, "\n".join(lines))
+
+    def _record(self, op: str, started: float, report: str):
+        _profiles[op] = {"mode": self.mode, "at": time.time(),
+                         "seconds": round(time.perf_counter() - started, 6), "report": report}
+
+
+def profile_next(op: str, mode: str = "cprofile", calls: int = 1, out_dir: Path = None):
+    # capture the next `calls` calls of op (e.g. "Bank.deposit"); turns instrumentation on
+    enable()
+    _hooks[op] = ProfileHook(mode, calls, out_dir)
+
+
+def profiles() -> dict:
+    return dict(_profiles)
+
+
+# ---------- Periodic export ----------
+def write_dumps(directory: Path):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    bank_storage._atomic_write_text(directory / "bank_metrics.prom", METRICS.prometheus())
+    bank_storage._atomic_write_text(directory / "bank_metrics.json", json.dumps(METRICS.snapshot(), indent=2))
+
+
+class Exporter(threading.Thread):
+    def __init__(self, directory: Path = EXPORT_DIR, interval: float = EXPORT_INTERVAL):
+        super().__init__(name="bank-metrics-export", daemon=True)
+        self.directory = Path(directory)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            write_dumps(self.directory)
+
+    def stop(self):
+        self.stopped.set()
+        write_dumps(self.directory)
+
+
+def configure_from_env():
+    # BANK_METRICS=1 turns instrumentation and the periodic dumps on; returns the exporter, if any
+    if os.environ.get("BANK_METRICS", "0") in ("0", ""):
+        return None
+    enable()
+    exporter = Exporter(Path(os.environ.get("BANK_METRICS_DIR", EXPORT_DIR)),
+                        float(os.environ.get("BANK_METRICS_INTERVAL", EXPORT_INTERVAL)))
+    exporter.start()
+    return exporter
+
+
+def cmd_overhead(args):
+    # find_user and deposit on a generated dataset, instrumentation off vs on
+    from bank_datagen import write_dataset
+
+    workdir = Path(tempfile.mkdtemp(prefix="bank_metrics_"))
+    try:
+        path = workdir / "data.json"
+        write_dataset(path, args.accounts, 5)
+        storage = bank_storage.JsonStorage(path)
+        bank = bank_core.Bank(storage, pin_policy={"scheme": "sha256", "params": {}})
+        accounts = [u["accountNo"] for u in storage.accounts()]
+        result = {}
+        for state in ("disabled", "enabled", "disabled_again"):
+            if state == "enabled":
+                enable()
+            elif state == "disabled_again":
+                disable()
+            start = time.perf_counter()
+            for i in range(args.calls):
+                bank.find_user(accounts[i % len(accounts)])
+            lookup = time.perf_counter() - start
+            start = time.perf_counter()
+            for i in range(args.writes):
+                bank.deposit(accounts[i % len(accounts)], 1)
+            write = time.perf_counter() - start
+            result[state] = {"find_user_ns": round(lookup / args.calls * 1e9), "deposit_us": round(write / args.writes * 1e6, 1)}
+        result["snapshot"] = {k: v for k, v in METRICS.snapshot().items() if k in ("op_bytes", "bytes_written")}
+        storage.close()
+        print(json.dumps(result, indent=2))
+        return 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("overhead", help="per-call cost of the instrumentation, off vs on")
+    p.add_argument("--accounts", type=int, default=2000)
+    p.add_argument("--calls", type=int, default=200000)
+    p.add_argument("--writes", type=int, default=300)
+    p.set_defaults(func=cmd_overhead)
+    args = parser.parse_args()
+    raise SystemExit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
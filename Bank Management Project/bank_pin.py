@@ -0,0 +1,202 @@
+"""PIN hashing schemes, cost calibration and a login-throughput benchmark.
+
+    python bank_pin.py calibrate --target-ms 100                 # print tuned params
+    python bank_pin.py calibrate --scheme scrypt --write pin_policy.json
+    python bank_pin.py bench --seconds 2 --processes 4
+
+Every account stores pin_scheme and pin_params next to pin_salt/pin_hash, so
+the policy can change without breaking old accounts: they are verified with
+the scheme they were written with and rehashed on their next successful login.
+The policy comes from the JSON file named by BANK_PIN_POLICY (default
+pin_policy.json, if present), otherwise DEFAULT_POLICY.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import multiprocessing
+import os
+import secrets
+import time
+from pathlib import Path
+
+POLICY_FILE = Path("pin_policy.json")
+
+
+class Sha256Hasher:
+    # the original scheme: one SHA-256 of pin + salt. Kept to verify old accounts.
+    name = "sha256"
+    default_params = {}
+
+    def hash(self, pin: str, salt: str, params: dict) -> str:
+        return hashlib.sha256((pin + salt).encode("utf-8")).hexdigest()
+
+    def calibrate(self, target_s: float) -> dict:
+        return {}
+
+
+class Pbkdf2Hasher:
+    name = "pbkdf2_sha256"
+    default_params = {"iterations": 600000}
+
+    def hash(self, pin: str, salt: str, params: dict) -> str:
+        return hashlib.pbkdf2_hmac("sha256", pin.encode("utf-8"), salt.encode("utf-8"), int(params["iterations"])).hex()
+
+    def calibrate(self, target_s: float) -> dict:
+        # cost is linear in iterations, so time a probe and scale
+        probe = 50000
+        elapsed = _time_once(self, {"iterations": probe})
+        return {"iterations": max(1000, int(probe * target_s / elapsed) // 1000 * 1000)}
+
+
+class ScryptHasher:
+    name = "scrypt"
+    default_params = {"n": 16384, "r": 8, "p": 1}
+
+    def hash(self, pin: str, salt: str, params: dict) -> str:
+        n, r, p = int(params["n"]), int(params["r"]), int(params["p"])
+        return hashlib.scrypt(pin.encode("utf-8"), salt=salt.encode("utf-8"), n=n, r=r, p=p,
+                              maxmem=256 * n * r + (1 << 20), dklen=32).hex()
+
+    def calibrate(self, target_s: float) -> dict:
+        # n must be a power of two: double it past the target, keep whichever side is closer
+        params = {"n": 1024, "r": 8, "p": 1}
+        below = elapsed = _time_once(self, params)
+        while elapsed < target_s and params["n"] < (1 << 22):
+            below = elapsed
+            params["n"] *= 2
+            elapsed = _time_once(self, params)
+        if params["n"] > 1024 and target_s / below < elapsed / target_s:
+            params["n"] //= 2
+        return params
+
+
+HASHERS = {}
+
+
+def register_hasher(hasher):
+    HASHERS[hasher.name] = hasher
+    return hasher
+
+
+for _hasher in (Sha256Hasher(), Pbkdf2Hasher(), ScryptHasher()):
+    register_hasher(_hasher)
+
+DEFAULT_POLICY = {"scheme": "scrypt", "params": ScryptHasher.default_params}
+
+
+def load_policy(path: Path = None) -> dict:
+    path = Path(path or os.environ.get("BANK_PIN_POLICY", POLICY_FILE))
+    if path.exists():
+        with path.open("r", encoding="utf-8") as fh:
+            policy = json.load(fh)
+        if policy.get("scheme") not in HASHERS:
+            raise ValueError(f"Unknown PIN hash scheme in {path}: {policy.get('scheme')}")
+        return {"scheme": policy["scheme"], "params": policy.get("params") or {}}
+    return DEFAULT_POLICY
+
+
+def pin_fields(pin: str, policy: dict) -> dict:
+    # the account fields to store for a new or changed PIN
+    salt = secrets.token_hex(8)
+    hasher = HASHERS[policy["scheme"]]
+    return {
+        "pin_salt": salt,
+        "pin_hash": hasher.hash(pin, salt, policy["params"]),
+        "pin_scheme": hasher.name,
+        "pin_params": dict(policy["params"]),
+    }
+
+
+def verify_pin(user: dict, pin: str) -> bool:
+    # accounts written before pin_scheme existed are plain sha256
+    hasher = HASHERS.get(user.get("pin_scheme") or "sha256")
+    expected = user.get("pin_hash")
+    if hasher is None or not expected:
+        return False
+    actual = hasher.hash(pin, user.get("pin_salt") or "", user.get("pin_params") or {})
+    return hmac.compare_digest(actual.encode("ascii"), str(expected).encode("ascii"))
+
+
+def needs_rehash(user: dict, policy: dict) -> bool:
+    return (user.get("pin_scheme") or "sha256") != policy["scheme"] or (user.get("pin_params") or {}) != policy["params"]
+
+
+def _time_once(hasher, params: dict) -> float:
+    start = time.perf_counter()
+    hasher.hash("0000", "calibration-salt", params)
+    return time.perf_counter() - start
+
+
+def _logins(scheme: str, params: dict, seconds: float) -> float:
+    # verifications per second on one core
+    user = dict(accountNo="BENCH", **pin_fields("1234", {"scheme": scheme, "params": params}))
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        verify_pin(user, "1234")
+        done += 1
+    return done / (time.perf_counter() - start)
+
+
+def _bench_worker(args):
+    return _logins(*args)
+
+
+def cmd_calibrate(args):
+    schemes = [args.scheme] if args.scheme else [s for s in HASHERS if s != "sha256"]
+    results = {}
+    for scheme in schemes:
+        params = HASHERS[scheme].calibrate(args.target_ms / 1000)
+        results[scheme] = {"params": params, "ms": round(_time_once(HASHERS[scheme], params) * 1000, 1)}
+    print(json.dumps(results, indent=2))
+    if args.write:
+        scheme = args.scheme or "scrypt"
+        with args.write.open("w", encoding="utf-8") as fh:
+            json.dump({"scheme": scheme, "params": results[scheme]["params"]}, fh, indent=2)
+        print(f"wrote {scheme} policy to {args.write}")
+    return 0
+
+
+def cmd_bench(args):
+    policy = load_policy()
+    cases = [("sha256", {}), ("pbkdf2_sha256", Pbkdf2Hasher.default_params), ("scrypt", ScryptHasher.default_params)]
+    if policy["scheme"] != "sha256" and (policy["scheme"], policy["params"]) not in cases:
+        cases.append((policy["scheme"], policy["params"]))
+    results = []
+    with multiprocessing.Pool(args.processes) as pool:
+        for scheme, params in cases:
+            total = sum(pool.map(_bench_worker, [(scheme, params, args.seconds)] * args.processes))
+            results.append({
+                "scheme": scheme,
+                "params": params,
+                "processes": args.processes,
+                "logins_per_s": round(total, 1),
+                "logins_per_s_per_core": round(total / args.processes, 1),
+                "ms_per_login": round(1000 * args.processes / total, 3) if total else None,
+            })
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("calibrate", help="pick cost parameters for a target hash time on this machine")
+    p.add_argument("--target-ms", type=float, default=100)
+    p.add_argument("--scheme", choices=[s for s in HASHERS if s != "sha256"])
+    p.add_argument("--write", type=Path, help="save the chosen scheme as the PIN policy file")
+    p.set_defaults(func=cmd_calibrate)
+
+    p = sub.add_parser("bench", help="logins per second per core for each scheme")
+    p.add_argument("--seconds", type=float, default=2)
+    p.add_argument("--processes", type=int, default=1)
+    p.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args()
+    raise SystemExit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Binary account snapshot (.snap): memory-mapped, indexed, decoded on touch.
+
+Layout (little-endian):
+
+    header   magic "BANKSNAP", u32 version, u32 reserved, u64 count,
+             u64 records_end, u64 offsets_at, u64 sorted_at
+    records  one per account: u16 key length + accountNo, u8 int-field mask
+             + i64 per present int field, u8 str-field mask + (u32 length +
+             utf-8) per present str field, u32 length + JSON of other fields
+    offsets  u64 file offset of each record, in record order
+    sorted   u32 record numbers ordered by accountNo bytes, for binary search
+
+Opening a snapshot maps the file and reads the 48-byte header; nothing else
+is parsed until a record is asked for.
+"""
+import json
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+MAGIC = b"BANKSNAP"
+VERSION = 1
+SNAPSHOT_SUFFIX = ".snap"
+HEADER = struct.Struct("<8sIIQQQQ")
+INT_FIELDS = ("balance", "age", "tx_count", "version", "total_deposited")
+STR_FIELDS = ("name", "email", "pin_salt", "pin_hash", "pin_scheme", "created_at")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_INT_MIN, _INT_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def encode_record(user: dict) -> bytes:
+    key = str(user.get("accountNo") or "").encode("utf-8")
+    out = [_U16.pack(len(key)), key]
+    extra = {k: v for k, v in user.items() if k != "accountNo" and k not in INT_FIELDS and k not in STR_FIELDS}
+    mask, ints = 0, []
+    for bit, name in enumerate(INT_FIELDS):
+        value = user.get(name)
+        if type(value) is int and _INT_MIN <= value <= _INT_MAX:
+            mask |= 1 << bit
+            ints.append(_I64.pack(value))
+        elif name in user:
+            extra[name] = value
+    out.append(bytes([mask]))
+    out.extend(ints)
+    mask, strs = 0, []
+    for bit, name in enumerate(STR_FIELDS):
+        value = user.get(name)
+        if type(value) is str:
+            raw = value.encode("utf-8")
+            mask |= 1 << bit
+            strs.append(_U32.pack(len(raw)) + raw)
+        elif name in user:
+            extra[name] = value
+    out.append(bytes([mask]))
+    out.extend(strs)
+    raw = json.dumps(extra, separators=(",", ":")).encode("utf-8") if extra else b""
+    out.append(_U32.pack(len(raw)) + raw)
+    return b"".join(out)
+
+
+def decode_record(buf, offset: int = 0) -> dict:
+    (n,) = _U16.unpack_from(buf, offset)
+    offset += 2
+    user = {}
+    if n:
+        user["accountNo"] = bytes(buf[offset:offset + n]).decode("utf-8")
+    offset += n
+    mask = buf[offset]
+    offset += 1
+    for bit, name in enumerate(INT_FIELDS):
+        if mask >> bit & 1:
+            (user[name],) = _I64.unpack_from(buf, offset)
+            offset += 8
+    mask = buf[offset]
+    offset += 1
+    for bit, name in enumerate(STR_FIELDS):
+        if mask >> bit & 1:
+            (n,) = _U32.unpack_from(buf, offset)
+            user[name] = bytes(buf[offset + 4:offset + 4 + n]).decode("utf-8")
+            offset += 4 + n
+    (n,) = _U32.unpack_from(buf, offset)
+    if n:
+        user.update(json.loads(bytes(buf[offset + 4:offset + 4 + n])))
+    return user
+
+
+def record_key(buf, offset: int = 0) -> bytes:
+    (n,) = _U16.unpack_from(buf, offset)
+    return bytes(buf[offset + 2:offset + 2 + n])
+
+
+def is_snapshot(path: Path) -> bool:
+    try:
+        with Path(path).open("rb") as fh:
+            return fh.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class SnapshotReader:
+    # Read-only view over a .snap file. The mapping stays valid after the file
+    # is replaced on disk, so a reader can outlive a newer snapshot being written.
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open("rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.count, self._records_end, offsets_at, sorted_at = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} bank snapshot")
+        view = memoryview(self._mm)
+        self._offsets = view[offsets_at:offsets_at + 8 * self.count].cast("Q")
+        self._sorted = view[sorted_at:sorted_at + 4 * self.count].cast("I")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def raw(self, pos: int) -> bytes:
+        start = self._offsets[pos]
+        end = self._offsets[pos + 1] if pos + 1 < self.count else self._records_end
+        return self._mm[start:end]
+
+    def record(self, pos: int) -> dict:
+        return decode_record(self._mm, self._offsets[pos])
+
+    def find(self, account_no: str):
+        # record number of account_no, or None; O(log n) key reads
+        key = account_no.encode("utf-8")
+        if not key:
+            return None
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if record_key(self._mm, self._offsets[self._sorted[mid]]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            pos = self._sorted[lo]
+            if record_key(self._mm, self._offsets[pos]) == key:
+                return pos
+        return None
+
+    def __iter__(self):
+        for pos in range(self.count):
+            yield self.record(pos)
+
+
+class LazyRecords:
+    # List-like stand-in for the account list loaded from JSON. Records are
+    # decoded from the snapshot on first access and cached from then on, since
+    # callers update them in place; untouched records stay as bytes in the
+    # mapping, and are copied across verbatim when the snapshot is rewritten.
+    def __init__(self, reader: SnapshotReader):
+        self.reader = reader
+        self._base_len = len(reader)  # leading positions still backed by the snapshot
+        self._cache = {}              # position -> decoded or replaced record
+        self._tail = []               # records appended past the snapshot
+        self._moved = {}              # accountNo -> position, for records not in their snapshot slot
+
+    def __len__(self) -> int:
+        return self._base_len + len(self._tail)
+
+    def __getitem__(self, pos: int) -> dict:
+        if pos < 0:
+            pos += len(self)
+        if pos >= self._base_len:
+            return self._tail[pos - self._base_len]
+        user = self._cache.get(pos)
+        if user is None:
+            user = self._cache[pos] = self.reader.record(pos)
+        return user
+
+    def __setitem__(self, pos: int, user: dict):
+        if pos < 0:
+            pos += len(self)
+        if pos >= self._base_len:
+            self._tail[pos - self._base_len] = user
+        else:
+            self._cache[pos] = user
+        self._moved[user.get("accountNo")] = pos
+
+    def append(self, user: dict):
+        self._tail.append(user)
+        self._moved[user.get("accountNo")] = len(self) - 1
+
+    def pop(self, pos: int = -1) -> dict:
+        # like list.pop, except that an inner pop moves the last record into the hole
+        last = len(self) - 1
+        if pos < 0:
+            pos += len(self)
+        user = self[pos]
+        if pos != last:
+            self[pos] = self[last]
+        if self._tail:
+            self._tail.pop()
+        else:
+            self._cache.pop(last, None)
+            self._base_len -= 1
+        self._moved.pop(user.get("accountNo"), None)
+        return user
+
+    def locate(self, account_no: str):
+        # position of account_no, or None; no decoding except to confirm a moved record
+        pos = self._moved.get(account_no)
+        if pos is not None:
+            if pos < len(self) and self[pos].get("accountNo") == account_no:
+                return pos
+            del self._moved[account_no]
+        pos = self.reader.find(account_no)
+        if pos is None or pos >= self._base_len:
+            return None
+        cached = self._cache.get(pos)
+        if cached is not None and cached.get("accountNo") != account_no:
+            return None  # its slot has been reused since the snapshot was written
+        return pos
+
+    def find(self, account_no: str):
+        pos = self.locate(account_no)
+        return None if pos is None else self[pos]
+
+    def index(self, user: dict) -> int:
+        pos = self.locate(user.get("accountNo"))
+        if pos is not None and self[pos] is user:
+            return pos
+        for pos in range(len(self)):
+            if self[pos] is user:
+                return pos
+        raise ValueError("record not in list")
+
+    def remove(self, user: dict):
+        self.pop(self.index(user))
+
+    def raw(self, pos: int):
+        # encoded bytes of an untouched snapshot record, else None
+        if pos < self._base_len and pos not in self._cache:
+            return self.reader.raw(pos)
+        return None
+
+    def __iter__(self):
+        # untouched records are decoded per pass, not cached, so a full scan stays small
+        for pos in range(self._base_len):
+            user = self._cache.get(pos)
+            yield user if user is not None else self.reader.record(pos)
+        yield from self._tail
+
+
+def write_snapshot(path: Path, records):
+    # records: dicts, or an iterable whose .raw(pos) can hand back encoded bytes
+    path = Path(path)
+    raw_of = getattr(records, "raw", None)
+    tmp = NamedTemporaryFile("wb", delete=False, dir=path.resolve().parent, suffix=".tmp")
+    try:
+        tmp.write(b"\0" * HEADER.size)
+        offsets = array("Q")
+        keys = []
+        offset = HEADER.size
+        for pos, user in enumerate(records if raw_of is None else range(len(records))):
+            raw = raw_of(pos) if raw_of is not None else None
+            if raw is None:
+                raw = encode_record(records[pos] if raw_of is not None else user)
+            offsets.append(offset)
+            keys.append(record_key(raw))
+            tmp.write(raw)
+            offset += len(raw)
+        pad = -offset % 8
+        tmp.write(b"\0" * pad)
+        offsets_at = offset + pad
+        tmp.write(offsets.tobytes())
+        order = array("I", sorted(range(len(keys)), key=keys.__getitem__))
+        tmp.write(order.tobytes())
+        tmp.seek(0)
+        tmp.write(HEADER.pack(MAGIC, VERSION, 0, len(offsets), offset, offsets_at, offsets_at + 8 * len(offsets)))
+        tmp.flush()
+        os.fsync(tmp.fileno())
+        tmp.close()
+        os.replace(tmp.name, path)
+    finally:
+        tmp.close()
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+
+
+def load_records(path: Path):
+    # a LazyRecords for a binary snapshot, else the parsed JSON list ([] when missing or empty)
+    path = Path(path)
+    if is_snapshot(path):
+        return LazyRecords(SnapshotReader(path))
+    if not path.exists():
+        return []
+    with path.open("r", encoding="utf-8") as fh:
+        content = fh.read().strip()
+    return json.loads(content) if content else []
+
+
+def save_records(path: Path, records):
+    # format follows the file name: .snap is binary, anything else JSON.
+    # records may be any iterable; JSON is written a record at a time and swapped in whole.
+    path = Path(path)
+    if path.suffix == SNAPSHOT_SUFFIX:
+        write_snapshot(path, records)
+        return
+    tmp = NamedTemporaryFile("w", encoding="utf-8", delete=False, dir=path.resolve().parent, suffix=".tmp")
+    try:
+        tmp.write("[")
+        for pos, user in enumerate(records):
+            tmp.write(",\n" if pos else "\n")
+            tmp.write(json.dumps(user))
+        tmp.write("\n]")
+        tmp.flush()
+        os.fsync(tmp.fileno())
+        tmp.close()
+        os.replace(tmp.name, path)
+    finally:
+        tmp.close()
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
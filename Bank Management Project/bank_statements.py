@@ -0,0 +1,128 @@
+"""Point-in-time balances and date-range statements from transaction history.
+
+    python bank_statements.py balance EFTF7NTED6DW 2024-05-01
+    python bank_statements.py statement EFTF7NTED6DW --from 2024-05-01 --to 2024-06-01 out.csv
+    python bank_statements.py month-end 2024-05 statements/      # every account
+
+Timestamps are the ISO strings stored with each transaction; a bare date means
+the start of that day (UTC). A period is start <= ts < end. Balances come from
+a binary search over the history segments and their cached checkpoints, so a
+statement only reads the segments that overlap its period.
+"""
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+from bank_core import Bank
+from bank_export import _csv_chunks, write_chunks
+
+STATEMENT_FIELDS = ["ts", "type", "amount", "balance", "note"]
+SUMMARY_FIELDS = ["accountNo", "name", "opening", "credits", "debits", "closing", "transactions"]
+
+
+def month_period(month: str):
+    # "2024-05" -> ("2024-05-01", "2024-06-01")
+    year, mon = (int(x) for x in month.split("-"))
+    nxt = f"{year + 1:04d}-01" if mon == 12 else f"{year:04d}-{mon + 1:02d}"
+    return f"{year:04d}-{mon:02d}-01", f"{nxt}-01"
+
+
+class Statement:
+    # Streams a statement's rows; the totals are complete once rows() is exhausted.
+    def __init__(self, bank: Bank, account_no: str, start: str, end: str):
+        self.bank = bank
+        self.account_no = account_no
+        self.start = start
+        self.end = end
+        self.opening = bank.balance_at(account_no, start)
+        self.closing = self.opening
+        self.credits = self.debits = self.count = 0
+
+    def rows(self):
+        yield [self.start, "opening", "", self.opening, ""]
+        for tx in self.bank.transactions_between(self.account_no, self.start, self.end):
+            if tx.get("type") == "deposit":
+                self.credits += int(tx.get("amount") or 0)
+            else:
+                self.debits += int(tx.get("amount") or 0)
+            self.closing = tx["balance"]
+            self.count += 1
+            yield [tx.get(k, "") for k in STATEMENT_FIELDS]
+        yield [self.end, "closing", "", self.closing, ""]
+
+    def summary(self, name: str = "") -> list:
+        return [self.account_no, name, self.opening, self.credits, self.debits, self.closing, self.count]
+
+
+def iter_statement_csv(bank: Bank, account_no: str, start: str, end: str):
+    return _csv_chunks(STATEMENT_FIELDS, Statement(bank, account_no, start, end).rows())
+
+
+def month_end(bank: Bank, month: str, outdir: Path, gzip: bool = False) -> dict:
+    # one combined statements file (accountNo first) plus a per-account summary
+    start, end = month_period(month)
+    outdir.mkdir(parents=True, exist_ok=True)
+    summary_path = outdir / f"summary_{month}.csv"
+    accounts = 0
+
+    def rows(summary_writer):
+        nonlocal accounts
+        for user in bank.accounts():
+            if not user.get("accountNo") or (user.get("created_at") or "") >= end:
+                continue
+            stmt = Statement(bank, user["accountNo"], start, end)
+            for row in stmt.rows():
+                yield [user["accountNo"]] + row
+            summary_writer.writerow(stmt.summary(user.get("name", "")))
+            accounts += 1
+
+    began = time.perf_counter()
+    with summary_path.open("w", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(SUMMARY_FIELDS)
+        name = f"statements_{month}.csv" + (".gz" if gzip else "")
+        written = write_chunks(_csv_chunks(["accountNo"] + STATEMENT_FIELDS, rows(writer)), outdir / name, gzip=gzip)
+    elapsed = time.perf_counter() - began
+    return {"accounts": accounts, "bytes": written, "seconds": round(elapsed, 2),
+            "accounts_per_s": round(accounts / elapsed) if elapsed else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("balance", help="balance at a point in time")
+    p.add_argument("account")
+    p.add_argument("at", help="ISO date or datetime")
+
+    p = sub.add_parser("statement", help="one account's statement for a period, as CSV")
+    p.add_argument("account")
+    p.add_argument("output", type=Path)
+    p.add_argument("--from", dest="start", required=True)
+    p.add_argument("--to", dest="end", required=True)
+
+    p = sub.add_parser("month-end", help="statements for every account for one month")
+    p.add_argument("month", help="YYYY-MM")
+    p.add_argument("outdir", type=Path)
+    p.add_argument("--gzip", action="store_true")
+
+    args = parser.parse_args()
+    bank = Bank()
+    if args.command in ("balance", "statement") and not bank.find_user(args.account):
+        sys.exit(f"Account not found: {args.account}")
+    if args.command == "balance":
+        print(bank.balance_at(args.account, args.at))
+    elif args.command == "statement":
+        chunks = iter_statement_csv(bank, args.account, args.start, args.end)
+        written = write_chunks(chunks, args.output, gzip=args.output.suffix == ".gz")
+        print(f"wrote {written} bytes to {args.output}")
+    else:
+        report = month_end(bank, args.month, args.outdir, gzip=args.gzip)
+        print(f"{report['accounts']} statements, {report['bytes']} bytes in {report['seconds']}s "
+              f"({report['accounts_per_s']} accounts/s)")
+
+
+if __name__ == "__main__":
+    main()
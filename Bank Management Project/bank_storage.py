@@ -0,0 +1,1443 @@
+import bisect
+import json
+import os
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+import queue
+import secrets
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+from bank_snapshot import SNAPSHOT_SUFFIX, LazyRecords, load_records, write_snapshot
+
+DATA_FILE = Path("data.json")
+DB_FILE = Path("bank.db")
+# fold the journal into a fresh data.json once it is this big or this old
+JOURNAL_MAX_BYTES = 4 * 1024 * 1024
+JOURNAL_MAX_AGE = 15 * 60
+# transactions per history segment file
+HISTORY_SEGMENT_SIZE = 500
+
+
+def _email_key(email) -> str:
+    return (email or "").strip().lower()
+
+# ---------- JSON file helpers ----------
+def _read_data(path: Path = DATA_FILE):
+    # a list from JSON, or LazyRecords over a binary snapshot
+    try:
+        return load_records(path)
+    except Exception:
+        return []
+
+def _atomic_write(path: Path, data):
+    # temp file lives next to the target so the final replace is a rename, not a copy
+    tmp = NamedTemporaryFile("w", delete=False, encoding="utf-8", dir=path.resolve().parent, suffix=".tmp")
+    try:
+        tmp.write(json.dumps(data, indent=2))
+        tmp.flush()
+        os.fsync(tmp.fileno())
+        tmp.close()
+        os.replace(tmp.name, path)
+    finally:
+        try:
+            tmp.close()
+        except Exception:
+            pass
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+
+def _file_sig(path: Path):
+    # cheap change detector: (mtime_ns, size), or None when the file is missing
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _atomic_write_text(path: Path, text: str):
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def iter_json_array(fh, chunk_size: int = 1 << 16):
+    # Yields the items of a top-level JSON array without loading the whole file.
+    decoder = json.JSONDecoder()
+    buf, pos, eof, started = "", 0, False, False
+    while True:
+        while pos < len(buf) and buf[pos] in (" \t\r\n," if started else " \t\r\n"):
+            pos += 1
+        item = end = None
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+        if end is not None and (end < len(buf) or eof):
+            pos = end
+            yield item
+            continue
+        if eof:
+            if started:
+                raise ValueError("unterminated JSON array")
+            return
+        chunk = fh.read(chunk_size)
+        eof = not chunk
+        buf, pos = buf[pos:] + chunk, 0
+
+class Journal:
+    # Append-only log of mutations, one compact JSON record per line.
+    # Records are idempotent so replaying over a newer snapshot is harmless.
+    def __init__(self, path: Path, max_bytes: int = JOURNAL_MAX_BYTES, max_age: float = JOURNAL_MAX_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.size = 0
+        self.started = None
+        self._fh = None
+
+    def replay(self):
+        records = []
+        self.size = 0
+        self.started = None
+        if not self.path.exists():
+            return records
+        with self.path.open("rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # torn tail from a crash mid-append; drop it
+                    break
+                records.append(record)
+                self.size += len(line)
+        if self.path.stat().st_size != self.size:
+            with self.path.open("r+b") as f:
+                f.truncate(self.size)
+        if records:
+            self.started = records[0].get("t", time.time())
+        return records
+
+    def append(self, record: dict):
+        record["t"] = round(time.time(), 3)
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        if self._fh is None:
+            self._fh = self.path.open("ab")
+        self._fh.write(line)
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self.size += len(line)
+        if self.started is None:
+            self.started = record["t"]
+
+    def read_new(self):
+        # records appended by other writers since our last read/append.
+        # Callers hold the storage lock, so an unterminated tail is a crashed write.
+        if not self.path.exists() or self.path.stat().st_size <= self.size:
+            return []
+        with self.path.open("rb") as f:
+            f.seek(self.size)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1
+        records = [json.loads(line) for line in chunk[:end].splitlines() if line.strip()]
+        self.size += end
+        if end < len(chunk):
+            self.close()
+            with self.path.open("r+b") as f:
+                f.truncate(self.size)
+        if records and self.started is None:
+            self.started = records[0].get("t", time.time())
+        return records
+
+    def append_many(self, records: list):
+        # group commit: one write and one fsync for the whole batch
+        t = round(time.time(), 3)
+        lines = []
+        for record in records:
+            record["t"] = t
+            lines.append(json.dumps(record, separators=(",", ":")))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        if self._fh is None:
+            self._fh = self.path.open("ab")
+        self._fh.write(data)
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self.size += len(data)
+        if self.started is None:
+            self.started = t
+
+    def should_compact(self) -> bool:
+        if self.size >= self.max_bytes:
+            return True
+        return self.started is not None and time.time() - self.started >= self.max_age
+
+    def reset(self):
+        self.close()
+        with self.path.open("wb") as f:
+            os.fsync(f.fileno())
+        self.size = 0
+        self.started = None
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+class ConflictError(Exception):
+    # the account changed (or appeared/disappeared) since the caller read it
+    pass
+
+class FileLock:
+    # Exclusive cross-process lock on a sidecar file; re-entrant within one thread.
+    def __init__(self, path: Path):
+        self.path = path
+        self._fh = None
+        self._depth = 0
+        self._thread_lock = threading.RLock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            if self._fh is None:
+                self._fh = open(self.path, "a+b")
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+            else:
+                self._fh.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        self._thread_lock.release()
+
+    def close(self):
+        with self._thread_lock:
+            if self._fh is not None and self._depth == 0:
+                self._fh.close()
+                self._fh = None
+
+class SequenceFile:
+    # A persisted counter plus the key the account-number permutation uses,
+    # {"next": n, "key": hex}, advanced a block at a time under its own lock.
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock = FileLock(self.path.with_suffix(self.path.suffix + ".lock"))
+
+    def reserve(self, count: int):
+        with self.lock:
+            state = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+            start = state.get("next", 0)
+            key = state.get("key") or secrets.token_hex(16)
+            _atomic_write_text(self.path, json.dumps({"next": start + count, "key": key}))
+        return start, bytes.fromhex(key)
+
+    def close(self):
+        self.lock.close()
+
+# ---------- Transaction history ----------
+def _balance_before(tx: dict) -> int:
+    amount = int(tx.get("amount") or 0)
+    return tx["balance"] - amount if tx.get("type") == "deposit" else tx["balance"] + amount
+
+class HistoryStore:
+    # Per-account, append-only history split into fixed-size segments:
+    #   <root>/<accountNo>/000000.jsonl, 000001.jsonl, ...
+    # Entry n lives in segment n // segment_size, so a page of the newest
+    # entries only opens the last one or two files. Each line carries its "n";
+    # a retried append after a crash simply supersedes the earlier line.
+    def __init__(self, root: Path, segment_size: int = HISTORY_SEGMENT_SIZE):
+        self.root = Path(root)
+        self.segment_size = segment_size
+        # segments written without fsync (batch commits); synced before the next snapshot
+        self.dirty = set()
+
+    def _dir(self, account_no: str) -> Path:
+        name = account_no if account_no.isalnum() else "x" + account_no.encode("utf-8").hex()
+        return self.root / name
+
+    def _segment(self, account_no: str, seg: int) -> Path:
+        return self._dir(account_no) / f"{seg:06d}.jsonl"
+
+    def append(self, account_no: str, n: int, tx: dict):
+        path = self._segment(account_no, n // self.segment_size)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(dict(tx, n=n), separators=(",", ":")) + "\n"
+        with path.open("ab") as f:
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append_many(self, account_no: str, start: int, txs: list, sync: bool = True):
+        # entries start, start+1, ...; one write per touched segment
+        n = start
+        while n < start + len(txs):
+            seg = n // self.segment_size
+            end = min(start + len(txs), (seg + 1) * self.segment_size)
+            path = self._segment(account_no, seg)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            lines = "".join(json.dumps(dict(tx, n=i), separators=(",", ":")) + "\n" for i, tx in zip(range(n, end), txs[n - start:end - start]))
+            with path.open("ab") as f:
+                f.write(lines.encode("utf-8"))
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            if not sync:
+                self.dirty.add(path)
+            n = end
+
+    def mark_dirty(self, account_no: str, start: int, count: int):
+        for seg in range(start // self.segment_size, (start + count - 1) // self.segment_size + 1):
+            self.dirty.add(self._segment(account_no, seg))
+
+    def has(self, account_no: str, n: int) -> bool:
+        return len(self._read_segment(account_no, n // self.segment_size, n + 1)) > n % self.segment_size
+
+    def flush(self):
+        for path in self.dirty:
+            try:
+                with path.open("rb+") as f:
+                    os.fsync(f.fileno())
+            except FileNotFoundError:
+                pass
+        self.dirty.clear()
+
+    def write_all(self, account_no: str, txs: list):
+        # used when moving an inline "transactions" list out of a legacy record
+        self.drop(account_no)
+        for seg in range(0, len(txs), self.segment_size):
+            path = self._segment(account_no, seg // self.segment_size)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            lines = [json.dumps(dict(tx, n=seg + i), separators=(",", ":")) for i, tx in enumerate(txs[seg:seg + self.segment_size])]
+            _atomic_write_text(path, "\n".join(lines) + "\n")
+
+    def _read_segment(self, account_no: str, seg: int, count: int) -> list:
+        path = self._segment(account_no, seg)
+        entries = {}
+        if path.exists():
+            with path.open("rb") as f:
+                for line in f:
+                    try:
+                        tx = json.loads(line)
+                    except ValueError:
+                        continue
+                    n = tx.pop("n", None)
+                    if n is not None and n < count:
+                        entries[n] = tx
+        return [entries[n] for n in sorted(entries)]
+
+    def page(self, account_no: str, count: int, offset: int = 0, limit: int = None) -> list:
+        # newest first: entries count-1-offset down to count-offset-limit
+        hi = count - offset
+        lo = 0 if limit is None else max(0, hi - limit)
+        out = []
+        seg = (hi - 1) // self.segment_size if hi > 0 else -1
+        while seg >= 0 and hi > lo:
+            base = seg * self.segment_size
+            entries = self._read_segment(account_no, seg, count)
+            for i in range(min(hi, base + len(entries)) - 1, max(lo, base) - 1, -1):
+                out.append(entries[i - base])
+            hi = base
+            seg -= 1
+        return out
+
+    def iter(self, account_no: str, count: int):
+        # oldest first, one segment in memory at a time
+        for seg in range(0, (count + self.segment_size - 1) // self.segment_size):
+            yield from self._read_segment(account_no, seg, count)
+
+    def checkpoints(self, account_no: str, count: int) -> list:
+        # One per full segment: its first/last ts and the balance before/after it.
+        # Full segments never change, so these are cached in checkpoints.jsonl.
+        sealed = count // self.segment_size
+        path = self._dir(account_no) / "checkpoints.jsonl"
+        cps, clean = [], True
+        if path.exists():
+            with path.open("rb") as f:
+                for line in f:
+                    try:
+                        cp = json.loads(line)
+                    except ValueError:
+                        clean = False
+                        continue
+                    if cp.get("seg") == len(cps):
+                        cps.append(cp)
+                    else:
+                        clean = False
+        cps = cps[:sealed]
+        new = []
+        for seg in range(len(cps), sealed):
+            entries = self._read_segment(account_no, seg, count)
+            if len(entries) != self.segment_size:
+                break
+            new.append({
+                "seg": seg,
+                "first_ts": entries[0].get("ts", ""),
+                "last_ts": entries[-1].get("ts", ""),
+                "open": _balance_before(entries[0]),
+                "close": entries[-1]["balance"],
+            })
+        cps += new
+        if not clean:
+            _atomic_write_text(path, "".join(json.dumps(cp) + "\n" for cp in cps))
+        elif new:
+            with path.open("a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(cp) + "\n" for cp in new))
+        return cps
+
+    def balance_at(self, account_no: str, count: int, ts: str):
+        # balance after every entry strictly before ts; reads at most one segment
+        if count == 0:
+            return None
+        cps = self.checkpoints(account_no, count)
+        sealed = len(cps)
+        i = bisect.bisect_left([cp["first_ts"] for cp in cps], ts) - 1
+        if i == sealed - 1 and count > sealed * self.segment_size and (not cps or cps[-1]["last_ts"] < ts):
+            entries = self._read_segment(account_no, sealed, count)
+            k = bisect.bisect_left([e.get("ts", "") for e in entries], ts)
+            if k:
+                return entries[k - 1]["balance"]
+            return cps[-1]["close"] if cps else _balance_before(entries[0])
+        if i < 0:
+            return cps[0]["open"]
+        if cps[i]["last_ts"] < ts:
+            return cps[i]["close"]
+        entries = self._read_segment(account_no, i, count)
+        k = bisect.bisect_left([e.get("ts", "") for e in entries], ts)
+        return entries[k - 1]["balance"] if k else cps[i]["open"]
+
+    def iter_between(self, account_no: str, count: int, start: str, end: str):
+        # entries with start <= ts < end, oldest first, skipping segments that end before start
+        cps = self.checkpoints(account_no, count)
+        seg = bisect.bisect_left([cp["last_ts"] for cp in cps], start)
+        for seg in range(seg, (count + self.segment_size - 1) // self.segment_size):
+            if seg < len(cps) and cps[seg]["first_ts"] >= end:
+                return
+            for tx in self._read_segment(account_no, seg, count):
+                ts = tx.get("ts", "")
+                if ts >= end:
+                    return
+                if ts >= start:
+                    yield tx
+
+    def drop(self, account_no: str):
+        shutil.rmtree(self._dir(account_no), ignore_errors=True)
+
+# ---------- Index helpers ----------
+class AccountIndex:
+    # accountNo -> record, accountNo -> position in the record list,
+    # and normalised email -> set of accountNos (emails are not unique).
+    # Over LazyRecords the first two fill in as accounts are looked up, and the
+    # email index is only built on the first find_by_email.
+    def __init__(self, records=()):
+        self.by_account = {}
+        self.position = {}
+        self.by_email = {}
+        self.rebuild(records)
+
+    def rebuild(self, records):
+        self.by_account.clear()
+        self.position.clear()
+        self.by_email.clear()
+        self.lazy = records if isinstance(records, LazyRecords) else None
+        self._emails_built = self.lazy is None
+        if self.lazy is None:
+            for pos, user in enumerate(records):
+                self.add(user, pos)
+
+    def add(self, user: dict, pos: int):
+        acc = user.get("accountNo")
+        if acc is None:
+            return
+        self.by_account[acc] = user
+        self.position[acc] = pos
+        if self._emails_built:
+            self.by_email.setdefault(_email_key(user.get("email")), set()).add(acc)
+
+    def remove(self, user: dict):
+        acc = user.get("accountNo")
+        self.by_account.pop(acc, None)
+        self.position.pop(acc, None)
+        if self._emails_built:
+            self._drop_email(user.get("email"), acc)
+
+    def move(self, user: dict, pos: int):
+        self.by_account[user["accountNo"]] = user
+        self.position[user["accountNo"]] = pos
+
+    def reindex_email(self, user: dict, old_email):
+        acc = user["accountNo"]
+        if not self._emails_built or _email_key(old_email) == _email_key(user.get("email")):
+            return
+        self._drop_email(old_email, acc)
+        self.by_email.setdefault(_email_key(user.get("email")), set()).add(acc)
+
+    def _drop_email(self, email, acc):
+        key = _email_key(email)
+        accounts = self.by_email.get(key)
+        if accounts is not None:
+            accounts.discard(acc)
+            if not accounts:
+                del self.by_email[key]
+
+    def get(self, account_no: str):
+        user = self.by_account.get(account_no)
+        if user is None and self.lazy is not None:
+            pos = self.lazy.locate(account_no)
+            if pos is not None:
+                user = self.by_account[account_no] = self.lazy[pos]
+                self.position[account_no] = pos
+        return user
+
+    def find_by_email(self, email: str) -> list:
+        if not self._emails_built:
+            for user in self.lazy:
+                if user.get("accountNo") is not None:
+                    self.by_email.setdefault(_email_key(user.get("email")), set()).add(user["accountNo"])
+            self._emails_built = True
+        return [self.get(acc) for acc in sorted(self.by_email.get(_email_key(email), ()))]
+
+    def verify(self, records):
+        # Raises RuntimeError if the index disagrees with a fresh one built from the records.
+        expected = AccountIndex(records)
+        if self.by_account.keys() != expected.by_account.keys():
+            missing = expected.by_account.keys() - self.by_account.keys()
+            extra = self.by_account.keys() - expected.by_account.keys()
+            raise RuntimeError(f"accountNo index out of sync: missing {sorted(missing)}, extra {sorted(extra)}")
+        for acc, user in expected.by_account.items():
+            if self.by_account[acc] is not user:
+                raise RuntimeError(f"stale record for {acc}")
+            if self.position.get(acc) != expected.position[acc]:
+                raise RuntimeError(f"stale position for {acc}: {self.position.get(acc)} != {expected.position[acc]}")
+        if self.by_email != expected.by_email:
+            raise RuntimeError("email index out of sync")
+        return True
+
+# ---------- Admin query layer ----------
+SORT_FIELDS = ("created_at", "balance", "tx_count")
+SEARCH_FIELDS = ("name", "email", "accountNo")
+AGE_BANDS = ((18, 25), (26, 35), (36, 50), (51, 65), (66, None))
+
+def _age_band(age) -> str:
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return "unknown"
+    for lo, hi in AGE_BANDS:
+        if age >= lo and (hi is None or age <= hi):
+            return f"{lo}+" if hi is None else f"{lo}-{hi}"
+    return "under 18"
+
+def _query_key(user: dict, field: str):
+    if field in SEARCH_FIELDS:
+        return (user.get(field) or "").lower()
+    if field == "created_at":
+        return user.get("created_at") or ""
+    return int(user.get(field) or 0)
+
+def _prefix_end(prefix: str) -> str:
+    # smallest string greater than every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+class QueryIndex:
+    # One sorted list of (key, accountNo) per sortable/searchable field, so a page
+    # or a prefix range is a bisect plus a slice.
+    FIELDS = SORT_FIELDS + SEARCH_FIELDS
+
+    def __init__(self, records=()):
+        self.lists = {
+            f: sorted((_query_key(u, f), u["accountNo"]) for u in records if u.get("accountNo"))
+            for f in self.FIELDS
+        }
+
+    def keys_of(self, user: dict) -> dict:
+        return {f: _query_key(user, f) for f in self.FIELDS}
+
+    def add(self, user: dict):
+        for f in self.FIELDS:
+            bisect.insort(self.lists[f], (_query_key(user, f), user["accountNo"]))
+
+    def remove(self, user: dict, keys: dict):
+        for f in self.FIELDS:
+            self._discard(self.lists[f], (keys[f], user["accountNo"]))
+
+    def move(self, user: dict, before: dict):
+        # only fields whose key changed are touched (a deposit moves balance and tx_count)
+        for f in self.FIELDS:
+            key = _query_key(user, f)
+            if key != before[f]:
+                self._discard(self.lists[f], (before[f], user["accountNo"]))
+                bisect.insort(self.lists[f], (key, user["accountNo"]))
+
+    @staticmethod
+    def _discard(entries: list, item):
+        i = bisect.bisect_left(entries, item)
+        if i < len(entries) and entries[i] == item:
+            del entries[i]
+
+    def query(self, sort, descending, search, field, offset, limit, lookup):
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort by {sort}")
+        # blank search text means no search; an empty prefix has no range end
+        prefix = (search or "").strip().lower()
+        if prefix:
+            if field not in SEARCH_FIELDS:
+                raise ValueError(f"Cannot search by {field}")
+            entries = self.lists[field]
+            lo = bisect.bisect_left(entries, (prefix,))
+            hi = bisect.bisect_left(entries, (_prefix_end(prefix),))
+            # matches come out in `field` order; re-sort just the matches by the requested key
+            matches = sorted((_query_key(lookup(acc), sort), acc) for _, acc in entries[lo:hi])
+            entries, total = matches, len(matches)
+        else:
+            entries = self.lists[sort]
+            total = len(entries)
+        if descending:
+            start = max(0, total - offset - limit)
+            page = entries[start:max(0, total - offset)][::-1]
+        else:
+            page = entries[offset:offset + limit]
+        return [acc for _, acc in page], total
+
+class BankStats:
+    # Bank-wide aggregates, adjusted per mutation instead of rescanned.
+    def __init__(self, records=()):
+        self.account_count = 0
+        self.total_balance = 0
+        self.total_deposits = 0
+        self.age_bands = {}
+        self.stale = False
+        for user in records:
+            self.add(user)
+
+    def add(self, user: dict, sign: int = 1):
+        self.account_count += sign
+        self.total_balance += sign * int(user.get("balance") or 0)
+        if "total_deposited" in user:
+            self.total_deposits += sign * int(user["total_deposited"])
+        else:
+            self.stale = True
+        band = _age_band(user.get("age"))
+        self.age_bands[band] = self.age_bands.get(band, 0) + sign
+
+    def remove(self, user: dict):
+        self.add(user, -1)
+
+    def as_dict(self) -> dict:
+        return {
+            "account_count": self.account_count,
+            "total_balance": self.total_balance,
+            "total_deposits": self.total_deposits,
+            "age_bands": {k: v for k, v in sorted(self.age_bands.items()) if v},
+        }
+
+# ---------- Storage backends ----------
+class Storage:
+    # What Bank needs from a backend. Records are plain dicts in the data.json schema.
+    # generation goes up whenever the visible data changes.
+    generation = 0
+
+    def get(self, account_no: str):
+        raise NotImplementedError
+
+    def exists(self, account_no: str) -> bool:
+        return self.get(account_no) is not None
+
+    def find_by_email(self, email: str) -> list:
+        raise NotImplementedError
+
+    def insert(self, user: dict):
+        raise NotImplementedError
+
+    # expected_version: raise ConflictError unless the account is still at that version
+    def update(self, account_no: str, changes: dict, expected_version: int = None):
+        raise NotImplementedError
+
+    def delete(self, account_no: str):
+        raise NotImplementedError
+
+    def append_tx(self, account_no: str, tx: dict, expected_version: int = None):
+        # stores tx and sets the account balance to tx["balance"]
+        raise NotImplementedError
+
+    def append_tx_batch(self, entries: list, expected_versions: dict):
+        # entries: [(account_no, tx), ...] committed together or not at all
+        raise NotImplementedError
+
+    def transactions(self, account_no: str, offset: int = 0, limit: int = None) -> list:
+        # newest first
+        raise NotImplementedError
+
+    def iter_transactions(self, account_no: str):
+        # oldest first, streamed
+        raise NotImplementedError
+
+    def balance_at(self, account_no: str, ts: str):
+        # balance after every transaction strictly before ts (ISO string); None if no such account
+        raise NotImplementedError
+
+    def transactions_between(self, account_no: str, start: str, end: str):
+        # transactions with start <= ts < end, oldest first
+        raise NotImplementedError
+
+    def accounts(self):
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def reserve_account_numbers(self, count: int):
+        # (first sequence number, permutation key) of a fresh block of count numbers
+        raise NotImplementedError
+
+    def query_accounts(self, sort: str = "created_at", descending: bool = False, search: str = None,
+                       field: str = "name", offset: int = 0, limit: int = 50) -> dict:
+        # {"rows": [...], "total": matching accounts}; search is a case-insensitive prefix of field
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        # account_count, total_balance, total_deposits, age_bands
+        raise NotImplementedError
+
+    def save(self):
+        pass
+
+    def reload(self):
+        pass
+
+    def refresh(self) -> bool:
+        # pick up changes made by other processes; True if anything changed
+        return False
+
+    def close(self):
+        pass
+
+
+class JsonStorage(Storage):
+    # Account records live in memory; data.json (or a binary data.snap, mapped and
+    # decoded per account as it is touched) is the snapshot, data.journal the
+    # tail, and transaction history sits in <data>.history/ and loads on demand.
+    # Several processes may share the files: every commit takes data.lock,
+    # catches up with what the others wrote, then checks account versions.
+    def __init__(self, path: Path = DATA_FILE, journal: bool = True):
+        self.path = Path(path)
+        self.journal = Journal(self.path.with_suffix(".journal")) if journal else None
+        self.history = HistoryStore(self.path.with_suffix(".history"))
+        self.lock = FileLock(self.path.with_suffix(".lock"))
+        self.sequence = SequenceFile(self.path.with_suffix(".seq"))
+        self.data = []
+        self.index = AccountIndex()
+        self.generation = 0
+        self._snapshot_sig = None
+        self._query = None
+        self._stats = None
+        self.reload()
+
+    def save(self):
+        # full snapshot; in journal mode this is the compaction step
+        with self.lock:
+            self._catch_up()
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        # the snapshot stops pointing at the journal, so batch history must be on disk first
+        self.history.flush()
+        if self.path.suffix == SNAPSHOT_SUFFIX:
+            write_snapshot(self.path, self.data)
+        else:
+            _atomic_write(self.path, self.data if isinstance(self.data, list) else list(self.data))
+        self._snapshot_sig = _file_sig(self.path)
+        if self.journal is not None:
+            self.journal.reset()
+
+    def compact(self):
+        self.save()
+
+    def reload(self):
+        with self.lock:
+            self._load()
+
+    def _load(self):
+        if self.journal is not None:
+            self.journal.close()
+        self._snapshot_sig = _file_sig(self.path)
+        self._query = None
+        self._stats = None
+        self.data = _read_data(self.path)
+        self.index.rebuild(self.data)
+        migrated = self._split_history()
+        if self.journal is not None:
+            for record in self.journal.replay():
+                self._apply(record, recover=True)
+        if migrated:
+            self._write_snapshot()
+        self.generation += 1
+
+    def refresh(self) -> bool:
+        with self.lock:
+            return self._catch_up()
+
+    def _catch_up(self) -> bool:
+        # a rewritten snapshot means someone compacted: reparse; otherwise just tail the journal
+        if _file_sig(self.path) != self._snapshot_sig:
+            self._load()
+            return True
+        if self.journal is None:
+            return False
+        records = self.journal.read_new()
+        for record in records:
+            self._apply(record)
+        return bool(records)
+
+    def _split_history(self) -> bool:
+        # older snapshots keep history inline; move it to segments once
+        if isinstance(self.data, LazyRecords):
+            return False  # binary snapshots are written from already-split records
+        migrated = False
+        for user in self.data:
+            txs = user.pop("transactions", None)
+            if txs is None:
+                user.setdefault("tx_count", 0)
+                continue
+            if user.get("accountNo"):
+                self.history.write_all(user["accountNo"], txs)
+            user["tx_count"] = len(txs)
+            user["total_deposited"] = sum(t.get("amount", 0) for t in txs if t.get("type") == "deposit")
+            migrated = True
+        return migrated
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+        self.sequence.close()
+        self.lock.close()
+
+    def _commit(self, make_record, account_no: str = None, expected_version: int = None):
+        # make_record runs under the lock against caught-up state and returns the record
+        with self.lock:
+            self._catch_up()
+            if expected_version is not None:
+                user = self.index.get(account_no)
+                if user is None or user.get("version", 0) != expected_version:
+                    raise ConflictError(account_no)
+            record = make_record()
+            if self.journal is None:
+                self._apply(record)
+                self._write_snapshot()
+                return
+            self.journal.append(record)
+            self._apply(record)
+            if self.journal.should_compact():
+                self._write_snapshot()
+
+    def _apply(self, record: dict, recover: bool = False):
+        # recover: replaying at startup, so unsynced batch history may be missing
+        self.generation += 1
+        op = record["op"]
+        if op == "create":
+            user = record["user"]
+            user.pop("transactions", None)
+            user.setdefault("tx_count", 0)
+            if not user["tx_count"]:
+                user.setdefault("total_deposited", 0)
+            existing = self.index.get(user["accountNo"])
+            if existing is not None:
+                before = self._unindex_derived(existing)
+                if before is not None:
+                    self._query.remove(existing, before)
+                pos = self.index.position[user["accountNo"]]
+                self.index.remove(existing)
+                self.data[pos] = user
+                self.index.add(user, pos)
+            else:
+                self.data.append(user)
+                self.index.add(user, len(self.data) - 1)
+            self._index_derived(user)
+            return
+        user = self.index.get(record["acc"])
+        if user is None:
+            return
+        before = self._unindex_derived(user)
+        if op == "tx":
+            # "n" is tx_count before this entry, so a replay skips it once applied
+            if user.get("tx_count", 0) == record["n"]:
+                if "tx" in record:
+                    # journals written before history moved out carry the entry itself
+                    self.history.append(record["acc"], record["n"], record["tx"])
+                    record["balance"] = record["tx"]["balance"]
+                    record.update(type=record["tx"]["type"], amount=record["tx"]["amount"])
+                if "type" not in record:
+                    user.pop("total_deposited", None)  # unknown now; recomputed from history on demand
+                elif record["type"] == "deposit" and "total_deposited" in user:
+                    user["total_deposited"] += record["amount"]
+                user["tx_count"] = record["n"] + 1
+                user["balance"] = record["balance"]
+                user["version"] = record.get("v", user.get("version", 0) + 1)
+        elif op == "txs":
+            # a group-committed run of k entries; the journal holds the entries themselves
+            if user.get("tx_count", 0) == record["n"]:
+                k = len(record["txs"])
+                if recover and not self.history.has(record["acc"], record["n"] + k - 1):
+                    self.history.append_many(record["acc"], record["n"], record["txs"], sync=False)
+                else:
+                    self.history.mark_dirty(record["acc"], record["n"], k)
+                if "total_deposited" in user:
+                    user["total_deposited"] += sum(t["amount"] for t in record["txs"] if t["type"] == "deposit")
+                user["tx_count"] = record["n"] + k
+                user["balance"] = record["balance"]
+                user["version"] = record["v"]
+        elif op == "update":
+            old_email = user.get("email")
+            user.update(record["set"])
+            if "v" in record:
+                user["version"] = record["v"]
+            self.index.reindex_email(user, old_email)
+        elif op == "delete":
+            # swap the last record into the hole so removal stays O(1)
+            pos = self.index.position[record["acc"]]
+            last = self.data.pop()
+            if last is not user:
+                self.data[pos] = last
+                self.index.move(last, pos)
+            self.index.remove(user)
+            self.history.drop(record["acc"])
+            if before is not None:
+                self._query.remove(user, before)
+            return
+        self._index_derived(user, before)
+
+    # the admin query index and stats are built on first use, then kept current here
+    def _unindex_derived(self, user: dict):
+        # returns the old sort keys; the query index itself is only touched afterwards
+        if self._stats is not None:
+            self._stats.remove(user)
+        return self._query.keys_of(user) if self._query is not None else None
+
+    def _index_derived(self, user: dict, before: dict = None):
+        if self._query is not None:
+            if before is None:
+                self._query.add(user)
+            else:
+                self._query.move(user, before)
+        if self._stats is not None:
+            self._stats.add(user)
+
+    def query_accounts(self, sort: str = "created_at", descending: bool = False, search: str = None,
+                       field: str = "name", offset: int = 0, limit: int = 50) -> dict:
+        if self._query is None:
+            self._query = QueryIndex(self.data)
+        accs, total = self._query.query(sort, descending, search, field, offset, limit, self.index.get)
+        return {"rows": [self.index.get(acc) for acc in accs], "total": total}
+
+    def stats(self) -> dict:
+        if self._stats is None or self._stats.stale:
+            for user in self.data:
+                acc = user.get("accountNo")
+                if acc and "total_deposited" not in user:
+                    user = self.index.get(acc)  # the cached record, also for lazily decoded ones
+                    user["total_deposited"] = sum(
+                        t.get("amount", 0) for t in self.history.iter(acc, user.get("tx_count", 0)) if t.get("type") == "deposit"
+                    )
+            self._stats = BankStats(u for u in self.data if u.get("accountNo"))
+        return self._stats.as_dict()
+
+    def get(self, account_no: str):
+        return self.index.get(account_no)
+
+    def find_by_email(self, email: str) -> list:
+        return self.index.find_by_email(email)
+
+    def insert(self, user: dict):
+        def make_record():
+            if self.index.get(user["accountNo"]) is not None:
+                raise ConflictError(user["accountNo"])
+            return {"op": "create", "user": user}
+        self._commit(make_record)
+
+    def update(self, account_no: str, changes: dict, expected_version: int = None):
+        def make_record():
+            user = self.index.get(account_no)
+            if user is None:
+                raise ConflictError(account_no)
+            return {"op": "update", "acc": account_no, "set": changes, "v": user.get("version", 0) + 1}
+        self._commit(make_record, account_no, expected_version)
+
+    def delete(self, account_no: str):
+        self._commit(lambda: {"op": "delete", "acc": account_no})
+
+    def append_tx(self, account_no: str, tx: dict, expected_version: int = None):
+        def make_record():
+            user = self.index.get(account_no)
+            if user is None:
+                raise ConflictError(account_no)
+            n = user.get("tx_count", 0)
+            # history first: a journal record never points at an entry that is not on disk
+            self.history.append(account_no, n, tx)
+            return {"op": "tx", "acc": account_no, "n": n, "type": tx["type"], "amount": tx["amount"],
+                    "balance": tx["balance"], "v": user.get("version", 0) + 1}
+        self._commit(make_record, account_no, expected_version)
+
+    def append_tx_batch(self, entries: list, expected_versions: dict):
+        # entries: [(account_no, tx), ...] in order. One lock, one journal write, one fsync.
+        def make_records():
+            by_account = {}
+            for acc, tx in entries:
+                by_account.setdefault(acc, []).append(tx)
+            records = []
+            for acc, txs in by_account.items():
+                user = self.index.get(acc)
+                if user is None or user.get("version", 0) != expected_versions.get(acc, user.get("version", 0)):
+                    raise ConflictError(acc)
+                n = user.get("tx_count", 0)
+                self.history.append_many(acc, n, txs, sync=self.journal is None)
+                records.append({"op": "txs", "acc": acc, "n": n, "txs": txs, "balance": txs[-1]["balance"], "v": user.get("version", 0) + 1})
+            return records
+        with self.lock:
+            self._catch_up()
+            records = make_records()
+            if self.journal is not None:
+                self.journal.append_many(records)
+            for record in records:
+                self._apply(record)
+            if self.journal is None or self.journal.should_compact():
+                self._write_snapshot()
+
+    def transactions(self, account_no: str, offset: int = 0, limit: int = None) -> list:
+        user = self.index.get(account_no)
+        if not user:
+            return []
+        return self.history.page(account_no, user.get("tx_count", 0), offset, limit)
+
+    def iter_transactions(self, account_no: str):
+        user = self.index.get(account_no)
+        if user:
+            yield from self.history.iter(account_no, user.get("tx_count", 0))
+
+    def balance_at(self, account_no: str, ts: str):
+        user = self.index.get(account_no)
+        if user is None:
+            return None
+        balance = self.history.balance_at(account_no, user.get("tx_count", 0), ts)
+        return int(user.get("balance", 0)) if balance is None else balance
+
+    def transactions_between(self, account_no: str, start: str, end: str):
+        user = self.index.get(account_no)
+        if user:
+            yield from self.history.iter_between(account_no, user.get("tx_count", 0), start, end)
+
+    def accounts(self):
+        return iter(self.data)
+
+    def count(self) -> int:
+        return len(self.data)
+
+    def reserve_account_numbers(self, count: int):
+        return self.sequence.reserve(count)
+
+ACCOUNT_COLUMNS = ("accountNo", "name", "age", "email", "pin_salt", "pin_hash", "balance", "created_at", "tx_count", "version")
+TX_COLUMNS = ("ts", "type", "amount", "balance", "note")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    accountNo TEXT PRIMARY KEY,
+    name TEXT,
+    age INTEGER,
+    email TEXT,
+    pin_salt TEXT,
+    pin_hash TEXT,
+    balance INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    tx_count INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS accounts_email ON accounts(lower(email));
+CREATE INDEX IF NOT EXISTS accounts_name ON accounts(lower(name));
+CREATE INDEX IF NOT EXISTS accounts_accountno ON accounts(lower(accountNo));
+CREATE INDEX IF NOT EXISTS accounts_balance ON accounts(balance);
+CREATE INDEX IF NOT EXISTS accounts_created_at ON accounts(created_at);
+CREATE INDEX IF NOT EXISTS accounts_tx_count ON accounts(tx_count);
+CREATE TABLE IF NOT EXISTS account_sequence (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    next INTEGER NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bank_stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    accountNo TEXT NOT NULL,
+    ts TEXT,
+    type TEXT,
+    amount INTEGER,
+    balance INTEGER,
+    note TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_account ON transactions(accountNo, id);
+CREATE INDEX IF NOT EXISTS transactions_account_ts ON transactions(accountNo, ts);
+"""
+
+
+class SqliteStorage(Storage):
+    # Only the rows an operation needs are read; nothing is cached in memory.
+    def __init__(self, path: Path = DB_FILE, pool_size: int = 4):
+        self.path = Path(path)
+        self._pool = queue.Queue()
+        self._lock = threading.Lock()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._conn() as con:
+            con.executescript(SCHEMA)
+            columns = {r["name"] for r in con.execute("PRAGMA table_info(accounts)")}
+            if "version" not in columns:
+                con.execute("ALTER TABLE accounts ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._backfill_stats()
+
+    def _connect(self):
+        con = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    @contextmanager
+    def _conn(self):
+        con = self._pool.get()
+        try:
+            yield con
+        finally:
+            self._pool.put(con)
+
+    @contextmanager
+    def _tx(self):
+        with self._conn() as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                yield con
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            con.execute("COMMIT")
+
+    @staticmethod
+    def _row_to_user(row) -> dict:
+        user = {k: row[k] for k in ACCOUNT_COLUMNS}
+        if row["extra"]:
+            user.update(json.loads(row["extra"]))
+        return user
+
+    @staticmethod
+    def _user_to_row(user: dict) -> tuple:
+        # total_deposited is derived here: bank_stats holds the sum and transactions the detail
+        extra = {k: v for k, v in user.items() if k not in ACCOUNT_COLUMNS and k not in ("transactions", "total_deposited")}
+        row = [user.get(k) for k in ACCOUNT_COLUMNS]
+        row[ACCOUNT_COLUMNS.index("balance")] = int(user.get("balance") or 0)
+        row[ACCOUNT_COLUMNS.index("tx_count")] = int(user.get("tx_count", len(user.get("transactions", []))))
+        row[ACCOUNT_COLUMNS.index("version")] = int(user.get("version", 0))
+        return tuple(row) + (json.dumps(extra) if extra else None,)
+
+    def get(self, account_no: str):
+        with self._conn() as con:
+            row = con.execute("SELECT * FROM accounts WHERE accountNo = ?", (account_no,)).fetchone()
+        return self._row_to_user(row) if row else None
+
+    def exists(self, account_no: str) -> bool:
+        with self._conn() as con:
+            return con.execute("SELECT 1 FROM accounts WHERE accountNo = ?", (account_no,)).fetchone() is not None
+
+    def find_by_email(self, email: str) -> list:
+        with self._conn() as con:
+            rows = con.execute(
+                "SELECT * FROM accounts WHERE lower(email) = ? ORDER BY accountNo", (_email_key(email),)
+            ).fetchall()
+        return [self._row_to_user(r) for r in rows]
+
+    def insert(self, user: dict):
+        try:
+            with self._tx() as con:
+                self._insert(con, user)
+        except sqlite3.IntegrityError:
+            raise ConflictError(user["accountNo"])
+
+    def _insert(self, con, user: dict):
+        con.execute(
+            f"INSERT INTO accounts ({', '.join(ACCOUNT_COLUMNS)}, extra) VALUES ({', '.join('?' * (len(ACCOUNT_COLUMNS) + 1))})",
+            self._user_to_row(user),
+        )
+        txs = user.get("transactions") or []
+        if txs:
+            con.executemany(
+                "INSERT INTO transactions (accountNo, ts, type, amount, balance, note) VALUES (?, ?, ?, ?, ?, ?)",
+                [(user["accountNo"],) + tuple(t.get(k) for k in TX_COLUMNS) for t in txs],
+            )
+        deposits = sum(int(t.get("amount") or 0) for t in txs if t.get("type") == "deposit")
+        self._adjust_stats(con, {
+            "account_count": 1,
+            "total_balance": int(user.get("balance") or 0),
+            "total_deposits": deposits if txs else int(user.get("total_deposited") or 0),
+            "band:" + _age_band(user.get("age")): 1,
+        })
+
+    def insert_many(self, users, batch_size: int = 1000) -> int:
+        n = 0
+        batch = []
+        for user in users:
+            batch.append(user)
+            if len(batch) >= batch_size:
+                n += self._insert_batch(batch)
+                batch = []
+        if batch:
+            n += self._insert_batch(batch)
+        return n
+
+    def _insert_batch(self, users) -> int:
+        with self._tx() as con:
+            for user in users:
+                self._insert(con, user)
+        return len(users)
+
+    def _bump(self, con, account_no: str, expected_version: int, assignments: str = "", params=()):
+        # every account write bumps version; with expected_version it is a compare-and-set
+        sql = f"UPDATE accounts SET {assignments}{', ' if assignments else ''}version = version + 1 WHERE accountNo = ?"
+        params = (*params, account_no)
+        if expected_version is not None:
+            sql += " AND version = ?"
+            params += (expected_version,)
+        if con.execute(sql, params).rowcount != 1:
+            raise ConflictError(account_no)
+
+    def update(self, account_no: str, changes: dict, expected_version: int = None):
+        columns = {k: v for k, v in changes.items() if k in ACCOUNT_COLUMNS and k != "version"}
+        extra = {k: v for k, v in changes.items() if k not in ACCOUNT_COLUMNS}
+        with self._tx() as con:
+            self._bump(con, account_no, expected_version, ", ".join(f"{k} = ?" for k in columns), tuple(columns.values()))
+            if extra:
+                row = con.execute("SELECT extra FROM accounts WHERE accountNo = ?", (account_no,)).fetchone()
+                merged = json.loads(row["extra"]) if row and row["extra"] else {}
+                merged.update(extra)
+                con.execute("UPDATE accounts SET extra = ? WHERE accountNo = ?", (json.dumps(merged), account_no))
+
+    def delete(self, account_no: str):
+        with self._tx() as con:
+            row = con.execute("SELECT age, balance FROM accounts WHERE accountNo = ?", (account_no,)).fetchone()
+            if row is not None:
+                deposits = con.execute(
+                    "SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE accountNo = ? AND type = 'deposit'", (account_no,)
+                ).fetchone()[0]
+                self._adjust_stats(con, {
+                    "account_count": -1,
+                    "total_balance": -int(row["balance"] or 0),
+                    "total_deposits": -deposits,
+                    "band:" + _age_band(row["age"]): -1,
+                })
+            con.execute("DELETE FROM transactions WHERE accountNo = ?", (account_no,))
+            con.execute("DELETE FROM accounts WHERE accountNo = ?", (account_no,))
+
+    def _balance(self, con, account_no: str) -> int:
+        row = con.execute("SELECT balance FROM accounts WHERE accountNo = ?", (account_no,)).fetchone()
+        return int(row["balance"] or 0) if row else 0
+
+    def append_tx(self, account_no: str, tx: dict, expected_version: int = None):
+        with self._tx() as con:
+            old = self._balance(con, account_no)
+            self._bump(con, account_no, expected_version, "balance = ?, tx_count = tx_count + 1", (tx["balance"],))
+            self._adjust_stats(con, {
+                "total_balance": int(tx["balance"]) - old,
+                "total_deposits": int(tx["amount"]) if tx["type"] == "deposit" else 0,
+            })
+            con.execute(
+                "INSERT INTO transactions (accountNo, ts, type, amount, balance, note) VALUES (?, ?, ?, ?, ?, ?)",
+                (account_no,) + tuple(tx.get(k) for k in TX_COLUMNS),
+            )
+
+    def append_tx_batch(self, entries: list, expected_versions: dict):
+        by_account = {}
+        for acc, tx in entries:
+            by_account.setdefault(acc, []).append(tx)
+        with self._tx() as con:
+            delta = 0
+            for acc, txs in by_account.items():
+                old = self._balance(con, acc)
+                self._bump(con, acc, expected_versions.get(acc), "balance = ?, tx_count = tx_count + ?", (txs[-1]["balance"], len(txs)))
+                delta += int(txs[-1]["balance"]) - old
+            self._adjust_stats(con, {
+                "total_balance": delta,
+                "total_deposits": sum(int(tx["amount"]) for _, tx in entries if tx["type"] == "deposit"),
+            })
+            con.executemany(
+                "INSERT INTO transactions (accountNo, ts, type, amount, balance, note) VALUES (?, ?, ?, ?, ?, ?)",
+                [(acc,) + tuple(tx.get(k) for k in TX_COLUMNS) for acc, tx in entries],
+            )
+
+    def transactions(self, account_no: str, offset: int = 0, limit: int = None) -> list:
+        with self._conn() as con:
+            rows = con.execute(
+                "SELECT ts, type, amount, balance, note FROM transactions WHERE accountNo = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (account_no, -1 if limit is None else limit, offset),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def iter_transactions(self, account_no: str):
+        with self._conn() as con:
+            cur = con.execute(
+                "SELECT ts, type, amount, balance, note FROM transactions WHERE accountNo = ? ORDER BY id",
+                (account_no,),
+            )
+            while True:
+                rows = cur.fetchmany(500)
+                if not rows:
+                    break
+                for r in rows:
+                    yield dict(r)
+
+    def balance_at(self, account_no: str, ts: str):
+        with self._conn() as con:
+            row = con.execute(
+                "SELECT balance FROM transactions WHERE accountNo = ? AND ts < ? ORDER BY ts DESC, id DESC LIMIT 1",
+                (account_no, ts),
+            ).fetchone()
+            if row is not None:
+                return row["balance"]
+            first = con.execute(
+                "SELECT type, amount, balance FROM transactions WHERE accountNo = ? ORDER BY id LIMIT 1", (account_no,)
+            ).fetchone()
+            if first is not None:
+                return _balance_before(dict(first))
+            row = con.execute("SELECT balance FROM accounts WHERE accountNo = ?", (account_no,)).fetchone()
+        return None if row is None else int(row["balance"] or 0)
+
+    def transactions_between(self, account_no: str, start: str, end: str):
+        with self._conn() as con:
+            cur = con.execute(
+                "SELECT ts, type, amount, balance, note FROM transactions WHERE accountNo = ? AND ts >= ? AND ts < ? ORDER BY ts, id",
+                (account_no, start, end),
+            )
+            while True:
+                rows = cur.fetchmany(500)
+                if not rows:
+                    break
+                for r in rows:
+                    yield dict(r)
+
+    def accounts(self):
+        with self._conn() as con:
+            for row in con.execute("SELECT * FROM accounts ORDER BY rowid"):
+                yield self._row_to_user(row)
+
+    def count(self) -> int:
+        with self._conn() as con:
+            return con.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+
+    def reserve_account_numbers(self, count: int):
+        with self._tx() as con:
+            con.execute("INSERT OR IGNORE INTO account_sequence (id, next, key) VALUES (0, 0, ?)", (secrets.token_hex(16),))
+            start, key = con.execute("SELECT next, key FROM account_sequence WHERE id = 0").fetchone()
+            con.execute("UPDATE account_sequence SET next = next + ? WHERE id = 0", (count,))
+        return start, bytes.fromhex(key)
+
+    def query_accounts(self, sort: str = "created_at", descending: bool = False, search: str = None,
+                       field: str = "name", offset: int = 0, limit: int = 50) -> dict:
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort by {sort}")
+        where, params = "", ()
+        # stripped like the JSON backend's, so both match the same rows
+        prefix = (search or "").strip().lower()
+        if prefix:
+            if field not in SEARCH_FIELDS:
+                raise ValueError(f"Cannot search by {field}")
+            # a range on the lower() expression index instead of LIKE, which cannot use it
+            where = f"WHERE lower({field}) >= ? AND lower({field}) < ?"
+            params = (prefix, _prefix_end(prefix))
+        direction = "DESC" if descending else "ASC"
+        with self._conn() as con:
+            total = con.execute(f"SELECT COUNT(*) FROM accounts {where}", params).fetchone()[0]
+            rows = con.execute(
+                f"SELECT * FROM accounts {where} ORDER BY {sort} {direction}, accountNo {direction} LIMIT ? OFFSET ?",
+                params + (limit, offset),
+            ).fetchall()
+        return {"rows": [self._row_to_user(r) for r in rows], "total": total}
+
+    def stats(self) -> dict:
+        with self._conn() as con:
+            values = dict(con.execute("SELECT key, value FROM bank_stats").fetchall())
+        return {
+            "account_count": values.pop("account_count", 0),
+            "total_balance": values.pop("total_balance", 0),
+            "total_deposits": values.pop("total_deposits", 0),
+            "age_bands": {k[len("band:"):]: v for k, v in sorted(values.items()) if v},
+        }
+
+    @staticmethod
+    def _adjust_stats(con, deltas: dict):
+        con.executemany(
+            "INSERT INTO bank_stats (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            [(k, v) for k, v in deltas.items() if v],
+        )
+
+    def _backfill_stats(self):
+        # databases created before bank_stats existed get it computed once
+        with self._tx() as con:
+            if con.execute("SELECT 1 FROM bank_stats LIMIT 1").fetchone() is not None:
+                return
+            if con.execute("SELECT 1 FROM accounts LIMIT 1").fetchone() is None:
+                return
+            count, balance = con.execute("SELECT COUNT(*), COALESCE(SUM(balance), 0) FROM accounts").fetchone()
+            deposits = con.execute("SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE type = 'deposit'").fetchone()[0]
+            bands = {}
+            for (age,) in con.execute("SELECT age FROM accounts"):
+                band = "band:" + _age_band(age)
+                bands[band] = bands.get(band, 0) + 1
+            self._adjust_stats(con, {"account_count": count, "total_balance": balance, "total_deposits": deposits, **bands})
+
+    def refresh(self) -> bool:
+        # nothing is cached, so there is never anything to reload
+        return False
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get().close()
+
+
+def open_storage(backend: str = None, path=None) -> Storage:
+    # Backend is picked by config alone: BANK_STORAGE=json|sqlite, plus BANK_DATA_FILE / BANK_DB_FILE.
+    backend = (backend or os.environ.get("BANK_STORAGE", "json")).lower()
+    if backend == "json":
+        journal = os.environ.get("BANK_JOURNAL", "1") != "0"
+        return JsonStorage(Path(path or os.environ.get("BANK_DATA_FILE", DATA_FILE)), journal=journal)
+    if backend == "sqlite":
+        return SqliteStorage(Path(path or os.environ.get("BANK_DB_FILE", DB_FILE)))
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -1,183 +1,44 @@
-import json
-import secrets
-import string
-import hashlib
-from pathlib import Path
-from tempfile import NamedTemporaryFile
-import shutil
 import streamlit as st
-from datetime import datetime
-import re
-import io
-import csv
-
-DATA_FILE = Path("data.json")
-
-# ---------- Storage helpers ----------
-def _read_data():
-    if not DATA_FILE.exists():
-        return []
-    try:
-        with DATA_FILE.open("r", encoding="utf-8") as f:
-            content = f.read().strip()
-            return json.loads(content) if content else []
-    except Exception:
-        return []
-
-def _atomic_write(data):
-    tmp = NamedTemporaryFile("w", delete=False, encoding="utf-8")
-    try:
-        tmp.write(json.dumps(data, indent=2))
-        tmp.flush()
-        tmp.close()
-        shutil.move(tmp.name, DATA_FILE)
-    finally:
-        try:
-            tmp.close()
-        except Exception:
-            pass
-
-# ---------- Security helpers ----------
-def _hash_pin(pin: str, salt: str) -> str:
-    return hashlib.sha256((pin + salt).encode("utf-8")).hexdigest()
-
-def _generate_account_no(length: int = 10) -> str:
-    alphabet = string.ascii_uppercase + string.digits
-    return "".join(secrets.choice(alphabet) for _ in range(length))
-
-def _is_valid_email(email: str) -> bool:
-    return bool(re.match(r"^[^@\s]+@[^@\s]+\.[^@\s]+$", email))
-
-# ---------- Core bank logic ----------
-class Bank:
-    def __init__(self):
-        self.data = _read_data()
-
-    def save(self):
-        _atomic_write(self.data)
-
-    def find_user(self, account_no: str):
-        for user in self.data:
-            if user.get("accountNo") == account_no:
-                return user
-        return None
-
-    def create_account(self, name: str, age: int, email: str, pin: str) -> dict:
-        name = name.strip()
-        email = email.strip()
-        if not name:
-            raise ValueError("Name is required")
-        if age < 18:
-            raise ValueError("Minimum age is 18")
-        if not _is_valid_email(email):
-            raise ValueError("Enter a valid email")
-        if len(pin) != 4 or not pin.isdigit():
-            raise ValueError("PIN must be 4 digits")
-
-        for _ in range(200):
-            acc = _generate_account_no(10)
-            if not self.find_user(acc):
-                break
-        else:
-            raise RuntimeError("Unable to generate unique account number")
-
-        salt = secrets.token_hex(8)
-        user = {
-            "name": name,
-            "age": age,
-            "email": email,
-            "pin_salt": salt,
-            "pin_hash": _hash_pin(pin, salt),
-            "accountNo": acc,
-            "balance": 0,
-            "created_at": datetime.utcnow().isoformat(),
-            "transactions": []
-        }
-        self.data.append(user)
-        self.save()
-        return user
-
-    def authenticate(self, account_no: str, pin: str):
-        user = self.find_user(account_no)
-        if not user:
-            return None
-        expected = user.get("pin_hash")
-        salt = user.get("pin_salt")
-        if expected == _hash_pin(pin, salt):
-            return user
-        return None
-
-    def deposit(self, account_no: str, amount: int, note: str = ""):
-        if amount <= 0 or amount > 1000000:
-            raise ValueError("Amount must be between 1 and 1,000,000")
-        user = self.find_user(account_no)
-        if not user:
-            raise ValueError("Account not found")
-        user["balance"] = int(user.get("balance", 0)) + int(amount)
-        user["transactions"].append({
-            "ts": datetime.utcnow().isoformat(),
-            "type": "deposit",
-            "amount": int(amount),
-            "balance": user["balance"],
-            "note": note,
-        })
-        self.save()
-        return user["balance"]
-
-    def withdraw(self, account_no: str, amount: int, note: str = ""):
-        if amount <= 0:
-            raise ValueError("Invalid amount")
-        user = self.find_user(account_no)
-        if not user:
-            raise ValueError("Account not found")
-        if user.get("balance", 0) < amount:
-            raise ValueError("Insufficient balance")
-        user["balance"] = int(user.get("balance", 0)) - int(amount)
-        user["transactions"].append({
-            "ts": datetime.utcnow().isoformat(),
-            "type": "withdraw",
-            "amount": int(amount),
-            "balance": user["balance"],
-            "note": note,
-        })
-        self.save()
-        return user["balance"]
-
-    def update_details(self, account_no: str, **kwargs):
-        user = self.find_user(account_no)
-        if not user:
-            raise ValueError("Account not found")
-        if "name" in kwargs and kwargs["name"] is not None:
-            user["name"] = kwargs["name"].strip()
-        if "email" in kwargs and kwargs["email"] is not None:
-            if not _is_valid_email(kwargs["email"]):
-                raise ValueError("Enter a valid email")
-            user["email"] = kwargs["email"].strip()
-        if "pin" in kwargs and kwargs["pin"]:
-            pin = kwargs["pin"]
-            if len(pin) != 4 or not pin.isdigit():
-                raise ValueError("PIN must be 4 digits")
-            salt = secrets.token_hex(8)
-            user["pin_salt"] = salt
-            user["pin_hash"] = _hash_pin(pin, salt)
-        self.save()
-        return user
-
-    def delete_account(self, account_no: str):
-        user = self.find_user(account_no)
-        if not user:
-            raise ValueError("Account not found")
-        self.data.remove(user)
-        self.save()
-        return True
+import json
+import logging
+import time
+from datetime import date, timedelta
+
+import bank_metrics
+from bank_core import Bank
+from bank_export import ACCOUNT_FIELDS, iter_accounts_csv, iter_transactions_csv, spool
+from bank_statements import Statement, iter_statement_csv
+
+TX_PAGE_SIZE = 50
+ADMIN_PAGE_SIZE = 50
+
+log = logging.getLogger("bank_app")
+if not log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(logging.INFO)
+
+@st.cache_resource
+def get_bank():
+    # one Bank per process, shared by every session and rerun
+    bank_metrics.configure_from_env()
+    return Bank()
 
 # ---------- Streamlit UI ----------
-bank = Bank()
+_rerun_start = time.perf_counter()
+bank = get_bank()
+reloaded = bank.refresh()
+_refresh_ms = (time.perf_counter() - _rerun_start) * 1000
 
 st.set_page_config(page_title="Simple Bank • Streamlit", layout="wide")
 
-if "user" not in st.session_state:
-    st.session_state.user = None
+# the session keeps only the account number; the record is looked up fresh each rerun
+if "account_no" not in st.session_state:
+    st.session_state.account_no = None
+user = bank.find_user(st.session_state.account_no) if st.session_state.account_no else None
+if user is None:
+    st.session_state.account_no = None
 
 # top bar
 col1, col2 = st.columns([3, 1])
@@ -185,8 +46,8 @@ with col1:
     st.title("Simple Bank — Demo")
     st.markdown("A local demo for learning Streamlit and Python. Not for real money.")
 with col2:
-    if st.session_state.user:
-        st.metric("Logged in as", st.session_state.user.get("name"))
+    if user:
+        st.metric("Logged in as", user.get("name"))
     else:
         st.write(" ")
 
@@ -195,6 +56,7 @@ menu = st.sidebar.selectbox("Choose action", [
     "Create Account",
     "Login",
     "Admin: Accounts",
+    "Admin: Diagnostics",
 ])
 
 if menu == "Home":
@@ -221,26 +83,26 @@ if menu == "Create Account":
 
 if menu == "Login":
     st.header("Account login")
-    if st.session_state.user:
-        st.success(f"You are logged in as {st.session_state.user['name']}")
-        st.write(f"Account: `{st.session_state.user['accountNo']}`")
+    if user:
+        st.success(f"You are logged in as {user['name']}")
+        st.write(f"Account: `{user['accountNo']}`")
         cols = st.columns([1, 1])
         with cols[0]:
             if st.button("Logout"):
-                st.session_state.user = None
+                st.session_state.account_no = None
                 st.rerun()
         with cols[1]:
             if st.button("Refresh from disk"):
-                bank.data = _read_data()
-                st.session_state.user = bank.find_user(st.session_state.user["accountNo"]) or None
-                st.rerun()
+                # only stats the files; reparses when another process changed them
+                if bank.refresh():
+                    st.rerun()
+                st.info("Already up to date")
 
         st.subheader("Account dashboard")
-        user = st.session_state.user
         left, right = st.columns([2, 1])
         with left:
             st.markdown("**Quick actions**")
-            action = st.selectbox("Choose an action", ["Show details", "Deposit", "Withdraw", "Update details", "Delete account", "Transactions"])
+            action = st.selectbox("Choose an action", ["Show details", "Deposit", "Withdraw", "Update details", "Delete account", "Transactions", "Statement"])
 
             if action == "Show details":
                 st.write("### Details")
@@ -257,7 +119,6 @@ if menu == "Login":
                         try:
                             newbal = bank.deposit(user["accountNo"], int(amt), note)
                             st.success(f"Deposited ₹{amt}. New balance: ₹{newbal}")
-                            st.session_state.user = bank.find_user(user["accountNo"])
                         except Exception as e:
                             st.error(str(e))
 
@@ -271,7 +132,6 @@ if menu == "Login":
                         try:
                             newbal = bank.withdraw(user["accountNo"], int(amt), note)
                             st.success(f"Withdrawn ₹{amt}. New balance: ₹{newbal}")
-                            st.session_state.user = bank.find_user(user["accountNo"])
                         except Exception as e:
                             st.error(str(e))
 
@@ -286,7 +146,6 @@ if menu == "Login":
                         try:
                             updated = bank.update_details(user["accountNo"], name=new_name, email=new_email, pin=new_pin)
                             st.success("Details updated")
-                            st.session_state.user = bank.find_user(user["accountNo"])
                         except Exception as e:
                             st.error(str(e))
 
@@ -299,7 +158,7 @@ if menu == "Login":
                         try:
                             bank.delete_account(user["accountNo"])
                             st.success("Account deleted.")
-                            st.session_state.user = None
+                            st.session_state.account_no = None
                             st.rerun()
                         except Exception as e:
                             st.error(str(e))
@@ -308,23 +167,66 @@ if menu == "Login":
 
             if action == "Transactions":
                 st.write("### Transaction history")
-                txs = user.get("transactions", [])
-                if not txs:
+                tx_count = user.get("tx_count", 0)
+                if not tx_count:
                     st.info("No transactions yet")
                 else:
-                    rows = list(reversed(txs))
+                    pages = (tx_count + TX_PAGE_SIZE - 1) // TX_PAGE_SIZE
+                    page = st.number_input(f"Page (newest first, {pages} total)", min_value=1, max_value=pages, value=1)
+                    rows = bank.transactions(user["accountNo"], offset=(page - 1) * TX_PAGE_SIZE, limit=TX_PAGE_SIZE)
                     st.table([
                         {"time": r["ts"], "type": r["type"], "amount": r["amount"], "balance": r["balance"], "note": r.get("note", "")}
                         for r in rows
                     ])
-                    csv_buf = io.StringIO()
-                    writer = csv.writer(csv_buf)
-                    writer.writerow(["ts", "type", "amount", "balance", "note"])
-                    for r in rows:
-                        writer.writerow([r["ts"], r["type"], r["amount"], r["balance"], r.get("note", "")])
-                    st.download_button("Download transactions CSV", data=csv_buf.getvalue(), file_name=f"tx_{user['accountNo']}.csv")
+                    acc_no = user["accountNo"]
+                    gz = st.checkbox("gzip", key="tx_gzip")
+                    # built only when clicked, streamed from the history segments
+                    st.download_button(
+                        "Download transactions CSV",
+                        data=lambda: spool(iter_transactions_csv(bank, acc_no), gzip=gz),
+                        file_name=f"tx_{acc_no}.csv" + (".gz" if gz else ""),
+                        mime="application/gzip" if gz else "text/csv",
+                    )
+
+            if action == "Statement":
+                st.write("### Statement")
+                acc_no = user["accountNo"]
+                today = date.today()
+                c1, c2 = st.columns(2)
+                start = c1.date_input("From", value=today.replace(day=1), key="stmt_from")
+                end = c2.date_input("To (inclusive)", value=today, key="stmt_to")
+                if end < start:
+                    st.error("'To' must not be before 'From'")
+                else:
+                    # periods are start <= ts < end, so the end date is the day after
+                    start_ts, end_ts = start.isoformat(), (end + timedelta(days=1)).isoformat()
+                    stmt = Statement(bank, acc_no, start_ts, end_ts)
+                    # show the first page of movements; the totals need the whole period
+                    rows = []
+                    for r in stmt.rows():
+                        if r[1] not in ("opening", "closing") and len(rows) < TX_PAGE_SIZE:
+                            rows.append(r)
+                    m1, m2, m3, m4 = st.columns(4)
+                    m1.metric("Opening", f"₹{stmt.opening}")
+                    m2.metric("Credits", f"₹{stmt.credits}")
+                    m3.metric("Debits", f"₹{stmt.debits}")
+                    m4.metric("Closing", f"₹{stmt.closing}")
+                    if rows:
+                        st.table([{"time": r[0], "type": r[1], "amount": r[2], "balance": r[3], "note": r[4]} for r in rows])
+                    else:
+                        st.info("No transactions in this period")
+                    gz = st.checkbox("gzip", key="stmt_gzip")
+                    st.download_button(
+                        "Download statement CSV",
+                        data=lambda: spool(iter_statement_csv(bank, acc_no, start_ts, end_ts), gzip=gz),
+                        file_name=f"statement_{acc_no}_{start}_{end}.csv" + (".gz" if gz else ""),
+                        mime="application/gzip" if gz else "text/csv",
+                    )
+                on = st.date_input("Balance at the end of", value=today, key="stmt_on")
+                st.write(f"₹{bank.balance_at(acc_no, (on + timedelta(days=1)).isoformat())}")
 
         with right:
+            user = bank.find_user(user["accountNo"]) or user
             st.metric("Balance", f"₹{user.get('balance', 0)}")
             st.write("Account created:")
             st.write(user.get("created_at"))
@@ -339,7 +241,7 @@ if menu == "Login":
             if not user:
                 st.error("Invalid account number or PIN")
             else:
-                st.session_state.user = user
+                st.session_state.account_no = user["accountNo"]
                 st.success(f"Welcome, {user['name']}")
                 st.rerun()
 
@@ -349,30 +251,86 @@ if menu == "Admin: Accounts":
     admin_pass = st.text_input("Admin password", type="password")
     if admin_pass == "admin123":
         st.success("Admin unlocked")
-        accounts = bank.data
-        if not accounts:
+        stats = bank.stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Accounts", stats["account_count"])
+        c2.metric("Total balance", f"₹{stats['total_balance']}")
+        c3.metric("Total deposits", f"₹{stats['total_deposits']}")
+        if stats["age_bands"]:
+            st.bar_chart(stats["age_bands"])
+        if not stats["account_count"]:
             st.info("No accounts yet")
         else:
-            view = [
-                {
-                    "accountNo": a.get("accountNo"),
-                    "name": a.get("name"),
-                    "age": a.get("age"),
-                    "email": a.get("email"),
-                    "balance": a.get("balance"),
-                    "created_at": a.get("created_at"),
-                    "tx_count": len(a.get("transactions", [])),
-                }
-                for a in accounts
-            ]
-            st.dataframe(view)
-            as_csv = io.StringIO()
-            cw = csv.writer(as_csv)
-            cw.writerow(["accountNo", "name", "age", "email", "balance", "created_at", "tx_count"])
-            for r in view:
-                cw.writerow([r[k] for k in ["accountNo", "name", "age", "email", "balance", "created_at", "tx_count"]])
-            st.download_button("Download accounts CSV", data=as_csv.getvalue(), file_name="accounts.csv")
+            f1, f2, f3, f4 = st.columns([3, 1, 1, 1])
+            search = f1.text_input("Search (prefix)", key="admin_search")
+            field = f2.selectbox("In", ["name", "email", "accountNo"], key="admin_field")
+            sort = f3.selectbox("Sort by", ["created_at", "balance", "tx_count"], key="admin_sort")
+            descending = f4.checkbox("Descending", value=True, key="admin_desc")
+            first = bank.query_accounts(sort, descending, search.strip() or None, field, 0, 0)
+            pages = max(1, (first["total"] + ADMIN_PAGE_SIZE - 1) // ADMIN_PAGE_SIZE)
+            page = st.number_input(f"Page ({first['total']} matching, {pages} pages)", min_value=1, max_value=pages, value=1)
+            result = bank.query_accounts(sort, descending, search.strip() or None, field, (page - 1) * ADMIN_PAGE_SIZE, ADMIN_PAGE_SIZE)
+            st.dataframe([{k: a.get(k) for k in ACCOUNT_FIELDS} for a in result["rows"]])
+            gz = st.checkbox("gzip", key="accounts_gzip")
+            st.download_button(
+                "Download accounts CSV",
+                data=lambda: spool(iter_accounts_csv(bank), gzip=gz),
+                file_name="accounts.csv" + (".gz" if gz else ""),
+                mime="application/gzip" if gz else "text/csv",
+            )
+    elif admin_pass:
+        st.error("Wrong admin password")
+
+if menu == "Admin: Diagnostics":
+    st.header("Admin — Diagnostics")
+    admin_pass = st.text_input("Admin password", type="password", key="diag_pass")
+    if admin_pass == "admin123":
+        c1, c2, c3 = st.columns(3)
+        if bank_metrics.enabled():
+            c1.success("Instrumentation on")
+            if c2.button("Turn off"):
+                bank_metrics.disable()
+                st.rerun()
+        else:
+            c1.info("Instrumentation off (BANK_METRICS=1 turns it on at startup)")
+            if c2.button("Turn on"):
+                bank_metrics.enable()
+                st.rerun()
+        if c3.button("Reset metrics"):
+            bank_metrics.METRICS.reset()
+            st.rerun()
+
+        snap = bank_metrics.METRICS.snapshot()
+        st.write(f"Last rerun: refresh {_refresh_ms:.2f} ms, reloaded={reloaded}")
+        if snap["ops"]:
+            st.write("### Operations (slowest total first)")
+            st.dataframe([dict(op=op, **row) for op, row in sorted(snap["ops"].items(), key=lambda kv: -kv[1]["total_s"])])
+        else:
+            st.info("No calls recorded yet")
+        if snap["op_bytes"]:
+            st.write("### Bytes written per call")
+            st.dataframe([dict(op=op, **row) for op, row in sorted(snap["op_bytes"].items())])
+            st.write({target: f"{n / 1024:.1f} KiB" for target, n in snap["bytes_written"].items()})
+
+        st.write("### Profile one operation")
+        ops = bank_metrics.operations()
+        if ops:
+            p1, p2, p3 = st.columns([3, 1, 1])
+            op = p1.selectbox("Operation", ops, key="diag_op")
+            mode = p2.selectbox("Profiler", ["cprofile", "tracemalloc"], key="diag_mode")
+            if p3.button("Profile next call"):
+                bank_metrics.profile_next(op, mode)
+                st.info(f"{op} will be profiled the next time it runs")
+        for op, prof in sorted(bank_metrics.profiles().items()):
+            with st.expander(f"{op} — {prof['mode']}, {prof['seconds'] * 1000:.2f} ms, {time.strftime('%H:%M:%S', time.localtime(prof['at']))}"):
+                st.code(prof["report"])
+
+        d1, d2 = st.columns(2)
+        d1.download_button("Prometheus text", bank_metrics.METRICS.prometheus(), file_name="bank_metrics.prom", mime="text/plain")
+        d2.download_button("JSON", json.dumps(snap, indent=2), file_name="bank_metrics.json", mime="application/json")
     elif admin_pass:
         st.error("Wrong admin password")
 
 st.caption("Note: This is a demo app for learning and shouldn't be used for real money or production without proper security.")
+
+log.info("rerun menu=%s refresh=%.2fms reloaded=%s total=%.2fms", menu, _refresh_ms, reloaded, (time.perf_counter() - _rerun_start) * 1000)
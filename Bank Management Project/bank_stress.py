@@ -0,0 +1,129 @@
+"""Concurrent-writer stress test for the Bank storage backends.
+
+Several processes, each running several threads with their own Bank instance,
+deposit into and withdraw from a handful of shared accounts. At the end the
+balances read back from disk must equal the sum of every operation that
+reported success, and each account's tx_count must equal its number of
+successful operations.
+
+    python bank_stress.py --backend json --processes 4 --threads 4 --ops 200
+"""
+import argparse
+import multiprocessing
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from bank_core import Bank
+from bank_storage import open_storage
+
+
+def _open(backend, path, compact_bytes):
+    storage = open_storage(backend, path)
+    if compact_bytes and getattr(storage, "journal", None) is not None:
+        storage.journal.max_bytes = compact_bytes
+    return Bank(storage)
+
+
+def _worker(backend, path, compact_bytes, accounts, ops, seed, results):
+    rng = random.Random(seed)
+    bank = _open(backend, path, compact_bytes)
+    applied = Counter()
+    count = Counter()
+    for _ in range(ops):
+        acc = rng.choice(accounts)
+        amount = rng.randint(1, 100)
+        try:
+            if rng.random() < 0.7:
+                bank.deposit(acc, amount)
+                applied[acc] += amount
+            else:
+                bank.withdraw(acc, amount)
+                applied[acc] -= amount
+            count[acc] += 1
+        except (ValueError, RuntimeError):
+            pass  # insufficient balance / retries exhausted: nothing was committed
+    bank.storage.close()
+    results.append((applied, count))
+
+
+def _process(backend, path, compact_bytes, accounts, threads, ops, seed, queue):
+    results = []
+    workers = [
+        threading.Thread(target=_worker, args=(backend, path, compact_bytes, accounts, ops, seed * 1000 + t, results))
+        for t in range(threads)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    applied, count = Counter(), Counter()
+    for a, c in results:
+        applied.update(a)
+        count.update(c)
+    queue.put((dict(applied), dict(count)))
+
+
+def run(backend: str, processes: int, threads: int, ops: int, n_accounts: int, compact_bytes: int = 0) -> bool:
+    workdir = Path(tempfile.mkdtemp(prefix="bank_stress_"))
+    path = workdir / ("data.json" if backend == "json" else "bank.db")
+    try:
+        bank = Bank(open_storage(backend, path))
+        accounts = [bank.create_account(f"stress{i}", 30, f"stress{i}@example.com", "1234")["accountNo"] for i in range(n_accounts)]
+        bank.storage.close()
+
+        queue = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=_process, args=(backend, path, compact_bytes, accounts, threads, ops, p, queue))
+            for p in range(processes)
+        ]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        applied, count = Counter(), Counter()
+        for _ in procs:
+            a, c = queue.get()
+            applied.update(a)
+            count.update(c)
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        bank = Bank(open_storage(backend, path))
+        ok = True
+        for acc in accounts:
+            user = bank.find_user(acc)
+            history = list(bank.iter_transactions(acc))
+            expected = applied.get(acc, 0)
+            if user["balance"] != expected or user["tx_count"] != count.get(acc, 0) or len(history) != user["tx_count"]:
+                ok = False
+                print(f"MISMATCH {acc}: balance={user['balance']} expected={expected} "
+                      f"tx_count={user['tx_count']} expected={count.get(acc, 0)} history={len(history)}")
+        bank.storage.close()
+        total = sum(count.values())
+        print(f"{backend}: {processes}x{threads} writers, {total} committed ops in {elapsed:.2f}s "
+              f"({total / elapsed:.0f} ops/s) -> {'OK' if ok else 'LOST UPDATES'}")
+        return ok
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=200, help="operations per thread")
+    parser.add_argument("--accounts", type=int, default=5)
+    parser.add_argument("--compact-bytes", type=int, default=0, help="small journal limit to force compactions mid-run")
+    args = parser.parse_args()
+    ok = run(args.backend, args.processes, args.threads, args.ops, args.accounts, args.compact_bytes)
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
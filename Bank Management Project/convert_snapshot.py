@@ -0,0 +1,185 @@
+"""Convert between data.json and the binary data.snap, and benchmark cold start.
+
+    python convert_snapshot.py to-binary --source data.json --target data.snap
+    python convert_snapshot.py to-json --source data.snap --target data.json
+    python convert_snapshot.py bench --accounts 1000000
+
+Start the app on the binary snapshot with BANK_DATA_FILE=data.snap. Both files
+share the journal, history and sequence files, which are named after the stem.
+"""
+import argparse
+import json
+import os
+import random
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bank_account_numbers import FeistelPermutation, encode
+from bank_snapshot import SnapshotReader, write_snapshot
+from bank_storage import HistoryStore, JsonStorage, iter_json_array
+
+
+def to_binary(source: Path, target: Path) -> int:
+    journal = source.with_suffix(".journal")
+    if journal.exists() and journal.stat().st_size:
+        # fold unflushed journal entries into the JSON first
+        storage = JsonStorage(source)
+        storage.save()
+        storage.close()
+    if source.with_suffix(".history") != target.with_suffix(".history") and source.with_suffix(".history").exists():
+        shutil.copytree(source.with_suffix(".history"), target.with_suffix(".history"), dirs_exist_ok=True)
+    history = HistoryStore(target.with_suffix(".history"))
+    count = 0
+
+    def records(fh):
+        nonlocal count
+        for user in iter_json_array(fh):
+            txs = user.pop("transactions", None)
+            if txs is not None:
+                # the binary format never holds history inline
+                if user.get("accountNo"):
+                    history.write_all(user["accountNo"], txs)
+                user["tx_count"] = len(txs)
+                user["total_deposited"] = sum(t.get("amount", 0) for t in txs if t.get("type") == "deposit")
+            count += 1
+            yield user
+
+    with source.open("r", encoding="utf-8") as fh:
+        write_snapshot(target, records(fh))
+    return count
+
+
+def to_json(source: Path, target: Path) -> int:
+    reader = SnapshotReader(source)
+    tmp = target.with_name(target.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        fh.write("[")
+        for pos, user in enumerate(reader):
+            fh.write(",\n" if pos else "\n")
+            fh.write(json.dumps(user))
+        fh.write("\n]")
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, target)
+    return len(reader)
+
+
+def _synthetic(n: int, seed: int):
+    rng = random.Random(seed)
+    perm = FeistelPermutation(secrets.token_bytes(16))
+    for i in range(n):
+        yield {
+            "name": f"customer{i}",
+            "age": rng.randint(18, 90),
+            "email": f"customer{i}@example.com",
+            "pin_salt": "%016x" % rng.getrandbits(64),
+            "pin_hash": "%064x" % rng.getrandbits(256),
+            "pin_scheme": "scrypt",
+            "pin_params": {"n": 16384, "r": 8, "p": 1},
+            "accountNo": encode(perm.permute(i)),
+            "balance": rng.randint(0, 100000),
+            "created_at": "2024-01-01T00:00:00.%06d" % (i % 1000000),
+            "tx_count": 0,
+            "total_deposited": 0,
+            "version": 0,
+        }
+
+
+def _peak_rss_mb():
+    # None where the resource module does not exist (Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def cmd_measure(args):
+    # run in a fresh interpreter per format so peak RSS belongs to one load only
+    start = time.perf_counter()
+    storage = JsonStorage(args.path, journal=False)
+    opened = time.perf_counter() - start
+    start = time.perf_counter()
+    found = sum(1 for acc in args.lookup if storage.get(acc) is not None)
+    lookups = time.perf_counter() - start
+    print(json.dumps({
+        "open_ms": round(opened * 1000, 3),
+        "lookup_ms": round(lookups * 1000 / max(1, len(args.lookup)), 3),
+        "found": found,
+        "peak_rss_mb": _peak_rss_mb(),
+    }))
+    return 0
+
+
+def cmd_bench(args):
+    workdir = Path(tempfile.mkdtemp(prefix="bank_snap_"))
+    try:
+        json_path, snap_path = workdir / "data.json", workdir / "data.snap"
+        sample = []
+        with json_path.open("w", encoding="utf-8") as fh:
+            fh.write("[")
+            for i, user in enumerate(_synthetic(args.accounts, args.seed)):
+                fh.write(",\n" if i else "\n")
+                fh.write(json.dumps(user))
+                if i % max(1, args.accounts // 20) == 0:
+                    sample.append(user["accountNo"])
+            fh.write("\n]")
+        start = time.perf_counter()
+        to_binary(json_path, snap_path)
+        convert_s = time.perf_counter() - start
+
+        result = {
+            "accounts": args.accounts,
+            "json_bytes": json_path.stat().st_size,
+            "snap_bytes": snap_path.stat().st_size,
+            "convert_s": round(convert_s, 2),
+        }
+        for name, path in (("json", json_path), ("snap", snap_path)):
+            out = subprocess.run(
+                [sys.executable, __file__, "measure", str(path), *sample],
+                check=True, capture_output=True, text=True, cwd=Path(__file__).resolve().parent,
+            )
+            result[name] = json.loads(out.stdout)
+        result["open_speedup"] = round(result["json"]["open_ms"] / max(result["snap"]["open_ms"], 0.001))
+        print(json.dumps(result, indent=2))
+        return 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, src, dst in (("to-binary", to_binary, "data.json", "data.snap"), ("to-json", to_json, "data.snap", "data.json")):
+        p = sub.add_parser(name)
+        p.add_argument("--source", type=Path, default=Path(src))
+        p.add_argument("--target", type=Path, default=Path(dst))
+        p.set_defaults(convert=func)
+
+    p = sub.add_parser("bench", help="cold start and peak RSS, JSON vs binary, on synthetic accounts")
+    p.add_argument("--accounts", type=int, default=1000000)
+    p.add_argument("--seed", type=int, default=7)
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("measure")
+    p.add_argument("path", type=Path)
+    p.add_argument("lookup", nargs="*")
+    p.set_defaults(func=cmd_measure)
+
+    args = parser.parse_args()
+    if hasattr(args, "convert"):
+        start = time.perf_counter()
+        n = args.convert(args.source, args.target)
+        print(f"converted {n} accounts into {args.target} in {time.perf_counter() - start:.2f}s")
+        return
+    raise SystemExit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Stream an existing data.json (plus its journal) into the SQLite backend.
+
+    python migrate_to_sqlite.py --source data.json --target bank.db
+
+Afterwards start the app with BANK_STORAGE=sqlite to use the database.
+"""
+import argparse
+import time
+from pathlib import Path
+
+from bank_storage import HistoryStore, JsonStorage, SqliteStorage, iter_json_array
+
+
+def migrate(source: Path, target: Path, batch_size: int = 1000) -> int:
+    history = HistoryStore(source.with_suffix(".history"))
+
+    def with_history(user):
+        # history kept in segment files moves into the transactions table
+        if "transactions" not in user and user.get("tx_count"):
+            user = dict(user, transactions=list(history.iter(user["accountNo"], user["tx_count"])))
+        return user
+
+    db = SqliteStorage(target)
+    try:
+        if db.count():
+            raise SystemExit(f"{target} already holds accounts; refusing to merge into it")
+        journal = source.with_suffix(".journal")
+        if journal.exists() and journal.stat().st_size:
+            # unflushed journal entries only exist once the snapshot is replayed in memory
+            storage = JsonStorage(source)
+            try:
+                accounts = (with_history(u) for u in storage.accounts() if u.get("accountNo"))
+                return db.insert_many(accounts, batch_size=batch_size)
+            finally:
+                storage.close()
+        with source.open("r", encoding="utf-8") as fh:
+            accounts = (with_history(u) for u in iter_json_array(fh) if u.get("accountNo"))
+            return db.insert_many(accounts, batch_size=batch_size)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", type=Path, default=Path("data.json"))
+    parser.add_argument("--target", type=Path, default=Path("bank.db"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    n = migrate(args.source, args.target, args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"migrated {n} accounts into {args.target} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""Headless bulk mode for OOPS_Project.py: stream operations in, write once.
+
+    python oops_bulk.py import ops.csv                          # into data.json (or data.snap)
+    python oops_bulk.py import ops.jsonl.gz --database legacy.json --rejects rejects.csv
+    python oops_bulk.py export-streamlit bank.db --database legacy.json --processes 4
+    python OOPS_Project.py import ops.csv                       # same as the first line
+
+Input is CSV with a header row or JSON Lines, either optionally gzipped:
+
+    op         create (default), deposit or withdraw
+    accountNo  the account; on create it keeps a legacy number, else a new one is allocated
+    pin        4 digits; must match the account for deposit and withdraw
+    amount     for deposit and withdraw
+    name, age, email, balance    for create
+
+Rows are read one at a time and applied through the accountNo index with the
+same rules as the interactive menu, and the database is written once at the
+end (never with --dry-run). Rejected rows go to --rejects with their line
+number and the reason. Memory holds the accounts, not the input.
+
+export-streamlit writes the accounts in the Streamlit app's schema (salted PIN
+hash, created_at, tx_count, version) to a .json, .snap or .db target. PINs are
+hashed with --pin-scheme (default: the app's PIN policy); accounts hashed with
+a cheaper scheme are upgraded to the policy on their first login.
+"""
+import argparse
+import contextlib
+import csv
+import gzip
+import json
+import multiprocessing
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from bank_account_numbers import AccountNumberAllocator, new_key
+from bank_pin import HASHERS, load_policy, pin_fields
+from bank_snapshot import SnapshotReader, is_snapshot, save_records
+from bank_storage import SqliteStorage, iter_json_array
+from OOPS_Project import Bank
+
+OPS = ("create", "deposit", "withdraw")
+HASH_BATCH = 10000
+
+
+def _open_text(path: Path, mode: str = "r"):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return path.open(mode, encoding="utf-8", newline="")
+
+
+def iter_rows(path: Path):
+    # (line number, row dict) from CSV or JSON Lines, by extension (.csv[.gz] / .jsonl[.gz])
+    path = Path(path)
+    kind = Path(path.stem).suffix if path.suffix == ".gz" else path.suffix
+    with _open_text(path) as fh:
+        if kind == ".csv":
+            reader = csv.DictReader(fh)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for lineno, line in enumerate(fh, 1):
+                if line.strip():
+                    try:
+                        yield lineno, json.loads(line)
+                    except ValueError:
+                        yield lineno, {"op": "invalid JSON"}
+
+
+def _int(row: dict, key: str, default=None) -> int:
+    value = row.get(key)
+    if value is None or value == "":
+        if default is None:
+            raise ValueError(f"missing {key}")
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a whole number") from None
+
+
+def _text(row: dict, key: str) -> str:
+    value = row.get(key)
+    return "" if value is None else str(value).strip()
+
+
+def apply_row(bank: Bank, row: dict) -> str:
+    # applies one operation to bank (autosave off); raises ValueError to reject it
+    if not isinstance(row, dict):
+        raise ValueError("row must be an object")
+    op = (_text(row, "op") or "create").lower()
+    if op not in OPS:
+        raise ValueError(f"unknown op {op!r}")
+    pin = _int(row, "pin")
+    accnumber = _text(row, "accountNo") or None
+    if op == "create":
+        bank.create(_text(row, "name"), _int(row, "age"), _text(row, "email"), pin,
+                    accnumber=accnumber, balance=_int(row, "balance", 0))
+    elif accnumber is None:
+        raise ValueError("missing accountNo")
+    elif op == "deposit":
+        bank.deposit(accnumber, pin, _int(row, "amount"))
+    else:
+        bank.withdraw(accnumber, pin, _int(row, "amount"))
+    return op
+
+
+def _peak_rss_mb():
+    # None where the resource module does not exist (Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _scratch_reserve():
+    # an in-memory sequence with a throwaway key: numbers for a dry run that the .seq file never hands out
+    counter = [0]
+    key = new_key()
+
+    def reserve(count):
+        start = counter[0]
+        counter[0] += count
+        return start, key
+    return reserve
+
+
+def cmd_import(args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        # keeps the menu's "no such file" notice out of the JSON report
+        bank = Bank(args.database, autosave=False)
+    if args.dry_run:
+        # creates are validated in full, but must not use up account numbers from the .seq file
+        bank.numbers = AccountNumberAllocator(_scratch_reserve())
+    loaded = time.perf_counter()
+    applied = dict.fromkeys(OPS, 0)
+    rows = rejected = 0
+    rejects = None
+    if args.rejects:
+        rejects_fh = _open_text(args.rejects, "w")
+        rejects = csv.writer(rejects_fh)
+        rejects.writerow(["line", "reason", "row"])
+    try:
+        for lineno, row in iter_rows(args.source):
+            rows += 1
+            try:
+                applied[apply_row(bank, row)] += 1
+            except (ValueError, TypeError, AttributeError) as err:
+                # a bad row is rejected; it must never abort the import and lose the rows applied so far
+                rejected += 1
+                if rejects is not None:
+                    rejects.writerow([lineno, str(err), json.dumps(row)])
+    finally:
+        if rejects is not None:
+            rejects_fh.close()
+    processed = time.perf_counter()
+    if not args.dry_run and rows - rejected:
+        bank.save()
+    done = time.perf_counter()
+    print(json.dumps({
+        "rows": rows,
+        "applied": applied,
+        "rejected": rejected,
+        "accounts": len(bank.data),
+        "written": not args.dry_run and rows - rejected > 0,
+        "load_s": round(loaded - start, 3),
+        "process_s": round(processed - loaded, 3),
+        "write_s": round(done - processed, 3),
+        "rows_per_s": round(rows / (processed - loaded)) if processed > loaded else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }, indent=2))
+    return 0 if not rejected else 2
+
+
+def _source_records(path: Path):
+    # streamed: a snapshot is read record by record, JSON parsed incrementally
+    if is_snapshot(path):
+        yield from SnapshotReader(path)
+        return
+    with path.open("r", encoding="utf-8") as fh:
+        yield from iter_json_array(fh)
+
+
+def _convert(job):
+    user, policy, created_at = job
+    out = {
+        "name": user.get("name", ""),
+        "age": user.get("age"),
+        "email": user.get("email", ""),
+        "accountNo": user["accountNo"],
+        "balance": int(user.get("balance") or 0),
+        "created_at": created_at,
+        "tx_count": 0,
+        "total_deposited": 0,
+        "version": 0,
+    }
+    out.update(pin_fields(str(user["pin"]), policy))
+    return out
+
+
+def _batches(jobs, size: int):
+    batch = []
+    for job in jobs:
+        batch.append(job)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def cmd_export(args):
+    source = Path(args.database or ("data.snap" if Path("data.snap").exists() else "data.json"))
+    policy = load_policy()
+    if args.pin_scheme and args.pin_scheme != policy["scheme"]:
+        policy = {"scheme": args.pin_scheme, "params": HASHERS[args.pin_scheme].default_params}
+    created_at = datetime.utcnow().isoformat()
+    counts = {"exported": 0, "skipped": 0}
+
+    def jobs():
+        for user in _source_records(source):
+            if not user.get("accountNo") or user.get("pin") in (None, ""):
+                counts["skipped"] += 1
+                continue
+            yield user, policy, created_at
+
+    def converted(pool):
+        # bounded batches: Pool.imap would read the whole source ahead of the workers
+        for batch in _batches(jobs(), HASH_BATCH):
+            results = pool.map(_convert, batch, chunksize=256) if pool else map(_convert, batch)
+            for user in results:
+                counts["exported"] += 1
+                yield user
+
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(args.processes) if args.processes > 1 else None
+    try:
+        if args.target.suffix == ".db":
+            db = SqliteStorage(args.target)
+            try:
+                if db.count():
+                    raise SystemExit(f"{args.target} already holds accounts; refusing to merge into it")
+                db.insert_many(converted(pool))
+            finally:
+                db.close()
+        else:
+            if args.target.exists():
+                raise SystemExit(f"{args.target} already exists")
+            save_records(args.target, converted(pool))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    elapsed = time.perf_counter() - start
+    print(json.dumps(dict(counts, target=str(args.target), pin_scheme=policy["scheme"], seconds=round(elapsed, 3),
+                          accounts_per_s=round(counts["exported"] / elapsed) if elapsed else None,
+                          peak_rss_mb=_peak_rss_mb()), indent=2))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="oops_bulk.py", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import", help="apply create/deposit/withdraw rows, then write the database once")
+    p.add_argument("source", type=Path)
+    p.add_argument("--database", type=Path, help="default data.snap if present, else data.json")
+    p.add_argument("--rejects", type=Path, help="CSV of rejected rows (line, reason, row)")
+    p.add_argument("--dry-run", action="store_true", help="validate and report without writing")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export-streamlit", help="write the accounts in the Streamlit app's schema")
+    p.add_argument("target", type=Path, help=".json, .snap or .db")
+    p.add_argument("--database", type=Path, help="default data.snap if present, else data.json")
+    p.add_argument("--pin-scheme", choices=sorted(HASHERS))
+    p.add_argument("--processes", type=int, default=1)
+    p.set_defaults(func=cmd_export)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,37 @@
 from pathlib import Path
 import os
+import sqlite3
+
+from dir_index import PAGE_SIZE, DirIndex, print_page
 
 def readfileandfolder():
-    path = Path('') 
-    items = list(path.rglob('*'))
-    for i, items in enumerate(items):
-        print(f"{i+1} : {items}")
+    # the tree from the persistent index, a page at a time; only changed directories are read again
+    try:
+        index = DirIndex('.')
+    except sqlite3.OperationalError:
+        index = DirIndex('.', ':memory:')  # read-only volume: index for this run only
+    try:
+        index.refresh()
+        pattern, page = None, 1
+        while True:
+            rows, total = index.listing(pattern, page=page)
+            print_page(rows, total, page)
+            if pattern is None and total <= PAGE_SIZE:
+                return
+            choice = input("n for next page, p for previous, a name or pattern like *.txt to filter, enter to go on:- ").strip()
+            if not choice:
+                return
+            if choice == "n":
+                if page * PAGE_SIZE < total:
+                    page += 1
+            elif choice == "p":
+                page = max(page - 1, 1)
+            else:
+                # a plain name matches anywhere in the path
+                pattern = choice if any(c in choice for c in "*?[") else f"*{choice}*"
+                page = 1
+    finally:
+        index.close()
 
 
 def createfile():
@@ -3,7 +3,11 @@ import random
 r = random.randint(1, 100)
 
 while True:
-    guess = int(input("Guess the number between 1 and 100: "))
+    try:
+        guess = int(input("Guess the number between 1 and 100: "))
+    except ValueError:
+        print("That is not a number. Try again.")
+        continue
 
     if guess == r:
         print(f"You guessed it right! The number was {r}. 🎯")
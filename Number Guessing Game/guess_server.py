@@ -0,0 +1,442 @@
+"""Number guessing as a hosted game: an asyncio line-protocol server and a bot client.
+
+    python guess_server.py serve --port 7070 --limit 10 --idle 300
+    python guess_server.py serve --unix /tmp/guess.sock
+    python guess_server.py bot --spawn --connections 200 --games-per-connection 250 --games 500000
+    nc 127.0.0.1 7070                                          # play by hand: NEW, then numbers
+
+One command per line, one answer line per command:
+
+    NEW [LOW HIGH [LIMIT]]   GAME <id> <low> <high> <limit>  (default 1 100 and --limit; 0 = no limit)
+    GUESS <id> <n>           HIGH <id> | LOW <id> | WIN <id> <guesses> | LOSE <id> <secret>
+    <n>                      the same, for the connection's latest game
+    STATS                    STATS {json}
+    QUIT                     BYE
+    anything else            ERR <reason>
+
+Ranges may lie anywhere in -2**63 .. 2**64-1. A connection can play many games
+at once; the id tags every answer, so commands can be pipelined. Games live in
+one table of __slots__ records (secret, guess count, limit, last activity,
+owner) keyed by id. A sweeper drops games idle for --idle seconds, telling the
+owner EXPIRED <id>, and closes idle connections with BYE idle. Games of a closed
+connection go on the next sweep.
+
+bot opens --connections connections, starts --games-per-connection games on
+each, waits until all of them exist on the server (to read its memory per
+game from STATS), then plays binary search until --games games are done,
+starting a new game whenever one ends. It reports games/s, guesses/s, the
+server's CPU time (the bot usually runs on the same machine and is the slower
+side) and the server's memory per live game.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+MIN_LOW = -2 ** 63
+MAX_HIGH = 2 ** 64 - 1
+DEFAULT_PORT = 7070
+# a 2**64 guess with its id fits many times over
+MAX_LINE = 1024
+
+
+class Game:
+    __slots__ = ("owner", "secret", "guesses", "limit", "last")
+
+    def __init__(self, owner, secret, limit, now):
+        self.owner = owner
+        self.secret = secret
+        self.guesses = 0
+        self.limit = limit
+        self.last = now
+
+
+class Player:
+    __slots__ = ("writer", "current", "last")
+
+    def __init__(self, writer, now):
+        self.writer = writer  # None once the connection is gone
+        self.current = None
+        self.last = now
+
+
+def _rss_bytes():
+    # current resident size where /proc has it, else the peak; None where neither exists
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        if resource is None:
+            return None
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class GuessServer:
+    def __init__(self, default_limit=0, idle=300.0, seed=None):
+        self.default_limit = default_limit
+        self.idle = idle
+        self.rng = random.Random(seed)
+        self.games = {}
+        self.players = set()
+        self.next_id = 1
+        self.counters = dict.fromkeys(("started", "won", "lost", "guesses", "expired", "errors"), 0)
+
+    # ---------- commands ----------
+    def new_game(self, player, args, now):
+        if len(args) not in (0, 2, 3):
+            raise ValueError("usage: NEW [LOW HIGH [LIMIT]]")
+        low, high = (int(args[0]), int(args[1])) if args else (1, 100)
+        limit = int(args[2]) if len(args) == 3 else self.default_limit
+        if not MIN_LOW <= low <= high <= MAX_HIGH:
+            raise ValueError("range must satisfy -2**63 <= LOW <= HIGH <= 2**64-1")
+        if limit < 0:
+            raise ValueError("LIMIT must be 0 (none) or more")
+        game_id = self.next_id
+        self.next_id += 1
+        self.games[game_id] = Game(player, self.rng.randint(low, high), limit, now)
+        player.current = game_id
+        self.counters["started"] += 1
+        return f"GAME {game_id} {low} {high} {limit}"
+
+    def guess(self, player, game_id, guess, now):
+        game = self.games.get(game_id)
+        if game is None or game.owner is not player:
+            raise ValueError(f"no game {game_id}")
+        game.guesses += 1
+        game.last = now
+        self.counters["guesses"] += 1
+        if guess == game.secret:
+            del self.games[game_id]
+            self.counters["won"] += 1
+            return f"WIN {game_id} {game.guesses}"
+        if game.limit and game.guesses >= game.limit:
+            del self.games[game_id]
+            self.counters["lost"] += 1
+            return f"LOSE {game_id} {game.secret}"
+        return f"HIGH {game_id}" if guess > game.secret else f"LOW {game_id}"
+
+    def stats(self):
+        return dict(self.counters, connections=len(self.players), games=len(self.games),
+                    rss_bytes=_rss_bytes(), cpu_seconds=round(time.process_time(), 3),
+                    game_record_bytes=sys.getsizeof(Game(None, 0, 0, 0.0)))
+
+    def handle(self, player, line, now):
+        # one command line -> one answer line (None: close the connection)
+        parts = line.split()
+        if not parts:
+            return "ERR empty line"
+        command = parts[0].upper()
+        try:
+            if command == "GUESS":
+                if len(parts) != 3:
+                    raise ValueError("usage: GUESS ID N")
+                return self.guess(player, int(parts[1]), int(parts[2]), now)
+            if command == "NEW":
+                return self.new_game(player, parts[1:], now)
+            if command == "STATS":
+                return "STATS " + json.dumps(self.stats(), separators=(",", ":"))
+            if command == "QUIT":
+                return None
+            if command == "HELP":
+                return "OK NEW [LOW HIGH [LIMIT]] | GUESS ID N | N | STATS | QUIT"
+            if len(parts) == 1:
+                try:
+                    guess = int(parts[0])
+                except ValueError:
+                    raise ValueError("not a number") from None
+                if player.current is None:
+                    raise ValueError("no game yet, send NEW")
+                return self.guess(player, player.current, guess, now)
+            raise ValueError(f"unknown command {parts[0]}")
+        except ValueError as err:
+            self.counters["errors"] += 1
+            if str(err).startswith("invalid literal"):
+                err = "not a number"
+            return f"ERR {err}"
+
+    # ---------- connections ----------
+    async def connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        player = Player(writer, loop.time())
+        self.players.add(player)
+        partial = b""
+        try:
+            while player.writer is not None:
+                chunk = await reader.read(1 << 16)
+                if not chunk:
+                    break
+                # every complete line in the chunk is answered with one write
+                lines = (partial + chunk).split(b"\n")
+                partial = lines.pop()
+                if len(partial) > MAX_LINE:
+                    writer.write(b"ERR line too long\n")
+                    break
+                now = loop.time()
+                player.last = now
+                out = []
+                for line in lines:
+                    answer = self.handle(player, line.decode("ascii", "replace"), now)
+                    if answer is None:
+                        out.append("BYE")
+                        player.writer = None
+                        break
+                    out.append(answer)
+                if out:
+                    writer.write(("\n".join(out) + "\n").encode())
+                # only wait for the socket when the client is not reading
+                if writer.transport.get_write_buffer_size() > 1 << 16:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            player.writer = None
+            self.players.discard(player)
+            writer.close()
+
+    async def sweeper(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(max(self.idle / 4, 0.05))
+            cutoff = loop.time() - self.idle
+            stale = [gid for gid, game in self.games.items() if game.last < cutoff or game.owner.writer is None]
+            for gid in stale:
+                owner = self.games.pop(gid).owner
+                self.counters["expired"] += 1
+                if owner.writer is not None:
+                    owner.writer.write(f"EXPIRED {gid}\n".encode())
+            for player in [p for p in self.players if p.last < cutoff]:
+                player.writer.write(b"BYE idle\n")
+                player.writer.close()
+                player.writer = None
+                self.players.discard(player)
+
+
+def _raise_fd_limit():
+    # one descriptor per connection; go as high as the hard limit allows
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def serve(args):
+    _raise_fd_limit()
+    game = GuessServer(args.limit, args.idle, args.seed)
+    if args.unix:
+        server = await asyncio.start_unix_server(game.connection, args.unix, backlog=4096)
+        where = args.unix
+    else:
+        server = await asyncio.start_server(game.connection, args.host, args.port, backlog=4096)
+        where = f"{args.host}:{args.port}"
+    print(f"guessing game on {where}", flush=True)
+    sweeper = asyncio.ensure_future(game.sweeper())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        sweeper.cancel()
+
+
+# ---------- bot client ----------
+async def _open(args):
+    if args.unix:
+        return await asyncio.open_unix_connection(args.unix, limit=1 << 20)
+    return await asyncio.open_connection(args.host, args.port, limit=1 << 20)
+
+
+async def _stats(args):
+    reader, writer = await _open(args)
+    writer.write(b"STATS\n")
+    line = await reader.readline()
+    writer.close()
+    return json.loads(line.split(b" ", 1)[1])
+
+
+async def bot(args):
+    low, high, limit = args.low, args.high, args.limit
+    new_line = f"NEW {low} {high} {limit}\n".encode()
+    # everything the bot still has to start; shared by all connections
+    budget = {"left": args.games - args.connections * args.games_per_connection}
+    totals = {"won": 0, "lost": 0, "guesses": 0, "errors": 0}
+    ready = asyncio.Event()
+    go = asyncio.Event()
+    waiting = [args.connections]
+
+    async def lines(reader):
+        partial = b""
+        while True:
+            chunk = await reader.read(1 << 16)
+            if not chunk:
+                return
+            batch = (partial + chunk).split(b"\n")
+            partial = batch.pop()
+            yield batch
+
+    async def player():
+        reader, writer = await _open(args)
+        # id -> [low, high] still possible; binary search on the hints
+        games = {}
+        incoming = lines(reader)
+        writer.write(new_line * args.games_per_connection)
+        while len(games) < args.games_per_connection:
+            for answer in await incoming.__anext__():
+                games[int(answer.split()[1])] = [low, high]
+        waiting[0] -= 1
+        if not waiting[0]:
+            ready.set()
+        await go.wait()
+        writer.write(b"".join(b"GUESS %d %d\n" % (gid, (lo + hi) // 2) for gid, (lo, hi) in games.items()))
+        asked = 0  # NEW lines sent whose GAME answer has not come back yet
+        async for batch in incoming:
+            out = []
+            for answer in batch:
+                answer = answer.split()
+                kind = answer[0]
+                if kind == b"GAME":
+                    asked -= 1
+                    games[int(answer[1])] = [low, high]
+                    out.append(b"GUESS %s %d\n" % (answer[1], (low + high) // 2))
+                    continue
+                gid = int(answer[1])
+                if kind in (b"WIN", b"LOSE"):
+                    totals["guesses"] += int(answer[2]) if kind == b"WIN" else limit
+                    totals["won" if kind == b"WIN" else "lost"] += 1
+                    del games[gid]
+                    if budget["left"] > 0:
+                        budget["left"] -= 1
+                        out.append(new_line)
+                        asked += 1
+                    continue
+                if kind not in (b"HIGH", b"LOW"):
+                    totals["errors"] += 1
+                    games.pop(gid, None)
+                    continue
+                interval = games[gid]
+                mid = (interval[0] + interval[1]) // 2
+                if kind == b"HIGH":
+                    interval[1] = mid - 1
+                else:
+                    interval[0] = mid + 1
+                out.append(b"GUESS %d %d\n" % (gid, (interval[0] + interval[1]) // 2))
+            if not games and not asked:
+                break
+            writer.write(b"".join(out))
+        writer.write(b"QUIT\n")
+        writer.close()
+
+    before = await _stats(args)
+    tasks = [asyncio.ensure_future(player()) for _ in range(args.connections)]
+    setup = time.perf_counter()
+    waiter = asyncio.ensure_future(ready.wait())
+    await asyncio.wait(tasks + [waiter], return_when=asyncio.FIRST_COMPLETED)
+    if not ready.is_set():
+        # a connection failed before its games were set up: report that instead of hanging
+        waiter.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for task in tasks:
+            if not task.cancelled() and task.exception():
+                raise task.exception()
+        raise RuntimeError("a bot connection closed during setup")
+    loaded = await _stats(args)
+    live = loaded["games"] - before["games"]
+    start = time.perf_counter()
+    go.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    after = await _stats(args)
+    server_cpu = after["cpu_seconds"] - loaded["cpu_seconds"]
+    done = totals["won"] + totals["lost"]
+    return {
+        "connections": args.connections,
+        "simultaneous_games": live,
+        "games": done,
+        "range": [low, high],
+        "limit": limit,
+        "won": totals["won"],
+        "lost": totals["lost"],
+        "errors": totals["errors"],
+        "mean_guesses": round(totals["guesses"] / done, 3) if done else None,
+        "setup_seconds": round(start - setup, 3),
+        "seconds": round(elapsed, 3),
+        "games_per_s": round(done / elapsed),
+        "guesses_per_s": round(totals["guesses"] / elapsed),
+        # the bot shares the machine; this is what the server alone could sustain
+        "server_cpu_seconds": round(server_cpu, 3),
+        "server_guesses_per_cpu_s": round(totals["guesses"] / server_cpu) if server_cpu else None,
+        "server_bytes_per_game": (round((loaded["rss_bytes"] - before["rss_bytes"]) / live)
+                                  if live and loaded["rss_bytes"] is not None else None),
+        "game_record_bytes": loaded["game_record_bytes"],
+    }
+
+
+def cmd_bot(args):
+    _raise_fd_limit()
+    if args.games < args.connections * args.games_per_connection:
+        args.games = args.connections * args.games_per_connection
+    server = workdir = None
+    if args.spawn:
+        workdir = Path(tempfile.mkdtemp(prefix="guess_"))
+        args.unix = args.unix or str(workdir / "guess.sock")
+        server = subprocess.Popen([sys.executable, __file__, "serve", "--unix", args.unix, "--idle", "600"],
+                                  stdout=subprocess.PIPE, text=True)
+        server.stdout.readline()  # the "guessing game on ..." line means it is listening
+    try:
+        report = asyncio.run(bot(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+    return 1 if report["errors"] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve", help="host games")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--unix", help="listen on this local socket path instead of TCP")
+    p.add_argument("--limit", type=int, default=0, help="default guesses per game (0: no limit)")
+    p.add_argument("--idle", type=float, default=300.0, help="seconds before an idle game or connection goes")
+    p.add_argument("--seed", type=int)
+    p.set_defaults(func=lambda a: asyncio.run(serve(a)))
+
+    p = sub.add_parser("bot", help="play many games at once and report games/s and memory per game")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--unix", help="connect to a local socket instead of TCP")
+    p.add_argument("--spawn", action="store_true", help="start a throwaway server on a local socket")
+    p.add_argument("--connections", type=int, default=100)
+    p.add_argument("--games-per-connection", type=int, default=100, help="games each connection keeps going")
+    p.add_argument("--games", type=int, default=100000, help="games to finish in total")
+    p.add_argument("--low", type=int, default=1)
+    p.add_argument("--high", type=int, default=2 ** 64 - 1)
+    p.add_argument("--limit", type=int, default=0)
+    p.set_defaults(func=cmd_bot)
+
+    args = parser.parse_args()
+    try:
+        raise SystemExit(args.func(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Monte Carlo simulator for the number guessing game: strategies compared at scale.
+
+    python guess_sim.py run --games 1000000                          # every strategy on 1..100
+    python guess_sim.py run --strategies binary,random --high 4611686018427387904
+    python guess_sim.py bench --games 200000                         # NumPy vs a plain Python loop
+    python guess_sim.py optimal --high 1000000
+
+A strategy sees the interval the secret can still be in (every "too high" or
+"too low" hint narrows it) and picks the next guess:
+
+    binary       the middle of the interval
+    random       uniformly anywhere in the interval
+    biased:P     the point a fraction P of the way up, e.g. biased:0.25
+    first        always the lowest candidate (a linear scan)
+
+run plays --games games per strategy in batches of --batch: every batch is a
+handful of NumPy arrays (secret, low, high, guesses so far) and each round
+guesses for all unfinished games at once, so Python only loops once per guess
+round, not once per game. Ranges lie within -2**62..2**62 and span less than
+2**63, so the interval arithmetic stays within int64. A strategy that may
+need more than 65536 guesses on the range (first, biased:0, biased:1, or a
+fraction very close to either) is refused unless --max-guesses caps it. The report has the mean,
+spread and percentiles of the guess count, its full distribution (up to 64
+guesses), and for comparison the best possible mean for a uniform secret.
+
+bench plays the same games with a pure Python loop and reports the speedup.
+"""
+import argparse
+import json
+import math
+import random
+import time
+
+import numpy as np
+
+MAX_HIGH = 2 ** 62
+# guess rounds allowed without --max-guesses
+MAX_ROUNDS = 1 << 16
+
+
+class Strategy:
+    # next guesses for whole arrays of intervals, and the same rule for one game
+    name = ""
+
+    def guesses(self, low, high, rng):
+        raise NotImplementedError
+
+    def guess(self, low, high, rng):
+        raise NotImplementedError
+
+    def max_rounds(self, span: int):
+        # upper bound on the guesses needed when the interval holds span + 1 numbers; None: no fixed bound
+        return None
+
+
+class Binary(Strategy):
+    name = "binary"
+
+    def guesses(self, low, high, rng):
+        return low + (high - low) // 2
+
+    def guess(self, low, high, rng):
+        return low + (high - low) // 2
+
+    def max_rounds(self, span):
+        return (span + 1).bit_length()
+
+
+class Uniform(Strategy):
+    name = "random"
+
+    def guesses(self, low, high, rng):
+        return rng.integers(low, high, endpoint=True)
+
+    def guess(self, low, high, rng):
+        return rng.randint(low, high)
+
+
+class Biased(Strategy):
+    # a fixed fraction of the way up the interval; exact integer maths, no overflow
+    def __init__(self, fraction):
+        if not 0 <= fraction <= 1:
+            raise ValueError("the fraction must be between 0 and 1")
+        self.num, self.den = float(fraction).as_integer_ratio()
+        if self.den > 1 << 20:
+            self.num, self.den = round(fraction * (1 << 20)), 1 << 20
+        self.fraction = float(fraction)
+        self.name = f"biased:{self.fraction!r}"
+
+    def guesses(self, low, high, rng):
+        span = high - low
+        return low + (span // self.den) * self.num + (span % self.den) * self.num // self.den
+
+    def guess(self, low, high, rng):
+        return low + (high - low) * self.num // self.den
+
+    def max_rounds(self, span):
+        # each miss cuts at least the smaller side, a fraction m, until that side rounds down to
+        # nothing; from then on at most 1/m more. m = 0 (always an endpoint) is a linear scan.
+        m = min(self.fraction, 1 - self.fraction)
+        if m <= 0:
+            return span + 1
+        return math.ceil(math.log(span + 1) / -math.log1p(-m)) + math.ceil(1 / m) + 1
+
+
+class First(Strategy):
+    name = "first"
+
+    def guesses(self, low, high, rng):
+        return low
+
+    def guess(self, low, high, rng):
+        return low
+
+    def max_rounds(self, span):
+        return span + 1
+
+
+def get_strategy(name: str) -> Strategy:
+    if name.startswith("biased:"):
+        return Biased(float(name.split(":", 1)[1]))
+    for cls in (Binary, Uniform, First):
+        if cls.name == name:
+            return cls()
+    raise ValueError(f"unknown strategy {name!r}")
+
+
+def play_batch(strategy: Strategy, secrets, low: int, high: int, rng, max_guesses: int = 0):
+    # guess counts for every secret in the array (max_guesses: give up after that many, count 0)
+    n = len(secrets)
+    counts = np.zeros(n, dtype=np.int64)
+    todo = np.arange(n)
+    lo = np.full(n, low, dtype=np.int64)
+    hi = np.full(n, high, dtype=np.int64)
+    secret = secrets.astype(np.int64, copy=False)
+    rounds = 0
+    while len(todo):
+        rounds += 1
+        guess = strategy.guesses(lo, hi, rng)
+        hit = guess == secret
+        counts[todo[hit]] = rounds
+        if max_guesses and rounds == max_guesses:
+            break
+        # keep only the games still going; their intervals shrink by the hint
+        keep = ~hit
+        todo, lo, hi, secret, guess = todo[keep], lo[keep], hi[keep], secret[keep], guess[keep]
+        too_high = guess > secret
+        hi = np.where(too_high, guess - 1, hi)
+        lo = np.where(too_high, lo, guess + 1)
+    return counts
+
+
+def simulate(strategy: Strategy, games: int, low: int = 1, high: int = 100, batch: int = 1 << 14,
+             seed: int = 1, max_guesses: int = 0) -> dict:
+    if not low <= high <= MAX_HIGH or low < -MAX_HIGH:
+        raise ValueError("the range must lie within -2**62..2**62")
+    if high - low >= 2 ** 63:
+        # the interval arithmetic is int64: high - low must fit
+        raise ValueError("the range may span at most 2**63 - 1")
+    rounds = strategy.max_rounds(high - low)
+    if not max_guesses and rounds is not None and rounds > MAX_ROUNDS:
+        # one NumPy pass per round: a strategy that may scan linearly would run (nearly) forever
+        raise ValueError(f"{strategy.name} may need up to {rounds} guesses on this range; "
+                         f"narrow the range or set --max-guesses")
+    rng = np.random.default_rng(seed)
+    histogram = np.zeros(1, dtype=np.int64)
+    total = 0
+    squares = 0.0
+    start = time.perf_counter()
+    for done in range(0, games, batch):
+        secrets = rng.integers(low, high, size=min(batch, games - done), endpoint=True)
+        counts = play_batch(strategy, secrets, low, high, rng, max_guesses)
+        binned = np.bincount(counts)
+        if len(binned) > len(histogram):
+            histogram = np.pad(histogram, (0, len(binned) - len(histogram)))
+        histogram[:len(binned)] += binned
+        total += int(counts.sum())
+        squares += float((counts.astype(np.float64) ** 2).sum())
+    elapsed = time.perf_counter() - start
+    return _report(strategy.name, games, low, high, histogram, total, squares, elapsed)
+
+
+def _report(name, games, low, high, histogram, total, squares, elapsed) -> dict:
+    # histogram[k] = games won in k guesses; histogram[0] = games given up
+    solved = games - int(histogram[0])
+    mean = total / solved if solved else 0.0
+    cumulative = np.cumsum(histogram[1:])
+
+    def percentile(q):
+        return int(np.searchsorted(cumulative, q * solved)) + 1 if solved else None
+
+    return {
+        "strategy": name,
+        "games": games,
+        "range": [low, high],
+        "solved": solved,
+        "mean": round(mean, 4),
+        "std": round(math.sqrt(max(squares / solved - mean * mean, 0.0)), 4) if solved else None,
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": int(np.flatnonzero(histogram)[-1]) if solved else None,
+        "distribution": {str(k): int(v) for k, v in enumerate(histogram[1:65], 1) if v},
+        "optimal_mean": round(optimal_mean(high - low + 1), 4),
+        "seconds": round(elapsed, 3),
+        "games_per_s": round(games / elapsed) if elapsed else None,
+    }
+
+
+def optimal_mean(n: int) -> float:
+    # fewest guesses on average for a uniform secret among n: a complete binary search
+    # tree, 2**(k-1) numbers found on guess k and the rest on the last level
+    depth = n.bit_length() - 1
+    full = (1 << depth) - 1
+    total = sum(k << (k - 1) for k in range(1, depth + 1)) + (depth + 1) * (n - full)
+    return total / n
+
+
+def simulate_python(strategy: Strategy, games: int, low: int = 1, high: int = 100, seed: int = 1) -> dict:
+    # the same games one at a time, the way Number_guessing.py plays them
+    rng = random.Random(seed)
+    histogram = [0]
+    total = 0
+    squares = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        secret = rng.randint(low, high)
+        lo, hi = low, high
+        count = 0
+        while True:
+            count += 1
+            guess = strategy.guess(lo, hi, rng)
+            if guess == secret:
+                break
+            elif guess > secret:
+                hi = guess - 1
+            else:
+                lo = guess + 1
+        while len(histogram) <= count:
+            histogram.append(0)
+        histogram[count] += 1
+        total += count
+        squares += count * count
+    elapsed = time.perf_counter() - start
+    return _report(strategy.name, games, low, high, np.array(histogram), total, squares, elapsed)
+
+
+def _strategies(text: str):
+    return [get_strategy(name.strip()) for name in text.split(",") if name.strip()]
+
+
+def cmd_run(args):
+    results = [simulate(s, args.games, args.low, args.high, args.batch, args.seed, args.max_guesses)
+               for s in _strategies(args.strategies)]
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+def cmd_bench(args):
+    rows = []
+    for strategy in _strategies(args.strategies):
+        vectorized = simulate(strategy, args.games, args.low, args.high, args.batch, args.seed)
+        plain = simulate_python(strategy, args.python_games or args.games, args.low, args.high, args.seed)
+        rows.append({
+            "strategy": strategy.name,
+            "numpy_games_per_s": vectorized["games_per_s"],
+            "python_games_per_s": plain["games_per_s"],
+            "speedup": round(vectorized["games_per_s"] / plain["games_per_s"], 1),
+            # different random streams, so the means only have to agree closely
+            "numpy_mean": vectorized["mean"],
+            "python_mean": plain["mean"],
+        })
+    print(json.dumps({"games": args.games, "python_games": args.python_games or args.games,
+                      "range": [args.low, args.high], "results": rows}, indent=2))
+    return 0
+
+
+def cmd_optimal(args):
+    n = args.high - args.low + 1
+    print(json.dumps({"range": [args.low, args.high], "optimal_mean": optimal_mean(n),
+                      "worst_case": n.bit_length()}, indent=2))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def game_options(p, strategies="binary,random,biased:0.25,first"):
+        p.add_argument("--strategies", default=strategies)
+        p.add_argument("--games", type=int, default=1000000)
+        p.add_argument("--low", type=int, default=1)
+        p.add_argument("--high", type=int, default=100)
+        p.add_argument("--batch", type=int, default=1 << 14, help="games per NumPy batch (small enough to stay in cache)")
+        p.add_argument("--seed", type=int, default=1)
+
+    p = sub.add_parser("run", help="guess-count distribution per strategy")
+    game_options(p)
+    p.add_argument("--max-guesses", type=int, default=0, help="give up after this many (0: never)")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("bench", help="NumPy batches against a pure Python loop")
+    game_options(p, "binary,random,biased:0.25")
+    p.add_argument("--python-games", type=int, help="fewer games for the slow loop (default --games)")
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("optimal", help="best possible mean and worst case for a range")
+    p.add_argument("--low", type=int, default=1)
+    p.add_argument("--high", type=int, default=100)
+    p.set_defaults(func=cmd_optimal)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
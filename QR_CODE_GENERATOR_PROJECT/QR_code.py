@@ -1,11 +1,26 @@
+import sys
+from pathlib import Path
+
 import qrcode
 
-url = input("Enter your url: ")
 
-file_path = r"C:\Users\ANKAN SEN\Desktop\PythonProject Folder\QR_CODE_GENERATOR_PROJECT/qrcode.png"
+def main():
+    if len(sys.argv) > 1:
+        # batch mode: python QR_code.py render catalog.txt --out codes/ (see qr_batch.py)
+        from qr_batch import main as batch_main
+        return batch_main(sys.argv[1:])
+
+    url = input("Enter your url: ")
+
+    # saved next to this script, wherever the folder lives
+    file_path = Path(__file__).resolve().with_name("qrcode.png")
+
+    qr = qrcode.QRCode()
+    qr.add_data(url)
+    image = qr.make_image()
+    image.save(file_path)
+    print("QR code saved at:", file_path)
+
 
-qr = qrcode.QRCode()
-qr.add_data(url)
-image = qr.make_image()
-image.save(file_path)
-print("QR code saved at:", file_path)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""Batch QR codes: stream payloads from a file or stdin, render them on a process pool.
+
+    python qr_batch.py render catalog.txt --out codes/             # one PNG per line
+    python qr_batch.py render catalog.tsv --out codes.zip --processes 8
+    cat urls.txt | python qr_batch.py render - --out codes/ --ecc H --box-size 8
+    python qr_batch.py bench --codes 1000 --processes 4            # serial vs pool, cold vs cached
+    python QR_code.py render catalog.txt --out codes/              # same as the first line
+
+Each non-empty input line is one payload, or NAME<TAB>PAYLOAD to choose the
+file name (otherwise it is the first 16 hex digits of the payload's hash).
+Output goes to a directory, or to a single archive when --out ends in .zip,
+together with manifest.csv (line, name, file, key, source).
+
+Every code is keyed by the SHA-256 of its payload and render settings (ECC
+level, box size, border). Rendered PNGs are kept under --cache (default
+.qr_cache) by that key, so a payload rendered by any earlier run is copied
+instead of encoded again, and a payload repeated within a run is rendered
+once. Input is read in bounded batches and the manifest spills to a temporary
+file, so memory holds one batch plus a key per distinct code. One process
+writes all output; the pool only renders.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import qrcode
+from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q
+
+ECC_LEVELS = {"L": ERROR_CORRECT_L, "M": ERROR_CORRECT_M, "Q": ERROR_CORRECT_Q, "H": ERROR_CORRECT_H}
+BATCH = 512
+CACHE_DIR = Path(".qr_cache")
+
+
+def render_png(payload: str, ecc: str = "M", box_size: int = 10, border: int = 4) -> bytes:
+    # the same settings QR_code.py uses by default, into memory instead of a file
+    qr = qrcode.QRCode(error_correction=ECC_LEVELS[ecc], box_size=box_size, border=border)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    buf = io.BytesIO()
+    qr.make_image().save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def cache_key(payload: str, ecc: str, box_size: int, border: int) -> str:
+    digest = hashlib.sha256(f"{ecc}:{box_size}:{border}:".encode())
+    digest.update(payload.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    # PNG bytes by key, one file each under two-character fan-out directories
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.png"
+
+    def get(self, key: str):
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, png: bytes):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp:
+            tmp.write(png)
+        os.replace(tmp.name, path)
+
+
+class DirectoryOutput:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def write(self, name: str, data: bytes):
+        (self.root / name).write_bytes(data)
+
+    def write_from(self, name: str, fh):
+        with (self.root / name).open("wb") as dst:
+            shutil.copyfileobj(fh, dst)
+
+    def close(self):
+        pass
+
+
+class ZipOutput:
+    # PNGs are already compressed; storing them keeps the archive step cheap
+    def __init__(self, path: Path):
+        self.zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED)
+
+    def write(self, name: str, data: bytes):
+        self.zip.writestr(name, data)
+
+    def write_from(self, name: str, fh):
+        with self.zip.open(name, "w") as dst:
+            shutil.copyfileobj(fh, dst)
+
+    def close(self):
+        self.zip.close()
+
+
+def open_output(path: Path):
+    path = Path(path)
+    if path.suffix.lower() == ".zip":
+        return ZipOutput(path)
+    return DirectoryOutput(path)
+
+
+def iter_payloads(source):
+    # (line number, name or None, payload); source is a path or "-" for stdin
+    fh = sys.stdin if str(source) == "-" else open(source, encoding="utf-8")
+    try:
+        for lineno, line in enumerate(fh, 1):
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                continue
+            name, sep, payload = line.partition("\t")
+            yield (lineno, name, payload) if sep else (lineno, None, line)
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("._") or "code"
+
+
+def _render_job(job):
+    # worker side: (key, png) or (key, error message)
+    key, payload, ecc, box_size, border = job
+    try:
+        return key, render_png(payload, ecc, box_size, border), None
+    except Exception as err:  # qrcode raises DataOverflowError and friends for payloads it cannot fit
+        return key, None, f"{type(err).__name__}: {err}"
+
+
+def _batches(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_batch(source, out, ecc="M", box_size=10, border=4, processes=1, cache_dir=CACHE_DIR, use_cache=True) -> dict:
+    cache = RenderCache(cache_dir) if use_cache else None
+    output = open_output(out)
+    manifest = tempfile.SpooledTemporaryFile(max_size=1 << 20, mode="w+b")
+    rows = csv.writer(io.TextIOWrapper(manifest, encoding="utf-8", newline="", write_through=True))
+    rows.writerow(["line", "name", "file", "key", "source"])
+    counts = {"codes": 0, "rendered": 0, "cached": 0, "repeated": 0, "errors": 0}
+    written = {}   # key -> file name already in the output
+    taken = set()  # file names used so far
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    start = time.perf_counter()
+    try:
+        for batch in _batches(iter_payloads(source), BATCH):
+            # first sort out what this batch really has to render
+            todo = {}
+            entries = []
+            for lineno, name, payload in batch:
+                key = cache_key(payload, ecc, box_size, border)
+                entries.append((lineno, name, payload, key))
+                if key in written or key in todo:
+                    continue
+                png = cache.get(key) if cache is not None else None
+                todo[key] = png if png is not None else (key, payload, ecc, box_size, border)
+            jobs = [job for job in todo.values() if isinstance(job, tuple)]
+            results = pool.map(_render_job, jobs, chunksize=16) if pool else map(_render_job, jobs)
+            rendered = {}
+            for key, png, error in results:
+                rendered[key] = png if png is not None else error
+                if png is not None and cache is not None:
+                    cache.put(key, png)
+            for lineno, name, payload, key in entries:
+                counts["codes"] += 1
+                if key in written:
+                    file, source_kind = written[key], "repeated"
+                    if name is not None and _safe_name(name) + ".png" != file:
+                        # a second name for the same content gets its own copy
+                        file = _unique(_safe_name(name), taken)
+                        png = cache.get(key) if cache is not None else None
+                        output.write(file, png or render_png(payload, ecc, box_size, border))
+                else:
+                    data = todo[key] if isinstance(todo[key], bytes) else rendered[key]
+                    if isinstance(data, str):
+                        counts["errors"] += 1
+                        rows.writerow([lineno, name or "", "", key, f"error: {data}"])
+                        continue
+                    source_kind = "cached" if isinstance(todo[key], bytes) else "rendered"
+                    file = _unique(_safe_name(name) if name is not None else key[:16], taken)
+                    output.write(file, data)
+                    written[key] = file
+                counts[source_kind] += 1
+                rows.writerow([lineno, name or "", file, key, source_kind])
+        manifest.seek(0)
+        output.write_from("manifest.csv", manifest)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        output.close()
+    elapsed = time.perf_counter() - start
+    return dict(counts, processes=processes, seconds=round(elapsed, 3),
+                codes_per_s=round(counts["codes"] / elapsed) if elapsed else None, out=str(out))
+
+
+def _unique(stem: str, taken: set) -> str:
+    name = f"{stem}.png"
+    n = 1
+    while name in taken:
+        n += 1
+        name = f"{stem}_{n}.png"
+    taken.add(name)
+    return name
+
+
+def cmd_render(args):
+    report = run_batch(args.source, args.out, args.ecc, args.box_size, args.border, args.processes,
+                       args.cache, not args.no_cache)
+    print(json.dumps(report, indent=2))
+    return 1 if report["errors"] else 0
+
+
+def cmd_bench(args):
+    # a synthetic catalog: distinct product URLs of realistic length
+    workdir = Path(tempfile.mkdtemp(prefix="qr_bench_"))
+    catalog = workdir / "catalog.txt"
+    with catalog.open("w", encoding="utf-8") as fh:
+        for i in range(args.codes):
+            fh.write(f"https://shop.example.com/products/{i:08d}?utm_source=catalog&sku=SKU-{i * 7919 % 10 ** 8:08d}\n")
+    runs = {}
+    runs["serial"] = run_batch(catalog, workdir / "serial", processes=1, use_cache=False)
+    runs["pool"] = run_batch(catalog, workdir / "pool", processes=args.processes, cache_dir=workdir / "cache")
+    runs["pool_cached"] = run_batch(catalog, workdir / "cached.zip", processes=args.processes, cache_dir=workdir / "cache")
+    print(json.dumps({
+        "codes": args.codes,
+        "cpus": os.cpu_count(),
+        "processes": args.processes,
+        "codes_per_s": {name: run["codes_per_s"] for name, run in runs.items()},
+        "speedup_pool": round(runs["serial"]["seconds"] / runs["pool"]["seconds"], 2),
+        "speedup_cached": round(runs["serial"]["seconds"] / runs["pool_cached"]["seconds"], 2),
+        "workdir": str(workdir) if args.keep else None,
+    }, indent=2))
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="qr_batch.py", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("render", help="render every payload of a file (or - for stdin)")
+    p.add_argument("source")
+    p.add_argument("--out", type=Path, required=True, help="a directory, or a .zip archive")
+    p.add_argument("--ecc", choices=sorted(ECC_LEVELS), default="M")
+    p.add_argument("--box-size", type=int, default=10)
+    p.add_argument("--border", type=int, default=4)
+    p.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--cache", type=Path, default=CACHE_DIR, help="rendered codes from earlier runs")
+    p.add_argument("--no-cache", action="store_true")
+    p.set_defaults(func=cmd_render)
+
+    p = sub.add_parser("bench", help="codes/s: serial, process pool, and pool with a warm cache")
+    p.add_argument("--codes", type=int, default=1000)
+    p.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--keep", action="store_true", help="keep the generated files")
+    p.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
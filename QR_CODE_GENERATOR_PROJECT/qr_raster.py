@@ -0,0 +1,198 @@
+"""NumPy QR rasterizer, with the version and ECC level picked to fit a size limit.
+
+    python qr_raster.py render "https://example.com" --max-px 300 > code.png
+    python qr_raster.py render "$(cat long.txt)" --max-version 20 --min-ecc M > code.png
+    python qr_raster.py fit "https://example.com/some/long/path" --max-px 200
+    python qr_raster.py bench --sizes 16,64,256,1024,2048 --repeat 20
+
+fit() looks for the smallest QR version that holds the payload at the lowest
+allowed ECC level (--min-ecc, default L), then raises the ECC level as far as
+it goes without needing a bigger version: the extra error correction costs no
+size. The payload is rejected if that version is above --max-version, or if
+its modules plus the quiet zone cannot be drawn at least one pixel each
+within --max-px. With --max-px the box size is the largest that fits.
+
+The module matrix comes from qrcode as a NumPy boolean array. It is scaled with
+np.repeat, padded with the quiet zone and packed straight into a 1-bit image
+buffer (np.packbits), so there is no drawing per module. The resulting PNG is
+pixel-identical to qrcode's make_image at the same settings.
+
+bench times both paths for payloads of each size in --sizes: encoding (shared),
+rasterizing (make_image vs NumPy), PNG encoding and the total.
+"""
+import argparse
+import io
+import json
+import sys
+import time
+
+import numpy as np
+import qrcode
+from PIL import Image
+from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q
+
+# weakest to strongest
+ECC_ORDER = ("L", "M", "Q", "H")
+ECC_LEVELS = {"L": ERROR_CORRECT_L, "M": ERROR_CORRECT_M, "Q": ERROR_CORRECT_Q, "H": ERROR_CORRECT_H}
+
+
+def modules_for(version: int) -> int:
+    return 17 + 4 * version
+
+
+def fit(payload: str, max_version: int = 40, max_px: int = None, border: int = 4, min_ecc: str = "L") -> dict:
+    # {"version", "ecc", "modules", "box_size"}; ValueError if nothing fits
+    qr = qrcode.QRCode(border=border)
+    qr.add_data(payload)
+    versions = {}
+    for ecc in ECC_ORDER[ECC_ORDER.index(min_ecc):]:
+        qr.error_correction = ECC_LEVELS[ecc]
+        qr.version = None
+        try:
+            versions[ecc] = qr.best_fit()
+        except (qrcode.exceptions.DataOverflowError, ValueError):
+            break  # stronger levels hold even less
+    if not versions:
+        raise ValueError("payload is too long for any QR code")
+    version = versions[min_ecc]
+    # the strongest level that still fits in that version
+    ecc = max((e for e, v in versions.items() if v == version), key=ECC_ORDER.index)
+    side = modules_for(version) + 2 * border
+    if version > max_version:
+        raise ValueError(f"payload needs version {version} (ECC {min_ecc}), above the limit of {max_version}")
+    if max_px is not None and side > max_px:
+        raise ValueError(f"payload needs {side} modules across with the quiet zone, more than {max_px} px")
+    return {"version": version, "ecc": ecc, "modules": modules_for(version),
+            "box_size": max_px // side if max_px is not None else 10}
+
+
+def matrix(payload: str, version: int = None, ecc: str = "M") -> np.ndarray:
+    # module matrix without the quiet zone, True = dark
+    qr = qrcode.QRCode(version=version, error_correction=ECC_LEVELS[ecc], border=0)
+    qr.add_data(payload)
+    qr.make(fit=version is None)
+    return np.array(qr.modules, dtype=bool)
+
+
+def rasterize(modules: np.ndarray, box_size: int = 10, border: int = 4) -> Image.Image:
+    # bool matrix -> 1-bit PIL image: scale by repetition, pad, pack 8 pixels per byte
+    dark = np.repeat(np.repeat(modules, box_size, axis=0), box_size, axis=1)
+    dark = np.pad(dark, border * box_size, constant_values=False)
+    height, width = dark.shape
+    # mode "1": a set bit is white, rows padded to whole bytes
+    packed = np.packbits(~dark, axis=1)
+    return Image.frombuffer("1", (width, height), packed.tobytes(), "raw", "1", 0, 1)
+
+
+def png_bytes(image: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def render_png(payload: str, max_version: int = 40, max_px: int = None, border: int = 4, min_ecc: str = "L",
+               box_size: int = None) -> bytes:
+    chosen = fit(payload, max_version, max_px, border, min_ecc)
+    image = rasterize(matrix(payload, chosen["version"], chosen["ecc"]), box_size or chosen["box_size"], border)
+    return png_bytes(image)
+
+
+def _payload(size: int) -> str:
+    # URL-ish text so qrcode picks byte mode, as for real links
+    base = "https://shop.example.com/p/?q="
+    return (base + "abcdefghij0123456789-_." * (size // 23 + 1))[:size]
+
+
+def cmd_bench(args):
+    rows = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        payload = _payload(size)
+        chosen = fit(payload, min_ecc=args.ecc)
+        times = {"encode": [], "make_image": [], "numpy": [], "png_make_image": [], "png_numpy": []}
+        identical = True
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            qr = qrcode.QRCode(version=chosen["version"], error_correction=ECC_LEVELS[chosen["ecc"]],
+                               box_size=args.box_size, border=4)
+            qr.add_data(payload)
+            qr.make(fit=False)
+            modules = np.array(qr.modules, dtype=bool)
+            encoded = time.perf_counter()
+            reference = qr.make_image()
+            drawn = time.perf_counter()
+            image = rasterize(modules, args.box_size, 4)
+            rastered = time.perf_counter()
+            png_bytes(reference)
+            saved_reference = time.perf_counter()
+            png_bytes(image)
+            saved = time.perf_counter()
+            times["encode"].append(encoded - start)
+            times["make_image"].append(drawn - encoded)
+            times["numpy"].append(rastered - drawn)
+            times["png_make_image"].append(saved_reference - rastered)
+            times["png_numpy"].append(saved - saved_reference)
+            identical = identical and reference.get_image().tobytes() == image.tobytes()
+        ms = {key: round(sorted(values)[len(values) // 2] * 1000, 3) for key, values in times.items()}
+        rows.append({
+            "payload_bytes": size,
+            "version": chosen["version"],
+            "ecc": chosen["ecc"],
+            "pixels": (modules_for(chosen["version"]) + 8) * args.box_size,
+            "median_ms": ms,
+            "raster_speedup": round(ms["make_image"] / ms["numpy"], 1) if ms["numpy"] else None,
+            "total_speedup": round((ms["encode"] + ms["make_image"] + ms["png_make_image"])
+                                   / (ms["encode"] + ms["numpy"] + ms["png_numpy"]), 2),
+            "pixel_identical": identical,
+        })
+    print(json.dumps({"box_size": args.box_size, "repeat": args.repeat, "results": rows}, indent=2))
+    return 0 if all(row["pixel_identical"] for row in rows) else 1
+
+
+def cmd_fit(args):
+    print(json.dumps(fit(args.data, args.max_version, args.max_px, args.border, args.min_ecc)))
+    return 0
+
+
+def cmd_render(args):
+    sys.stdout.buffer.write(render_png(args.data, args.max_version, args.max_px, args.border, args.min_ecc,
+                                       args.box_size))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def fit_options(p):
+        p.add_argument("data")
+        p.add_argument("--max-version", type=int, default=40)
+        p.add_argument("--max-px", type=int, help="image side limit in pixels")
+        p.add_argument("--border", type=int, default=4)
+        p.add_argument("--min-ecc", choices=ECC_ORDER, default="L")
+
+    p = sub.add_parser("render", help="write a PNG to stdout")
+    fit_options(p)
+    p.add_argument("--box-size", type=int, help="default: the largest within --max-px, else 10")
+    p.set_defaults(func=cmd_render)
+
+    p = sub.add_parser("fit", help="show the version, ECC level and box size chosen")
+    fit_options(p)
+    p.set_defaults(func=cmd_fit)
+
+    p = sub.add_parser("bench", help="make_image vs NumPy across payload sizes")
+    p.add_argument("--sizes", default="16,64,256,1024,2048")
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--box-size", type=int, default=10)
+    p.add_argument("--ecc", choices=ECC_ORDER, default="L", help="lowest ECC level allowed")
+    p.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args()
+    try:
+        return args.func(args)
+    except ValueError as err:
+        print(err, file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
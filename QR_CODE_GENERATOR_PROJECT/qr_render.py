@@ -0,0 +1,372 @@
+"""QR codes rendered in memory, behind an LRU cache, with a small local HTTP endpoint.
+
+    python qr_render.py render "https://example.com" --format txt      # straight to the terminal
+    python qr_render.py render "https://example.com" --format svg > code.svg
+    python qr_render.py serve --port 8766 --cache-size 4096
+    curl "http://127.0.0.1:8766/qr?data=https://example.com&format=svg&ecc=M&box=10"
+    python qr_render.py bench --distinct 200 --repeat 20              # cold vs hot, per format
+
+Library use:
+
+    from qr_render import QRRenderer
+    renderer = QRRenderer(max_entries=4096)
+    png = renderer.render("https://example.com", "png", ecc="M", box_size=10)
+    renderer.stats()
+
+Nothing touches the disk. Encoding (the qrcode module matrix, where almost all
+the time goes) is cached by (payload, ECC level); finished images are cached
+by (format, payload, ECC level, box size, border). Both caches are LRU and
+bounded by entries and bytes. PNG is drawn from the matrix at one pixel per
+module and scaled up; SVG is one <path> of merged horizontal runs; txt uses
+half-block characters, two rows per line. stats() (and GET /stats) gives hit
+rates, evictions and render latency percentiles split by hit and miss.
+
+    GET /qr?data=...&format=png|svg|txt&ecc=L|M|Q|H&box=10&border=4
+    GET /stats
+"""
+import argparse
+import hashlib
+import io
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import qrcode
+from PIL import Image, ImageOps
+from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q
+
+ECC_LEVELS = {"L": ERROR_CORRECT_L, "M": ERROR_CORRECT_M, "Q": ERROR_CORRECT_Q, "H": ERROR_CORRECT_H}
+FORMATS = {"png": "image/png", "svg": "image/svg+xml", "txt": "text/plain; charset=utf-8"}
+DEFAULT_PORT = 8766
+MAX_BOX = 40
+MAX_BORDER = 16
+# latency samples kept per (format, hit or miss) for the percentiles
+SAMPLES = 4096
+
+
+class LRUCache:
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value[0]
+
+    def put(self, key, value, size: int):
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.items[key] = (value, size)
+            self.bytes += size
+            while self.items and (len(self.items) > self.max_entries or self.bytes > self.max_bytes):
+                _, (_, dropped) = self.items.popitem(last=False)
+                self.bytes -= dropped
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self.items), "bytes": self.bytes, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 4) if lookups else None, "evictions": self.evictions}
+
+
+def encode(payload: str, ecc: str = "M"):
+    # the module matrix as a tuple of rows of 0/1, without the quiet zone
+    qr = qrcode.QRCode(error_correction=ECC_LEVELS[ecc], border=0)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return tuple(bytes(1 if cell else 0 for cell in row) for row in qr.modules)
+
+
+# module value -> grey level for PNG: 1 (dark) -> 0, 0 -> 255
+_PNG_LEVELS = bytes([255, 0]) + bytes(254)
+
+
+def to_png(matrix, box_size: int = 10, border: int = 4) -> bytes:
+    n = len(matrix)
+    # one byte per module (0 black, 255 white), then scaled: no per-module drawing
+    image = Image.frombytes("L", (n, n), b"".join(row.translate(_PNG_LEVELS) for row in matrix))
+    image = image.resize((n * box_size, n * box_size), Image.NEAREST)
+    image = ImageOps.expand(image, border * box_size, fill=255).convert("1")
+    buf = io.BytesIO()
+    image.save(buf, format="PNG", optimize=False)
+    return buf.getvalue()
+
+
+def to_svg(matrix, box_size: int = 10, border: int = 4) -> bytes:
+    n = len(matrix)
+    size = n + 2 * border
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < n:
+            if row[x]:
+                start = x
+                while x < n and row[x]:
+                    x += 1
+                path.append(f"M{start + border} {y + border}h{x - start}v1h-{x - start}z")
+            x += 1
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{size * box_size}" height="{size * box_size}" '
+            f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+            f'<rect width="100%" height="100%" fill="#fff"/><path fill="#000" d="{"".join(path)}"/></svg>\n').encode()
+
+
+def to_text(matrix, box_size: int = 1, border: int = 2) -> bytes:
+    # dark modules drawn; two rows per line with half blocks (box_size is ignored)
+    n = len(matrix)
+    blank = bytes(n + 2 * border)
+    rows = [blank] * border + [bytes(border) + row + bytes(border) for row in matrix] + [blank] * border
+    if len(rows) % 2:
+        rows.append(blank)
+    chars = {(0, 0): " ", (1, 0): "▀", (0, 1): "▄", (1, 1): "█"}
+    lines = ["".join(chars[top, bottom] for top, bottom in zip(rows[i], rows[i + 1])) for i in range(0, len(rows), 2)]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+RENDERERS = {"png": to_png, "svg": to_svg, "txt": to_text}
+
+
+def _percentiles(samples) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e6, 1)
+    return {"count": len(ordered), "p50_us": pick(0.5), "p99_us": pick(0.99),
+            "mean_us": round(sum(ordered) / len(ordered) * 1e6, 1)}
+
+
+class QRRenderer:
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 << 20, matrix_entries: int = None):
+        self.images = LRUCache(max_entries, max_bytes)
+        self.matrices = LRUCache(matrix_entries or max_entries, max_bytes)
+        self.lock = threading.Lock()
+        self.latency = {}
+
+    def render(self, payload: str, fmt: str = "png", ecc: str = "M", box_size: int = 10, border: int = 4) -> bytes:
+        # raises ValueError for bad settings or a payload too long for any QR version
+        if fmt not in RENDERERS:
+            raise ValueError(f"format must be one of {', '.join(RENDERERS)}")
+        if ecc not in ECC_LEVELS:
+            raise ValueError("ecc must be L, M, Q or H")
+        if not 1 <= box_size <= MAX_BOX or not 0 <= border <= MAX_BORDER:
+            raise ValueError(f"box must be 1..{MAX_BOX} and border 0..{MAX_BORDER}")
+        start = time.perf_counter()
+        key = (fmt, payload, ecc, box_size, border)
+        data = self.images.get(key)
+        hit = data is not None
+        if not hit:
+            matrix = self.matrices.get((payload, ecc))
+            if matrix is None:
+                try:
+                    matrix = encode(payload, ecc)
+                except Exception as err:  # qrcode: DataOverflowError / "Invalid version" when it cannot fit
+                    raise ValueError(f"cannot encode payload: {err}") from None
+                self.matrices.put((payload, ecc), matrix, len(matrix) ** 2 + len(payload))
+            data = RENDERERS[fmt](matrix, box_size, border)
+            self.images.put(key, data, len(data) + len(payload))
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latency.setdefault((fmt, hit), deque(maxlen=SAMPLES)).append(elapsed)
+        return data
+
+    def clear(self):
+        self.images.clear()
+        self.matrices.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            latency = {f"{fmt}_{'hit' if hit else 'miss'}": _percentiles(list(samples))
+                       for (fmt, hit), samples in sorted(self.latency.items())}
+        return {"images": self.images.stats(), "matrices": self.matrices.stats(), "latency": latency}
+
+
+# ---------- HTTP ----------
+class Handler(BaseHTTPRequestHandler):
+    renderer = None
+    protocol_version = "HTTP/1.1"
+    # headers and body leave in one send, and nothing waits on Nagle: keep-alive
+    # clients otherwise stall ~40 ms per request on the delayed ACK
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _send(self, status: int, body: bytes, content_type: str, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str):
+        self._send(status, json.dumps({"error": message}).encode(), "application/json")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/stats":
+            return self._send(200, json.dumps(self.renderer.stats()).encode(), "application/json")
+        if url.path != "/qr":
+            return self._error(404, "not found")
+        query = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        if not query.get("data"):
+            return self._error(400, "data is required")
+        fmt = query.get("format", "png")
+        try:
+            try:
+                box, border = int(query.get("box", 10)), int(query.get("border", 4))
+            except ValueError:
+                raise ValueError("box and border must be whole numbers") from None
+            body = self.renderer.render(query["data"], fmt, query.get("ecc", "M").upper(), box, border)
+        except ValueError as err:
+            return self._error(400, str(err))
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            return self.end_headers()
+        self._send(200, body, FORMATS[fmt], {"ETag": etag, "Cache-Control": "public, max-age=86400"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(renderer: QRRenderer, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    handler = type("QRHandler", (Handler,), {"renderer": renderer})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def cmd_serve(args):
+    server = make_server(QRRenderer(args.cache_size, args.cache_mb << 20), args.host, args.port)
+    print(f"QR service on http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def cmd_render(args):
+    data = QRRenderer().render(args.data, args.format, args.ecc, args.box_size, args.border)
+    sys.stdout.buffer.write(data)
+    return 0
+
+
+def cmd_bench(args):
+    payloads = [f"https://shop.example.com/products/{i:08d}?ref=bench" for i in range(args.distinct)]
+    report = {"distinct": args.distinct, "repeat": args.repeat}
+    for fmt in args.formats.split(","):
+        renderer = QRRenderer(max_entries=max(args.distinct, 1))
+        cold = []
+        for payload in payloads:
+            start = time.perf_counter()
+            renderer.render(payload, fmt)
+            cold.append(time.perf_counter() - start)
+        hot = []
+        for _ in range(args.repeat):
+            for payload in payloads:
+                start = time.perf_counter()
+                renderer.render(payload, fmt)
+                hot.append(time.perf_counter() - start)
+        # images dropped but matrices kept: only the drawing is paid
+        warm = []
+        renderer.images.clear()
+        for payload in payloads:
+            start = time.perf_counter()
+            renderer.render(payload, fmt)
+            warm.append(time.perf_counter() - start)
+        cold_p, hot_p, warm_p = _percentiles(cold), _percentiles(hot), _percentiles(warm)
+        report[fmt] = {
+            "cold": cold_p,
+            "encoded_only": warm_p,
+            "hot": hot_p,
+            "hot_speedup": round(cold_p["mean_us"] / hot_p["mean_us"], 1),
+            "bytes_per_image": renderer.images.stats()["bytes"] // max(args.distinct, 1),
+        }
+    if args.http:
+        report["http"] = _bench_http(payloads, args.repeat)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def _bench_http(payloads, repeat):
+    # the same thing through the endpoint over one keep-alive connection
+    import http.client
+    renderer = QRRenderer(max_entries=len(payloads))
+    server = make_server(renderer, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    times = {"cold": [], "hot": []}
+    try:
+        for phase, rounds in (("cold", 1), ("hot", repeat)):
+            for _ in range(rounds):
+                for payload in payloads:
+                    start = time.perf_counter()
+                    conn.request("GET", "/qr?format=png&data=" + payload.replace("&", "%26").replace("?", "%3F"))
+                    conn.getresponse().read()
+                    times[phase].append(time.perf_counter() - start)
+    finally:
+        conn.close()
+        server.shutdown()
+        server.server_close()
+    return {phase: _percentiles(samples) for phase, samples in times.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("render", help="write one code to stdout")
+    p.add_argument("data")
+    p.add_argument("--format", choices=sorted(RENDERERS), default="png")
+    p.add_argument("--ecc", choices=sorted(ECC_LEVELS), default="M")
+    p.add_argument("--box-size", type=int, default=10)
+    p.add_argument("--border", type=int, default=4)
+    p.set_defaults(func=cmd_render)
+
+    p = sub.add_parser("serve", help="local HTTP endpoint")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--cache-size", type=int, default=4096, help="images kept")
+    p.add_argument("--cache-mb", type=int, default=64, help="bytes kept, in MiB")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("bench", help="render latency cold vs hot cache, per format")
+    p.add_argument("--distinct", type=int, default=200)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--formats", default="png,svg,txt")
+    p.add_argument("--http", action="store_true", help="also time PNGs through the HTTP endpoint")
+    p.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args()
+    raise SystemExit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()